@@ -0,0 +1,150 @@
+import math
+import numpy as np
+from autopilot_package.frontier import (box_count, cells_to_world, free_mask, reachable_mask,
+                                        world_to_cell)
+
+
+def solve_approach_pose(grid, info, marker_x, marker_y, robot_x, robot_y, desired_distance,
+                        obstacle_probability, tolerance=0.2, clearance=0.2, wall_threshold=99,
+                        marker_margin=0.15, reachable=None, reachable_offset=(0, 0)):
+    """
+    Finds a reachable pose from which to localise an ArUco marker.
+
+    The candidates are the cells on a ring of radius desired_distance (+- tolerance) around the
+    marker. They are masked in one pass against the costmap (known and below the obstacle
+    threshold), the clearance to obstacles, the cells reachable from the robot and the line of
+    sight to the marker. The remaining cell with the shortest path from the robot is chosen, ties
+    going to the cell closest in a straight line.
+
+    Args:
+    grid (ndarray): (height, width) costmap
+    info (MapMetaData): geometry of the costmap
+    marker_x, marker_y (float): position of the marker in the map frame
+    robot_x, robot_y (float): position of the robot in the map frame
+    desired_distance (float): distance (m) at which to stop from the marker
+    obstacle_probability (int): cost from which a cell is an obstacle
+    tolerance (float): accepted deviation (m) from desired_distance
+    clearance (float): minimum distance (m) from the pose to an obstacle
+    wall_threshold (int): cost from which a cell blocks the line of sight
+    marker_margin (float): length (m) of the end of the line of sight ignored, as the marker
+        lies on a wall
+    reachable (ndarray): free cells reachable from the robot, e.g. the reachable mask of the known
+        region. Computed on the whole grid if None
+    reachable_offset (tuple): (row, col) of the grid cell at reachable[0, 0]
+
+    Returns:
+    (x, y, yaw) of the pose facing the marker, or None if no cell of the ring is usable
+    """
+    resolution = info.resolution
+    height, width = grid.shape
+    robot_row, robot_col = world_to_cell(robot_x, robot_y, info)
+    if reachable is None:
+        start = (min(max(robot_row, 0), height - 1), min(max(robot_col, 0), width - 1))
+        reachable = reachable_mask(free_mask(grid, obstacle_probability), start)
+        reachable_offset = (0, 0)
+    outer = int(math.ceil((desired_distance + tolerance) / resolution)) + 1
+
+    # Window of the grid containing the ring
+    marker_row = int(math.floor((marker_y - info.origin.position.y) / resolution))
+    marker_col = int(math.floor((marker_x - info.origin.position.x) / resolution))
+    row_start, row_stop = max(marker_row - outer, 0), min(marker_row + outer + 1, height)
+    col_start, col_stop = max(marker_col - outer, 0), min(marker_col + outer + 1, width)
+    if row_start >= row_stop or col_start >= col_stop:
+        return None
+    window = grid[row_start:row_stop, col_start:col_stop]
+
+    rows, cols = np.mgrid[row_start:row_stop, col_start:col_stop]
+    x, y = cells_to_world(rows, cols, info)
+    to_marker = np.hypot(x - marker_x, y - marker_y)
+
+    ring = np.abs(to_marker - desired_distance) <= tolerance
+    free = (window >= 0) & (window < obstacle_probability)
+    clearance_cells = max(int(round(clearance / resolution)), 0)
+    clear = box_count(window >= obstacle_probability, clearance_cells) == 0
+    candidates = ring & free & clear & reachable_window(reachable, reachable_offset, rows, cols)
+    if not candidates.any():
+        return None
+
+    x, y, to_marker = x[candidates], y[candidates], to_marker[candidates]
+    rows, cols = rows[candidates], cols[candidates]
+    visible = line_of_sight(grid, info, x, y, marker_x, marker_y, to_marker, wall_threshold,
+                            marker_margin)
+    if not visible.any():
+        return None
+
+    x, y = x[visible], y[visible]
+    targets = np.zeros_like(reachable)
+    targets[rows[visible] - reachable_offset[0], cols[visible] - reachable_offset[1]] = True
+    start = closest_cell(reachable, robot_row - reachable_offset[0],
+                         robot_col - reachable_offset[1])
+    hit = wavefront_targets(reachable, start, targets)
+    hit = hit[rows[visible] - reachable_offset[0], cols[visible] - reachable_offset[1]]
+    if not hit.any():
+        return None
+
+    straight = np.hypot(x - robot_x, y - robot_y)
+    best = int(np.argmin(np.where(hit, straight, np.inf)))
+    yaw = math.atan2(marker_y - y[best], marker_x - x[best])
+    return float(x[best]), float(y[best]), yaw
+
+
+def reachable_window(reachable, offset, rows, cols):
+    """Samples the reachable mask at the grid cells (rows, cols), False outside of it."""
+    local_rows = rows - offset[0]
+    local_cols = cols - offset[1]
+    height, width = reachable.shape
+    inside = (local_rows >= 0) & (local_rows < height) & (local_cols >= 0) & (local_cols < width)
+    values = reachable[np.clip(local_rows, 0, height - 1), np.clip(local_cols, 0, width - 1)]
+    return inside & values
+
+
+def closest_cell(mask, row, col):
+    """The cell of the mask closest to (row, col)."""
+    mask_rows, mask_cols = np.nonzero(mask)
+    closest = int(np.argmin((mask_rows - row)**2 + (mask_cols - col)**2))
+    return int(mask_rows[closest]), int(mask_cols[closest])
+
+
+def wavefront_targets(passable, start, targets):
+    """
+    Grows a 4-connected breadth-first wavefront over the passable cells from the start (row, col)
+    cell and returns the targets reached by the first wave that reaches any, i.e. the targets with
+    the shortest path from the start. Every wave is one vectorised dilation of the previous one.
+    """
+    reached = np.zeros_like(passable)
+    reached[start] = True
+    wave = reached.copy()
+    while wave.any():
+        hit = wave & targets
+        if hit.any():
+            return hit
+        grown = np.zeros_like(wave)
+        grown[1:] |= wave[:-1]
+        grown[:-1] |= wave[1:]
+        grown[:, 1:] |= wave[:, :-1]
+        grown[:, :-1] |= wave[:, 1:]
+        wave = grown & passable & ~reached
+        reached |= wave
+    return np.zeros_like(targets)
+
+
+def line_of_sight(grid, info, x, y, target_x, target_y, distances, wall_threshold, target_margin):
+    """
+    Whether the segments from the points (x, y) to the target cross no wall, sampling every segment
+    once per cell. The last target_margin (m) of every segment is not checked.
+    """
+    resolution = info.resolution
+    height, width = grid.shape
+    samples = int(math.ceil(distances.max() / resolution)) + 1
+
+    # Fractions along each segment, stopping target_margin before the target
+    ends = np.clip(1 - target_margin / distances, 0, 1)
+    fractions = np.linspace(0, 1, samples)[None, :] * ends[:, None]
+    sample_x = x[:, None] + (target_x - x[:, None]) * fractions
+    sample_y = y[:, None] + (target_y - y[:, None]) * fractions
+
+    rows = np.floor((sample_y - info.origin.position.y) / resolution).astype(np.int64)
+    cols = np.floor((sample_x - info.origin.position.x) / resolution).astype(np.int64)
+    inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+    values = np.where(inside, grid[np.clip(rows, 0, height - 1), np.clip(cols, 0, width - 1)], -1)
+    return ~(values >= wall_threshold).any(axis=1)
@@ -1,9 +1,11 @@
 import numpy as np
 import rclpy
+import rclpy.duration
 import math
 import time
 from random import randrange
 from rclpy.node import Node
+from rclpy.qos import QoSProfile, QoSHistoryPolicy, QoSReliabilityPolicy
 from geometry_msgs.msg import PoseWithCovarianceStamped
 from geometry_msgs.msg import PoseStamped
 from geometry_msgs.msg import PointStamped
@@ -13,12 +15,14 @@ import cv2
 from cv_bridge import CvBridge
 from sensor_msgs.msg import Image
 import os
+import threading
 from tf2_ros import TransformException
 from tf2_ros.buffer import Buffer
 from tf2_ros.transform_listener import TransformListener
-import tf2_geometry_msgs
-from collections import defaultdict
+from collections import defaultdict, deque
 from visualization_msgs.msg import Marker, MarkerArray
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+from autopilot_package.gray_converter import GrayConverter
 
 
 
@@ -39,6 +43,9 @@ class Aruco_detect(Node):
         # Initialize cv_bridge
         self.bridge = CvBridge()
 
+        # Conversion of the frames to grayscale, reusing its output buffer
+        self.gray_converter = GrayConverter(self.bridge)
+
         # Initialize aruco dictionary
         self.aruco_dict = cv2.aruco.Dictionary_get(cv2.aruco.DICT_6X6_250)
         self.aruco_params = cv2.aruco.DetectorParameters_create()
@@ -52,6 +59,9 @@ class Aruco_detect(Node):
         self.tf_buffer = Buffer()
         self.tf_listener = TransformListener(self.tf_buffer, self)
 
+        # Maximum wait (s) for the camera transform at the capture time of a frame
+        self.transform_timeout = 0.1
+
         # Dictionary to store ArUco marker positions
         self.aruco_positions = defaultdict(list)
         
@@ -62,6 +72,35 @@ class Aruco_detect(Node):
 
         self.received_image = False
 
+        # Latest camera frame waiting for detection, older frames are overwritten
+        self.frame_lock = threading.Lock()
+        self.latest_frame = None
+        self.frame_available = threading.Event()
+
+        # Frame statistics: received, overwritten before being processed, processed, and the summed
+        # delay (s) from capture to the end of detection, reset at every report
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.frames_processed = 0
+        self.detection_latency = 0.0
+        self.max_detection_latency = 0.0
+
+        self.stats_period = 5.0
+        self.stats_timer = self.create_timer(self.stats_period, self.publish_frame_stats)
+
+        # Marker positions found by the detection worker, waiting to be published
+        self.detections = deque()
+
+        # Map positions of each marker are published (and stored) at most once every publish_period
+        # seconds
+        self.publish_period = 1.0
+        self.publish_timer = self.create_timer(self.publish_period, self.publish_detections)
+
+        # Detection runs in a worker thread so the callbacks never block
+        self.running = True
+        self.detection_thread = threading.Thread(target=self.detection_loop, daemon=True)
+        self.detection_thread.start()
+
         # Subscribe to /pose to determine the position of Turtlebot
         self.position_subscriber = self.create_subscription(
             PoseWithCovarianceStamped,
@@ -71,12 +110,18 @@ class Aruco_detect(Node):
             # callback_group=self.parallel_callback_group
         )
 
-        # Subscribe to image topic
+        # Subscribe to image topic, keeping only the latest frame (best effort, like the camera
+        # drivers publish)
+        latest_frame_qos = QoSProfile(
+            history=QoSHistoryPolicy.KEEP_LAST,
+            depth=1,
+            reliability=QoSReliabilityPolicy.BEST_EFFORT
+        )
         self.image_subscriber = self.create_subscription(
             Image,
             '/camera/image_raw',
             self.image_callback,
-            self.queue_size
+            latest_frame_qos
         )
 
         self.aruco_position_publisher = self.create_publisher(
@@ -96,6 +141,12 @@ class Aruco_detect(Node):
             'aruco_average_positions', 
             10
         )
+
+        self.diagnostics_publisher = self.create_publisher(
+            DiagnosticArray,
+            '/diagnostics',
+            10
+        )
     
 
     def current_position_callback(self, msg: PoseWithCovarianceStamped):
@@ -110,92 +161,208 @@ class Aruco_detect(Node):
         self.robot_orientation = [orientation_q.x, orientation_q.y, orientation_q.z, orientation_q.w]
 
     def image_callback(self, msg: Image):
-
+        """
+        Stores the latest frame for the detection worker, replacing the one not processed yet.
+        """
         if not self.received_image:
             self.get_logger().info('Received image for ArUco detection')
             self.received_image = True
 
+        with self.frame_lock:
+            self.frames_received += 1
+            if self.latest_frame is not None:
+                self.frames_dropped += 1
+            self.latest_frame = msg
+        self.frame_available.set()
+
+    def detection_loop(self):
+        """
+        Worker thread: detects the markers of the latest frame and queues their positions for
+        publication.
+        """
+        while self.running:
+            if not self.frame_available.wait(timeout=0.5):
+                continue
+            with self.frame_lock:
+                msg = self.latest_frame
+                self.latest_frame = None
+                self.frame_available.clear()
+            if msg is None:
+                continue
+
+            try:
+                self.detections.extend(self.detect_markers(msg))
+            except Exception as e:
+                self.get_logger().error(f"Failed to process image: {e}")
+
+            delay = self.get_clock().now() - rclpy.time.Time.from_msg(msg.header.stamp)
+            latency = delay.nanoseconds / 1e9
+            with self.frame_lock:
+                self.frames_processed += 1
+                self.detection_latency += latency
+                self.max_detection_latency = max(self.max_detection_latency, latency)
+
+    def detect_markers(self, msg: Image):
+        """
+        Detects the ArUco markers of a frame and estimates their positions in the camera and map
+        frames.
+
+        Returns a list of (marker_id, camera frame PointStamped, map frame PointStamped or None).
+        """
+        detections = []
+
+        tag_size_in_meters = 0.1
+
+        # Convert ROS image message to a grayscale image, straight from its encoding
+        gray = self.gray_converter.convert(msg)
+
+        corners, ids, rejected = cv2.aruco.detectMarkers(gray, self.aruco_dict, parameters=self.aruco_params)
+
+        # Verify if corners detected the tag
+        if len(corners)>0:
+            self.get_logger().info(f"Detected corners: {corners}")
+
+
+        if self.camera_matrix is not None and self.dist_coeffs is not None:
+            assert self.camera_matrix.shape == (3, 3), "Incorrect format for camera_matrix"
+            assert self.dist_coeffs.shape == (1, 5) or self.dist_coeffs.shape == (
+            1, 4), "Incorrect format for dist_coeffs"
+        else:
+            self.get_logger().error("Camera parameters not loaded properly.")
+            return detections
+
+        # Detect Aruco tags
+        if ids is not None:
+            # If Aruco tags detected, print the tag IDs
+            self.get_logger().info(f"Detected ArUco marker(s) with ID(s): {ids}")
+
+            rvecs, tvecs, _ = cv2.aruco.estimatePoseSingleMarkers(corners, tag_size_in_meters, self.camera_matrix,
+                                                                  self.dist_coeffs)
+            if rvecs is None or tvecs is None:
+                self.get_logger().error("Failed to estimate pose for ArUco marker")
+                return detections
+
+            # Transform all the markers of the frame at once, with the camera pose at the capture
+            # time
+            positions = tvecs.reshape(-1, 3)
+            camera_to_map = self.lookup_camera_to_map(msg.header.stamp)
+            if camera_to_map is not None:
+                homogeneous = np.hstack([positions, np.ones((len(positions), 1))])
+                map_positions = homogeneous @ camera_to_map.T
+
+            for i, position in enumerate(positions):
+                marker_id = ids[i][0]  # Get the marker ID
+
+                self.get_logger().info(f"Tag ID: {marker_id}, Relative to camera: x={position[0]}, y={position[1]}, z={position[2]}")
+
+                aruco = PointStamped()
+                aruco.header.stamp = msg.header.stamp
+                aruco.header.frame_id = 'camera_rgb_optical_frame'
+                aruco.point.x = float(position[0])
+                aruco.point.y = float(position[1])
+                aruco.point.z = float(position[2])
+
+                aruco_map_frame = None
+                if camera_to_map is not None:
+                    aruco_map_frame = PointStamped()
+                    aruco_map_frame.header.stamp = msg.header.stamp
+                    aruco_map_frame.header.frame_id = 'map'
+                    aruco_map_frame.point.x = float(map_positions[i, 0])
+                    aruco_map_frame.point.y = float(map_positions[i, 1])
+                    aruco_map_frame.point.z = float(map_positions[i, 2])
+
+                    self.get_logger().info(f"Tag ID: {marker_id}, Global Position: x={aruco_map_frame.point.x}, y={aruco_map_frame.point.y}, z={aruco_map_frame.point.z}")
+
+                detections.append((marker_id, aruco, aruco_map_frame))
+
+        return detections
+
+    def lookup_camera_to_map(self, stamp):
+        """
+        4x4 homogeneous matrix from the camera frame to the map frame at the capture time stamp,
+        interpolated by tf2 and waiting at most transform_timeout for it. None if the transform is
+        not available.
+        """
         try:
-            # Convert ROS image message to OpenCV format
-            tag_size_in_meters = 0.1
-            cv_image = self.bridge.imgmsg_to_cv2(msg, desired_encoding='bgr8')
-
-            # Convert to grayscale image
-            gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-
-            corners, ids, rejected = cv2.aruco.detectMarkers(gray, self.aruco_dict, parameters=self.aruco_params)
-
-            # Verify if corners detected the tag
-            if len(corners)>0:
-                self.get_logger().info(f"Detected corners: {corners}")
-
-
-            if self.camera_matrix is not None and self.dist_coeffs is not None:
-                assert self.camera_matrix.shape == (3, 3), "Incorrect format for camera_matrix"
-                assert self.dist_coeffs.shape == (1, 5) or self.dist_coeffs.shape == (
-                1, 4), "Incorrect format for dist_coeffs"
-            else:
-                self.get_logger().error("Camera parameters not loaded properly.")
-                return
-
-            # Detect Aruco tags
-            if ids is not None:
-                # If Aruco tags detected, print the tag IDs
-                self.get_logger().info(f"Detected ArUco marker(s) with ID(s): {ids}")
-
-                rvecs, tvecs, _ = cv2.aruco.estimatePoseSingleMarkers(corners, tag_size_in_meters, self.camera_matrix,
-                                                                      self.dist_coeffs)
-                if rvecs is None or tvecs is None:
-                    self.get_logger().error("Failed to estimate pose for ArUco marker")
-                    return
-
-                for i, (rvec, tvec) in enumerate(zip(rvecs, tvecs)):
-                    marker_id = ids[i][0]  # Get the marker ID
-
-                    # Check the number of position stored of the marker with the same ID
-                    if len(self.aruco_positions[marker_id]) > self.pos_queue_size:
-                        self.get_logger().info(f"Maximum number of measures reached for ID {marker_id} ")
-                        continue
-                    
-                    self.get_logger().info(f"Tag ID: {marker_id}, Relative to camera: x={tvec[0][0]}, y={tvec[0][1]}, z={tvec[0][2]}")
-                    
-                    aruco = PointStamped()
-                    aruco.header.frame_id = 'camera_rgb_optical_frame'
-                    aruco.point.x = tvec[0][0]
-                    aruco.point.y = tvec[0][1]
-                    aruco.point.z = tvec[0][2]
-                    self.aruco_position_publisher.publish(aruco)
-
-                    try:
-                        self.tf_buffer.can_transform('map', 'camera_rgb_optical_frame', rclpy.time.Time())
-                        transform = self.tf_buffer.lookup_transform(
-                            'map',
-                            'camera_rgb_optical_frame',
-                            rclpy.time.Time())
-                        aruco_map_frame = tf2_geometry_msgs.do_transform_point(aruco, transform)
-                        
-                        self.get_logger().info(f"Tag ID: {marker_id}, Global Position: x={aruco_map_frame.point.x}, y={aruco_map_frame.point.y}, z={aruco_map_frame.point.z}")
-                        
-                        # Publish the transformed position
-                        self.aruco_map_position_publisher.publish(aruco_map_frame)
-                        
-
-                        # Store the position in the dictionary
-                        self.aruco_positions[marker_id].append(aruco_map_frame)
-                    
-                        
-                    
-                    except TransformException as ex:
-                        self.get_logger().error(f"Could not transform tag position to map frame: {ex}")
-                
-                    time.sleep(1)
-
-            else:
-                pass
+            transform = self.tf_buffer.lookup_transform(
+                'map',
+                'camera_rgb_optical_frame',
+                rclpy.time.Time.from_msg(stamp),
+                timeout=rclpy.duration.Duration(seconds=self.transform_timeout))
+        except TransformException as ex:
+            self.get_logger().error(f"Could not transform tag positions to map frame: {ex}")
+            return None
+
+        t = transform.transform.translation
+        x, y, z, w = (transform.transform.rotation.x, transform.transform.rotation.y,
+                      transform.transform.rotation.z, transform.transform.rotation.w)
+        return np.array([
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w), t.x],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w), t.y],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y), t.z],
+            [0.0, 0.0, 0.0, 1.0],
+        ])
+
+    def publish_detections(self):
+        """
+        Publishes the latest queued position of each detected marker and stores it for the
+        averages. Publication is rate limited by the timer period instead of sleeping in the image
+        callback.
+        """
+        latest = {}
+        while self.detections:
+            marker_id, aruco, aruco_map_frame = self.detections.popleft()
+            latest[marker_id] = (aruco, aruco_map_frame)
+
+        for marker_id, (aruco, aruco_map_frame) in latest.items():
+            # Check the number of position stored of the marker with the same ID
+            if len(self.aruco_positions[marker_id]) > self.pos_queue_size:
+                self.get_logger().info(f"Maximum number of measures reached for ID {marker_id} ")
+                continue
 
-        except Exception as e:
-            self.get_logger().error(f"Failed to process image: {e}")
+            self.aruco_position_publisher.publish(aruco)
+            if aruco_map_frame is not None:
+                # Publish the transformed position
+                self.aruco_map_position_publisher.publish(aruco_map_frame)
 
+                # Store the position in the dictionary
+                self.aruco_positions[marker_id].append(aruco_map_frame)
+
+    def publish_frame_stats(self):
+        """
+        Publishes the frame statistics of the last stats_period on /diagnostics and resets them.
+        """
+        with self.frame_lock:
+            received, dropped = self.frames_received, self.frames_dropped
+            processed = self.frames_processed
+            latency, max_latency = self.detection_latency, self.max_detection_latency
+            self.frames_received = self.frames_dropped = self.frames_processed = 0
+            self.detection_latency = self.max_detection_latency = 0.0
+
+        mean_latency = latency / processed if processed else 0.0
+
+        status = DiagnosticStatus()
+        status.level = DiagnosticStatus.OK if processed or not received else DiagnosticStatus.WARN
+        status.name = f"{self.get_name()}: ArUco frame processing"
+        status.message = (f"{processed / self.stats_period:.1f} frames/s processed, "
+                          f"{dropped} dropped")
+        status.values = [
+            KeyValue(key='frames_received', value=str(received)),
+            KeyValue(key='frames_dropped', value=str(dropped)),
+            KeyValue(key='frames_processed', value=str(processed)),
+            KeyValue(key='mean_latency', value=f"{mean_latency:.3f}"),
+            KeyValue(key='max_latency', value=f"{max_latency:.3f}"),
+        ]
+
+        diagnostics = DiagnosticArray()
+        diagnostics.header.stamp = self.get_clock().now().to_msg()
+        diagnostics.status.append(status)
+        self.diagnostics_publisher.publish(diagnostics)
+
+        if received:
+            self.get_logger().info(f"Frames received: {received}, dropped: {dropped}, "
+                                   f"processed: {processed}, "
+                                   f"latency: mean {mean_latency:.3f} s, max {max_latency:.3f} s")
 
     def update_estimates(self):
         """
@@ -283,11 +450,21 @@ class Aruco_detect(Node):
             self.get_logger().error("Failed to load camera parameters")
 
 
+    def destroy_node(self):
+        # Stop the detection worker before the node goes away
+        self.running = False
+        self.detection_thread.join(timeout=1.0)
+        super().destroy_node()
+
+
 def main():
     rclpy.init()
     aruco_detect_node = Aruco_detect()
     aruco_detect_node.get_logger().info('Running aruco detection node')
-    rclpy.spin(aruco_detect_node)
+    try:
+        rclpy.spin(aruco_detect_node)
+    finally:
+        aruco_detect_node.destroy_node()
 
 
 if __name__ == '__main__':
@@ -4,8 +4,13 @@ import math
 import time
 from random import randrange
 from rclpy.node import Node
+from rclpy.action import ActionClient
+from rclpy.qos import QoSProfile, QoSHistoryPolicy, QoSDurabilityPolicy, QoSReliabilityPolicy
+from rclpy.serialization import deserialize_message
+from rcl_interfaces.msg import SetParametersResult
 from nav_msgs.msg import OccupancyGrid
 from nav2_msgs.msg import BehaviorTreeLog
+from nav2_msgs.action import NavigateThroughPoses
 from geometry_msgs.msg import PoseWithCovarianceStamped
 from geometry_msgs.msg import PoseStamped
 from geometry_msgs.msg import PointStamped
@@ -13,6 +18,52 @@ from nav_msgs.msg import Path
 from sensor_msgs.msg import PointCloud2
 from sensor_msgs_py import point_cloud2
 from std_msgs.msg import Header
+from std_msgs.msg import String
+from visualization_msgs.msg import MarkerArray
+from autopilot_package.frontier import grid_to_array, find_frontier_clusters, free_mask, box_count
+from autopilot_package.frontier import cells_to_world, world_to_cell
+from autopilot_package.frontier import frontier_mask, reachable_mask, build_clusters
+from autopilot_package.known_region import KnownRegion
+from autopilot_package.tiled_grid import TiledGrid
+from autopilot_package.parallel_scoring import ParallelScorer, score_frontier_cells
+from autopilot_package.coordination import ClaimBoard
+from autopilot_package.visit_heatmap import VisitHeatmap
+from autopilot_package.camera_coverage import CameraCoverage
+from autopilot_package.room_segmentation import RoomSegmentation
+from autopilot_package.frontier_memory import FrontierMemory
+from autopilot_package.approach_solver import solve_approach_pose, line_of_sight
+from autopilot_package.marker_registry import MarkerRegistry
+from autopilot_package.progress_watchdog import ProgressWatchdog
+from autopilot_package.tour_planner import TourPlanner, heading_costs
+
+
+# Planner settings exposed as ROS parameters, they can be changed while a mission is running
+PLANNER_PARAMETERS = (
+    'obstacle_probability', 'desired_distance', 'min_distance', 'max_distance', 'strategy_counter',
+    'strategy_counter_reset', 'uncertain_box_size', 'frontier_box_size',
+    'frontier_uncertain_threshold', 'frontier_obstacle_threshold', 'max_points_checked',
+    'max_not_in_range', 'min_frontier_size',
+    'heading_weight', 'use_tour_planner', 'use_room_planner', 'use_tiled_grid', 'continuous_mode',
+    'waypoint_batch_size', 'scoring_kernel', 'scoring_backend', 'coordination_mode', 'robot_id',
+    'approach_tolerance', 'approach_clearance', 'retrace_clearance', 'retrace_heat_tolerance',
+    'view_min_distance', 'view_max_distance', 'min_unseen_wall_size', 'room_penalty_threshold',
+    'retrace_timeout',
+)
+
+# Settings of the helper objects exposed as ROS parameters: name -> (helper attribute of the node,
+# setting)
+HELPER_PARAMETERS = {
+    'watchdog_window': ('progress_watchdog', 'window'),
+    'watchdog_min_rate': ('progress_watchdog', 'min_rate'),
+    'claim_radius': ('claim_board', 'claim_radius'),
+    'known_region_margin': ('known_region', 'margin'),
+    'door_width': ('room_segmentation', 'door_width'),
+    'frontier_decay_time': ('frontier_memory', 'decay_time'),
+    'heatmap_half_life': ('visit_heatmap', 'half_life'),
+}
+
+SCORING_KERNELS = ('uncertain_box', 'information_gain')
+SCORING_BACKENDS = ('serial', 'process')
 
 
 class Autopilot(Node):
@@ -29,12 +80,46 @@ class Autopilot(Node):
         # Allow callback functions to be called in parallel
         #self.parallel_callback_group = ReentrantCallbackGroup()
 
-        #counter for new strategies when map is fully searched
-        self.new_strat_counter = 0
-
         #Initializing variable for tracking if map is fully mapped
         self.fully_mapped = False
 
+        # Number and total size of the reachable frontier clusters found in the last grid update
+        self.reachable_frontier_clusters = 0
+        self.reachable_frontier_cells = 0
+
+        # Free cells of the known region reachable from the robot in the last grid update
+        self.reachable = None
+
+        # Decaying count of the visits around each place, used to retrace the least recently
+        # visited areas
+        self.visit_heatmap = VisitHeatmap()
+
+        # Retracing goals must be at least this far (m) from obstacles, and heats within
+        # retrace_heat_tolerance of the coldest one are considered equal (the closest is chosen)
+        self.retrace_clearance = 0.3
+        self.retrace_heat_tolerance = 0.5
+
+        # Retracing stops once every reachable area was visited since it started, or after
+        # retrace_timeout (s). retrace_start holds the node and heatmap times it started at
+        self.retrace_timeout = 900.0
+        self.retrace_start = None
+        self.retrace_finished = False
+
+        # Walls the ArUco camera has looked at, updated when the robot moved or turned enough
+        self.camera_coverage = CameraCoverage()
+        self.coverage_pose = None
+        self.coverage_min_move = 0.1
+        self.coverage_min_turn = 0.1
+
+        # Unseen walls are viewed from view_min_distance to view_max_distance (m) away, groups of
+        # fewer than min_unseen_wall_size cells are ignored
+        self.view_min_distance = 0.8
+        self.view_max_distance = 2.0
+        self.min_unseen_wall_size = 5
+
+        # Wall the robot was last sent to view, marked as attempted when the next goal is chosen
+        self.viewing_wall = None
+
         # Initilizing the probablity at which we consider there to be an obstacle
         self.obstacle_probability = 75
 
@@ -47,7 +132,10 @@ class Autopilot(Node):
         # Initialize the number of waypoints published
         self.waypoint_counter = 0
 
-        self.goal_updated_counter=0
+        # Abandons exploration goals the robot stopped making progress towards, checked every
+        # watchdog_period (s)
+        self.progress_watchdog = ProgressWatchdog()
+        self.watchdog_period = 1.0
 
         # Initialize the number of waypoints published with the new strategy
         self.new_strategy_counter = 0
@@ -55,12 +143,53 @@ class Autopilot(Node):
         # Initiliazing distance to localise to ArUco marker
         self.desired_distance=1.5
 
+        # Accepted deviation (m) from desired_distance and minimum clearance (m) of the approach
+        # pose
+        self.approach_tolerance = 0.2
+        self.approach_clearance = 0.2
+
 
         self.aruco_detected = False
         self.localisation_started = False
 
-        # Initialize the current grid
-        self.current_grid = OccupancyGrid()
+        # Markers already seen, detections of localised markers no longer interrupt the exploration
+        self.marker_registry = MarkerRegistry()
+        self.approach_marker = None
+
+        # Initialize the current grid. Costmap messages are kept serialized and only deserialized
+        # when the planner needs them, grid_generation counts the messages received so far
+        self.deserialized_grid = OccupancyGrid()
+        self.raw_grid = None
+        self.grid_generation = 0
+        self.deserialized_generation = 0
+
+        # Generation of the grid the map processing and the frontier clusters were last computed
+        # on, and that grid, which the pose callbacks use instead of deserializing a newer one
+        self.processed_generation = 0
+        self.processed_grid = OccupancyGrid()
+        self.map_update_period = 1.0
+        self.cluster_cache = (None, [])
+
+        # Bounding box of the known cells, the grid processing only runs inside this crop
+        self.known_region = KnownRegion()
+        self.known_crop = None
+
+        # Sparse tiled copy of the costmap for very large maps, the tour then only scans the
+        # frontier tiles
+        self.use_tiled_grid = False
+        self.tiled_grid = TiledGrid(obstacle_probability=self.obstacle_probability)
+
+        # Size of the box around a cell in which new_strategy counts the uncertain cells
+        self.uncertain_box_size = 5
+
+        # Score used by new_strategy: 'uncertain_box' (uncertain cells around free cells) or
+        # 'information_gain' (unknown cells visible along rays cast from frontier cells)
+        self.scoring_kernel = 'uncertain_box'
+
+        # Where the information gain is computed: 'serial' or 'process' (tiles scored in a process
+        # pool)
+        self.scoring_backend = 'serial'
+        self.parallel_scorer = ParallelScorer()
 
         self.pose_to_aruco = PoseStamped()
 
@@ -80,9 +209,107 @@ class Autopilot(Node):
         #Initializing current position variable
         self.current_position = PoseStamped()
         self.current_position.header.frame_id = 'map'
+        self.robot_yaw = 0.0
 
-        #Initializing number of iterations before the strategy is changed
+        # Cost (m) added per radian of heading change towards a candidate, 0 ignores the
+        # orientation of the robot
+        self.heading_weight = 0.3
+
+        #Initializing number of iterations before the strategy is changed, and its reset value
         self.strategy_counter = 10
+        self.strategy_counter_reset = 5
+
+        # Random sampling: accepted distance (m) of a point from the robot, number of points
+        # checked and of points out of range before new_strategy is used
+        self.min_distance = 1.0
+        self.max_distance = 3.0
+        self.max_points_checked = 10000
+        self.max_not_in_range = 50
+
+        # A sampled point is on the frontier if the box of frontier_box_size cells around it has
+        # more than frontier_uncertain_threshold unknown cells (or, once fully mapped,
+        # frontier_obstacle_threshold obstacles)
+        self.frontier_box_size = 4
+        self.frontier_uncertain_threshold = 20
+        self.frontier_obstacle_threshold = 5
+
+        # Follow a tour over all frontier clusters instead of sampling random frontier cells
+        self.use_tour_planner = True
+
+        # Frontier clusters smaller than this number of cells are ignored by the tour
+        self.min_frontier_size = 8
+
+        # Greedy + 2-opt tour over the frontier clusters, repaired as clusters appear or vanish
+        self.tour_planner = TourPlanner()
+
+        # Finish the frontiers of the current room before moving on, rooms are visited following
+        # their own tour
+        self.use_room_planner = True
+        self.room_segmentation = RoomSegmentation()
+        self.room_tour_planner = TourPlanner(match_radius=1.5)
+
+        # Clusters with a frontier memory penalty (m) above this, e.g. recently failed or stubborn,
+        # do not keep the robot in their room
+        self.room_penalty_threshold = 3.0
+
+        # History of the frontier clusters, deprioritizing the ones that were targeted without
+        # shrinking
+        self.frontier_memory = FrontierMemory()
+
+        # Drive through a short batch of tour waypoints with NavigateThroughPoses instead of one
+        # goal_pose at a time
+        self.continuous_mode = False
+
+        # Number of waypoints sent in each batch and period (s) at which the batch is refreshed as
+        # the map grows
+        self.waypoint_batch_size = 3
+        self.batch_refresh_period = 2.0
+
+        # Goal handle of the batch being driven, keys of its clusters and generation of the map it
+        # was planned on
+        self.batch_goal_handle = None
+        self.batch_active = False
+        self.batch_keys = []
+        self.batch_map_generation = None
+
+        # Future of the batch goal request and what to do once a cancelled batch is gone
+        self.batch_goal_future = None
+        self.batch_cancel_callback = None
+
+        # Share claimed goals with the other robots exploring the same map, robot_id defaults to
+        # the namespace
+        self.coordination_mode = False
+        self.robot_id = self.get_namespace().strip('/') or self.get_name()
+        self.claim_board = ClaimBoard(self.robot_id)
+
+        # Override the settings above with the ROS parameters and apply their changes live
+        self.declare_planner_parameters()
+        self.add_on_set_parameters_callback(self.planner_parameters_callback)
+
+        # Action client to send batches of waypoints to Nav2
+        self.waypoint_batch_client = ActionClient(self, NavigateThroughPoses,
+                                                  'navigate_through_poses')
+        self.batch_refresh_timer = self.create_timer(self.batch_refresh_period,
+                                                     self.refresh_waypoint_batch)
+
+        self.watchdog_timer = self.create_timer(self.watchdog_period, self.check_progress)
+
+        # The claimed goal is published again while driving, before teammates expire it
+        self.claim_timer = self.create_timer(self.claim_board.refresh_period, self.refresh_claim)
+
+        # The map is processed at a fixed rate on the latest costmap only, however fast costmaps
+        # arrive
+        self.map_update_timer = self.create_timer(self.map_update_period, self.process_map_update)
+
+        # Only the latest costmap is kept, transient local to get the last one published before
+        # subscribing
+        latest_map_qos = QoSProfile(
+            history=QoSHistoryPolicy.KEEP_LAST,
+            depth=1,
+            reliability=QoSReliabilityPolicy.RELIABLE,
+            durability=QoSDurabilityPolicy.TRANSIENT_LOCAL
+        )
+        latest_pose_qos = QoSProfile(history=QoSHistoryPolicy.KEEP_LAST, depth=1)
 
         #Subscribe to /behavior_tree_log to determine when Turtlebot is ready for a new waypoint
         self.behaviortreelogstate = self.create_subscription(
@@ -97,17 +324,18 @@ class Autopilot(Node):
         self.potential_pos = OccupancyGrid()
         self.occupancy_grid = self.create_subscription(
             OccupancyGrid,
-            '/global_costmap/costmap',
+            'global_costmap/costmap',
             self.store_grid,
-            self.queue_size
+            latest_map_qos,
+            raw=True
         )
 
         #Subscribe to /pose to determine position of Turtlebot
         self.position_subscriber = self.create_subscription(
             PoseWithCovarianceStamped,
-            '/pose',
+            'pose',
             self.current_position_callback,
-            self.queue_size,
+            latest_pose_qos,
             #callback_group=self.parallel_callback_group
         )
 
@@ -118,6 +346,27 @@ class Autopilot(Node):
             1
         ) 
 
+        # Claims of all robots are exchanged on a single global topic
+        self.claim_subscriber = self.create_subscription(
+            String,
+            '/exploration_claims',
+            self.claim_callback,
+            self.queue_size
+        )
+
+        self.claim_publisher = self.create_publisher(
+            String,
+            '/exploration_claims',
+            self.queue_size
+        )
+
+        self.aruco_average_sub = self.create_subscription(
+            MarkerArray,
+            'aruco_average_positions',
+            self.aruco_average_callback,
+            1
+        )
+
         #Create publisher to publish next waypoint parameters to
         self.waypoint_publisher = self.create_publisher(
             PoseStamped,
@@ -145,21 +394,179 @@ class Autopilot(Node):
 
     
     
-    def store_grid(self,grid:OccupancyGrid):
+    def declare_planner_parameters(self):
+        """Declares the planner settings as ROS parameters, defaulting to their __init__ values."""
+        for name in PLANNER_PARAMETERS:
+            setattr(self, name, self.declare_parameter(name, getattr(self, name)).value)
+
+        for name, (helper, setting) in HELPER_PARAMETERS.items():
+            value = self.declare_parameter(name, getattr(getattr(self, helper), setting)).value
+            setattr(getattr(self, helper), setting, value)
+
+        self.apply_dependent_settings()
+
+    def planner_parameters_callback(self, parameters):
+        """Validates changed ROS parameters and applies them to the running planner."""
+        values = {parameter.name: parameter.value for parameter in parameters}
+
+        min_distance = values.get('min_distance', self.min_distance)
+        max_distance = values.get('max_distance', self.max_distance)
+        if min_distance >= max_distance:
+            return SetParametersResult(successful=False,
+                                       reason='min_distance must be smaller than max_distance')
+        if values.get('scoring_kernel', self.scoring_kernel) not in SCORING_KERNELS:
+            return SetParametersResult(successful=False,
+                                       reason=f'scoring_kernel must be one of {SCORING_KERNELS}')
+        if values.get('scoring_backend', self.scoring_backend) not in SCORING_BACKENDS:
+            return SetParametersResult(successful=False,
+                                       reason=f'scoring_backend must be one of {SCORING_BACKENDS}')
+        for name, value in values.items():
+            if isinstance(value, (int, float)) and not isinstance(value, bool) and value < 0:
+                return SetParametersResult(successful=False, reason=f'{name} must not be negative')
+        if values.get('waypoint_batch_size', self.waypoint_batch_size) < 1:
+            return SetParametersResult(successful=False,
+                                       reason='waypoint_batch_size must be at least 1')
+
+        for name, value in values.items():
+            if name in PLANNER_PARAMETERS:
+                setattr(self, name, value)
+            elif name in HELPER_PARAMETERS:
+                helper, setting = HELPER_PARAMETERS[name]
+                setattr(getattr(self, helper), setting, value)
+            else:
+                continue
+            self.get_logger().info(f'Parameter {name} set to {value}')
+
+        self.apply_dependent_settings()
+        return SetParametersResult(successful=True)
+
+    def apply_dependent_settings(self):
+        """Copies the settings shared with the helper objects."""
+        self.tiled_grid.set_obstacle_probability(self.obstacle_probability)
+        if not self.robot_id:
+            self.robot_id = self.get_namespace().strip('/') or self.get_name()
+        self.claim_board.robot_id = self.robot_id
+
+    def store_grid(self, raw_grid:bytes):
         """ 
-            Callback function of /map topic.
-            Everytime it receives the OccupacyGrid message it stores it.
-            At the start it launches the next_point() method since no message is received from the behavior_tree_log.
+            Callback function of the costmap topic. Everytime it receives the serialized
+            OccupacyGrid message it stores it, replacing the previous one without deserializing it.
+            At the start it launches the next_point() method since no message is received from the
+            behavior_tree_log.
         """
-        self.current_grid=grid
+        self.raw_grid = raw_grid
+        self.grid_generation += 1
 
         #Initiates looking for new waypoint if exploration has just started.
         #This is because readiness_check will not do this when exploration has just started
         if self.start:
             self.next_waypoint()
             self.start = False
-            
-            
+
+    @property
+    def current_grid(self):
+        """Latest costmap, deserialized the first time it is used."""
+        if self.deserialized_generation != self.grid_generation:
+            self.deserialized_grid = deserialize_message(self.raw_grid, OccupancyGrid)
+            self.deserialized_generation = self.grid_generation
+        return self.deserialized_grid
+
+    def process_map_update(self):
+        """
+        Updates the known region, the tiled store, the completion detector and the rooms with the
+        latest costmap. Nothing is recomputed if no costmap arrived since the last update.
+        """
+        if self.processed_generation == self.grid_generation:
+            return
+        self.processed_generation = self.grid_generation
+
+        grid = self.current_grid
+        self.processed_grid = grid
+        self.known_crop = self.known_region.update(grid_to_array(grid), grid.info)
+        if self.use_tiled_grid:
+            self.tiled_grid.update(grid_to_array(grid), grid.info, self.known_crop)
+        self.check_exploration_complete()
+        self.update_rooms()
+
+
+    def update_rooms(self):
+        """Segments the known free space into rooms again once it grew enough since last time."""
+        if not self.use_room_planner or self.known_crop is None:
+            return
+        grid = grid_to_array(self.current_grid)
+        now = self.get_clock().now().nanoseconds / 1e9
+        if self.room_segmentation.needs_update(grid, self.current_grid.info, self.known_crop, now):
+            self.room_segmentation.update(grid, self.current_grid.info, self.obstacle_probability,
+                                          self.known_crop, now)
+
+    def room_clusters(self, points, start, penalties):
+        """
+        Returns the mask of the clusters of the room the robot is in, or if that room has no
+        frontier left worth trying, of the clusters of the next room of the room-level tour.
+        Clusters whose penalty (m) exceeds room_penalty_threshold do not count, so a room is left
+        once only failed or stubborn frontiers remain.
+        """
+        available = penalties <= self.room_penalty_threshold
+        if not available.any():
+            # Everything is penalized, let the penalties order all the clusters
+            return np.ones(len(points), dtype=bool)
+
+        info = self.current_grid.info
+        rooms = self.room_segmentation.rooms_at(points[:, 0], points[:, 1], info)
+        current_room = self.room_segmentation.rooms_at(np.array([start[0]]), np.array([start[1]]),
+                                                       info)[0]
+
+        if current_room == 0 or not (available & (rooms == current_room)).any():
+            # Rooms with frontiers worth trying are visited in tour order, using the centroid of
+            # those clusters
+            room_ids = np.unique(rooms[available])
+            room_points = np.array([points[available & (rooms == room)].mean(axis=0)
+                                    for room in room_ids])
+            keys, room_tour = self.room_tour_planner.update(room_points, start)
+            current_room = room_ids[keys.index(room_tour[0])]
+            self.get_logger().info(f'Moving on to room {current_room}, '
+                                   f'{len(room_ids)} rooms have frontiers')
+
+        return rooms == current_room
+
+    def check_exploration_complete(self):
+        """
+        Counts the frontier clusters reachable from the robot after a grid update. Exploration is
+        complete, and the autopilot switches to retracing, as soon as no reachable cluster of
+        min_frontier_size cells is left.
+        """
+        if self.known_crop is None:
+            return
+        grid = grid_to_array(self.current_grid)
+        rows, cols = self.known_crop
+        region = grid[rows, cols]
+
+        robot_row, robot_col = world_to_cell(self.current_position.pose.position.x,
+                                             self.current_position.pose.position.y,
+                                             self.current_grid.info)
+        start = (min(max(robot_row - rows.start, 0), region.shape[0] - 1),
+                 min(max(robot_col - cols.start, 0), region.shape[1] - 1))
+        reachable = reachable_mask(free_mask(region, self.obstacle_probability), start)
+        self.reachable = reachable
+
+        frontiers = frontier_mask(region, self.obstacle_probability) & reachable
+        frontier_rows, frontier_cols = np.nonzero(frontiers)
+        clusters = build_clusters(frontier_rows, frontier_cols, self.current_grid.info,
+                                  self.min_frontier_size)
+        self.reachable_frontier_clusters = len(clusters)
+        self.reachable_frontier_cells = sum(cluster.size for cluster in clusters)
+
+        fully_mapped = not clusters
+        if fully_mapped != self.fully_mapped:
+            if fully_mapped:
+                self.get_logger().info('No reachable frontier left, exploration complete, '
+                                       'retracing...')
+                self.retrace_start = None
+                self.retrace_finished = False
+            else:
+                self.get_logger().info(f'{len(clusters)} reachable frontier clusters appeared, '
+                                       'exploring again')
+        self.fully_mapped = fully_mapped
 
     def next_waypoint(self):
         """
@@ -169,16 +576,33 @@ class Autopilot(Node):
         self (Node): Autopilot node currently running and storing waypoint decisions 
         """
 
+        # Plan on the latest costmap
+        self.process_map_update()
         self.width = self.current_grid.info.width
+
+        # Once exploration is complete, look at the walls the camera has not seen, then sweep the
+        # least recently visited areas
+        if self.fully_mapped and (self.unseen_wall_goal() or self.retrace_goal()):
+            self.publish_waypoint()
+            return
+        if self.fully_mapped and self.retrace_finished:
+            return
+
+        # In continuous mode drive through a batch of tour waypoints, goal_pose is only used
+        # without clusters
+        if self.continuous_mode and self.send_waypoint_batch():
+            return
+
+        # Follow the tour over the frontier clusters, sampling is only used when no cluster is left
+        if self.use_tour_planner and self.tour_goal():
+            self.publish_waypoint()
+            return
+
         isthisagoodwaypoint = False
 
         not_in_range_count=0
         points_checked = 0
 
-
-        min_distance = 1
-        max_distance = 3
-
         still_looking = False
         occupancy_data_np = np.array(self.current_grid.data)
 
@@ -189,16 +613,10 @@ class Autopilot(Node):
                 points_checked += 1
 
 
-                if self.new_strat_counter > 5:
-                    self.get_logger().info('Could not find point after 5 new strategy searches, map is likely fully resolved, retracing...')
-                    time.sleep(2)
-                    self.fully_mapped = True
-                    self.new_strat_counter = 0
-                if points_checked > 10000:
+                if points_checked > self.max_points_checked:
                     self.get_logger().info('Maximum number of iterations exceeded, adopting new strategy...')
                     time.sleep(2)
                     self.new_strategy()
-                    self.new_strat_counter += 1
                     isthisagoodwaypoint = True
                     break
 
@@ -208,8 +626,13 @@ class Autopilot(Node):
                     self.get_logger().info('Searching for good point...')
                     still_looking = True
 
-                # Taking a random cell and the corresponding cost value
-                random_index = randrange(occupancy_data_np.size)
+                # Taking a random cell of the known region and the corresponding cost value
+                if self.known_crop is None:
+                    random_index = randrange(occupancy_data_np.size)
+                else:
+                    rows, cols = self.known_crop
+                    random_index = (randrange(rows.start, rows.stop) * self.width
+                                    + randrange(cols.start, cols.stop))
                 self.potential_pos = occupancy_data_np[random_index]
 
                 # Check that the cell is not unknown
@@ -236,9 +659,9 @@ class Autopilot(Node):
                     )
 
 
-                    if min_distance < distance2new < max_distance or self.start:
-                        self.new_waypoint.pose.position.x = self.potential_coordinate.point.x
-                        self.new_waypoint.pose.position.y = self.potential_coordinate.point.y
+                    if self.min_distance < distance2new < self.max_distance or self.start:
+                        self.set_new_waypoint(self.potential_coordinate.point.x,
+                                              self.potential_coordinate.point.y)
                         self.get_logger().info('Point Distance:' + str(distance2new))
                 
                         isthisagoodwaypoint = True
@@ -253,7 +676,7 @@ class Autopilot(Node):
 
                         # If the point is not in range for 30 iterations, adopt a new strategy
                         not_in_range_count += 1
-                        if not_in_range_count > 50:
+                        if not_in_range_count > self.max_not_in_range:
                             self.get_logger().info('Could not find point in range, adopting new strategy...')
                             self.new_strategy()
                             isthisagoodwaypoint = True
@@ -261,80 +684,491 @@ class Autopilot(Node):
                         
         #New strategy
         else:
-            self.strategy_counter = 5
+            self.strategy_counter = self.strategy_counter_reset
             self.new_strategy()
            
-        #Publish the new waypoint
+        self.publish_waypoint()
+
+    def set_new_waypoint(self, x, y, yaw=0.0):
+        """Sets the new waypoint facing yaw (rad), so it never inherits a previous orientation."""
+        self.new_waypoint.pose.position.x = float(x)
+        self.new_waypoint.pose.position.y = float(y)
+        self.new_waypoint.pose.orientation.x = 0.0
+        self.new_waypoint.pose.orientation.y = 0.0
+        self.new_waypoint.pose.orientation.z = math.sin(yaw / 2)
+        self.new_waypoint.pose.orientation.w = math.cos(yaw / 2)
+
+    def publish_waypoint(self):
+        """Publishes the new waypoint as the next navigation goal."""
         self.get_logger().info('Publishing waypoint...')
         self.waypoint_publisher.publish(self.new_waypoint)
         self.waypoint_counter += 1
+        self.progress_watchdog.start(self.new_waypoint.pose.position.x,
+                                     self.new_waypoint.pose.position.y,
+                                     self.get_clock().now().nanoseconds / 1e9)
+        self.publish_claim(self.new_waypoint.pose.position.x, self.new_waypoint.pose.position.y)
+
+    def publish_claim(self, x, y):
+        """Tells the other robots which goal this robot is heading to."""
+        if not self.coordination_mode:
+            return
+        if self.current_position.header.frame_id != self.claim_board.frame_id:
+            self.get_logger().warn(f'Not claiming the goal, the robot position is in the '
+                                   f'{self.current_position.header.frame_id} frame')
+            return
+        claim = String()
+        claim.data = self.claim_board.claim(x, y, self.current_position.pose.position.x,
+                                            self.current_position.pose.position.y)
+        self.claim_publisher.publish(claim)
+
+    def refresh_claim(self):
+        """
+        Publishes the claimed goal again, with the current robot position, until the robot reaches
+        it or a new goal replaces it.
+        """
+        goal = self.claim_board.goal
+        if not self.coordination_mode or goal is None:
+            return
+        position = self.current_position.pose.position
+        if (math.hypot(goal[0] - position.x, goal[1] - position.y)
+                <= self.progress_watchdog.goal_tolerance):
+            self.claim_board.release()
+            return
+        self.publish_claim(*goal)
+
+    def claim_callback(self, msg:String):
+        """Stores the goals claimed by the other robots."""
+        if self.coordination_mode:
+            self.claim_board.receive(msg.data, self.get_clock().now().nanoseconds / 1e9)
+
+    def update_tour(self):
+        """
+        Updates the tour over the current frontier clusters.
+        Returns the clusters in visiting order and their tour keys.
+        """
+        # Clusters are only detected again when a new costmap arrived
+        self.process_map_update()
+        if self.cluster_cache[0] == self.grid_generation:
+            clusters = self.cluster_cache[1]
+        elif self.use_tiled_grid:
+            clusters = self.tiled_grid.frontier_clusters(self.current_grid.info,
+                                                         self.min_frontier_size)
+        else:
+            grid = grid_to_array(self.current_grid)
+            clusters = find_frontier_clusters(grid, self.current_grid.info,
+                                              self.obstacle_probability, self.min_frontier_size,
+                                              self.known_crop)
+        self.cluster_cache = (self.grid_generation, clusters)
+        if not clusters:
+            return [], []
+
+        points = np.array([[cluster.x, cluster.y] for cluster in clusters])
+        start = (self.current_position.pose.position.x, self.current_position.pose.position.y)
+        now = self.get_clock().now().nanoseconds / 1e9
+
+        # Deprioritize the clusters that keep being targeted without shrinking, and the ones near
+        # failed goals. The memory is updated with every cluster, so the ones filtered out below
+        # keep their history
+        keys = self.tour_planner.match(points)
+        self.frontier_memory.update(keys, [cluster.size for cluster in clusters], now)
+        penalties = self.frontier_memory.penalties(keys, points, now)
+
+        if self.use_room_planner:
+            keep = self.room_clusters(points, start, penalties)
+            clusters = [cluster for cluster, kept in zip(clusters, keep) if kept]
+            keys = [key for key, kept in zip(keys, keep) if kept]
+            points, penalties = points[keep], penalties[keep]
+
+        # Prefer clusters ahead of the robot for the first leg of the tour
+        start_costs = heading_costs(points, start, self.robot_yaw, self.heading_weight) + penalties
+
+        if self.coordination_mode:
+            # Avoid the goals claimed by teammates and leave them the clusters they reach more
+            # cheaply
+            start_costs = start_costs + self.claim_board.penalties(points, now)
+            available = self.claim_board.assign(points, start_costs, now)
+            if available.any():
+                clusters = [cluster for cluster, keep in zip(clusters, available) if keep]
+                keys = [key for key, keep in zip(keys, available) if keep]
+                points, start_costs = points[available], start_costs[available]
+
+        keys, tour = self.tour_planner.update(points, start, start_costs, keys)
+
+        return [clusters[keys.index(key)] for key in tour], tour
+
+    def tour_goal(self):
+        """
+        Sets the new waypoint to the first cluster of the tour.
+        Returns False if there is no frontier cluster to visit.
+        """
+        ordered, tour = self.update_tour()
+        if not ordered:
+            self.get_logger().info('No frontier cluster left for the tour')
+            return False
 
-    def new_strategy(self):
-        """Processes the occupancy grid and creates a sorted list of cells based on the number of uncertain cells around them."""
+        goal = ordered[0]
+        self.frontier_memory.record_target(tour[0], self.get_clock().now().nanoseconds / 1e9)
+        self.set_new_waypoint(goal.x, goal.y)
+        self.potential_coordinate.point.x = goal.x
+        self.potential_coordinate.point.y = goal.y
+        self.potential_publisher.publish(self.potential_coordinate)
 
-        self.get_logger().info('New Strategy: Processing occupancy grid ...')
-        occupancy_data_np = np.array(self.current_grid.data)
-        width = self.current_grid.info.width
-        height = self.current_grid.info.height
-        counts_list = []
-        # Iterate over all cells in the occupancy grid
-        for index in range(len(occupancy_data_np)) :
-            
-            if occupancy_data_np[index] == -1 or occupancy_data_np[index] >= self.obstacle_probability:
-                continue
+        self.get_logger().info(f'Tour over {len(tour)} frontier clusters, '
+                               f'next cluster has {goal.size} cells')
+        return True
+
+    def retrace_goal(self):
+        """
+        Sets the new waypoint to the reachable free cell with the coldest visit heat, away from
+        obstacles, among the areas not visited since retracing started. Returns False if no
+        reachable cell is known, or once retracing finished: every reachable area was visited or
+        retrace_timeout elapsed.
+        """
+        if self.retrace_finished:
+            return False
+        if (self.reachable is None or self.known_crop is None
+                or self.reachable.shape != self.known_crop_shape()):
+            return False
 
-            [self.potential_coordinate.point.x, self.potential_coordinate.point.y] = self.cell_coordinates(index)
+        now = self.get_clock().now().nanoseconds / 1e9
+        if self.retrace_start is None:
+            heatmap_stamp = self.visit_heatmap.last_stamp
+            self.retrace_start = (now, -np.inf if heatmap_stamp is None else heatmap_stamp)
+        if now - self.retrace_start[0] > self.retrace_timeout:
+            self.get_logger().info(f'Retracing stopped after {self.retrace_timeout:.0f} s')
+            self.retrace_finished = True
+            return False
+        rows, cols = self.known_crop
+        grid = grid_to_array(self.current_grid)
+        region = grid[rows, cols]
+
+        # Keep away from obstacles when possible so the goal is not rejected by Nav2
+        clearance = max(int(self.retrace_clearance / self.current_grid.info.resolution), 0)
+        clear = box_count(region >= self.obstacle_probability, clearance) == 0
+        candidates = self.reachable & clear
+        if not candidates.any():
+            candidates = self.reachable
+        if not candidates.any():
+            return False
 
-            distance2new = math.sqrt(
-                        (self.potential_coordinate.point.x - self.current_position.pose.position.x)**2 +
-                        (self.potential_coordinate.point.y- self.current_position.pose.position.y)**2
-                    ) 
+        candidate_rows, candidate_cols = np.nonzero(candidates)
+        x, y = cells_to_world(candidate_rows + rows.start, candidate_cols + cols.start,
+                              self.current_grid.info)
+        # Areas visited since retracing started are done
+        pending = ~self.visit_heatmap.visited_since(x, y, self.retrace_start[1])
+        if not pending.any():
+            self.get_logger().info('Retracing complete, every reachable area was visited')
+            self.retrace_finished = True
+            return False
+        x, y = x[pending], y[pending]
+
+        heat = self.visit_heatmap.values(x, y)
+        distances = np.hypot(x - self.current_position.pose.position.x,
+                             y - self.current_position.pose.position.y)
+
+        # Closest cell among the coldest ones, so every sweep leg stays short
+        coldest = heat <= heat.min() + self.retrace_heat_tolerance
+        best = int(np.argmin(np.where(coldest, distances, np.inf)))
+
+        self.set_new_waypoint(x[best], y[best])
+        self.potential_coordinate.point.x = float(x[best])
+        self.potential_coordinate.point.y = float(y[best])
+        self.potential_publisher.publish(self.potential_coordinate)
+
+        self.get_logger().info(f'Retracing: visit heat {heat[best]:.2f}, '
+                               f'distance {distances[best]:.2f}')
+        return True
+
+    def unseen_wall_goal(self):
+        """
+        Sets the new waypoint to a reachable cell from which the closest group of unseen wall cells
+        can be viewed, facing the wall. Every wall is tried once: the wall viewed last is marked as
+        attempted when the next goal is chosen, and walls no reachable cell has a line of sight to
+        are marked right away. Returns False if every wall was seen or attempted.
+        """
+        if self.viewing_wall is not None:
+            self.camera_coverage.mark_attempted(*self.viewing_wall)
+            self.viewing_wall = None
 
-            # Check if the distance is greater than 9 meters and counter is not a multiple of four
-            if distance2new > 5 and self.new_strategy_counter % 4 != 0:
+        if (self.reachable is None or self.known_crop is None
+                or self.reachable.shape != self.known_crop_shape()):
+            return False
+        rows, cols = self.known_crop
+        grid = grid_to_array(self.current_grid)
+        info = self.current_grid.info
+
+        unseen = self.camera_coverage.unseen_walls(grid, info, self.known_crop)
+        wall_rows, wall_cols = np.nonzero(unseen)
+        walls = build_clusters(wall_rows + rows.start, wall_cols + cols.start, info,
+                               self.min_unseen_wall_size)
+        walls = [wall for wall in walls if not self.camera_coverage.was_attempted(wall.x, wall.y)]
+        if not walls:
+            return False
+
+        candidate_rows, candidate_cols = np.nonzero(self.reachable)
+        x, y = cells_to_world(candidate_rows + rows.start, candidate_cols + cols.start, info)
+        robot_x = self.current_position.pose.position.x
+        robot_y = self.current_position.pose.position.y
+        to_robot = np.hypot(x - robot_x, y - robot_y)
+
+        # Closest walls first, the viewing cell is the reachable cell in viewing range, with a line
+        # of sight to the wall, closest to the robot
+        walls.sort(key=lambda wall: math.hypot(wall.x - robot_x, wall.y - robot_y))
+        for wall in walls:
+            to_wall = np.hypot(x - wall.x, y - wall.y)
+            in_view = np.flatnonzero((to_wall >= self.view_min_distance)
+                                     & (to_wall <= self.view_max_distance))
+            if in_view.size:
+                # The wall cell itself and the cell before it are not checked
+                visible = line_of_sight(grid, info, x[in_view], y[in_view], wall.x, wall.y,
+                                        to_wall[in_view], self.camera_coverage.wall_threshold,
+                                        2 * info.resolution)
+                in_view = in_view[visible]
+            if not in_view.size:
+                self.camera_coverage.mark_attempted(wall.x, wall.y)
                 continue
-            else: 
-                # Count the number of uncertain cells around the current cell and append to the list
-                uncertain_count = self.count_uncertain_cells_around(index, occupancy_data_np, width, height)
-                counts_list.append((index, uncertain_count))
+            best = int(in_view[np.argmin(to_robot[in_view])])
 
-        # Sort the list by uncertain_count in descending order
-        sorted_counts = sorted(counts_list, key=lambda x: x[1], reverse=True)
-        
-        try:
-            [self.new_waypoint.pose.position.x,self.new_waypoint.pose.position.y]  = self.cell_coordinates(sorted_counts[0][0])
-            [self.potential_coordinate.point.x, self.potential_coordinate.point.y] = self.cell_coordinates(sorted_counts[0][0])
-        except IndexError as e:
-            self.get_logger().error(f"List of points is empty: {e}")
+            self.set_new_waypoint(x[best], y[best], math.atan2(wall.y - y[best], wall.x - x[best]))
+            self.viewing_wall = (wall.x, wall.y)
 
-        distance2new = math.sqrt(
-                        (self.potential_coordinate.point.x - self.current_position.pose.position.x)**2 +
-                        (self.potential_coordinate.point.y- self.current_position.pose.position.y)**2
-                    )
-        
-        self.get_logger().info('New Strategy: Point Distance:' + str(distance2new))
+            self.potential_coordinate.point.x = wall.x
+            self.potential_coordinate.point.y = wall.y
+            self.potential_publisher.publish(self.potential_coordinate)
+            self.get_logger().info(f'Viewing {len(walls)} unseen walls, '
+                                   f'next one has {wall.size} cells')
+            return True
+
+        return False
+
+    def update_camera_coverage(self):
+        """
+        Raycasts the camera field of view from the current pose once the robot moved enough.
+        The pose check comes first and the grid of the last map update is used, so pose messages
+        never deserialize a costmap.
+        """
+        x = self.current_position.pose.position.x
+        y = self.current_position.pose.position.y
+        if self.coverage_pose is not None:
+            last_x, last_y, last_yaw = self.coverage_pose
+            turn = abs(math.atan2(math.sin(self.robot_yaw - last_yaw),
+                                  math.cos(self.robot_yaw - last_yaw)))
+            moved = math.hypot(x - last_x, y - last_y)
+            if moved < self.coverage_min_move and turn < self.coverage_min_turn:
+                return
+
+        grid = self.processed_grid
+        if grid.info.width == 0:
+            return
+        self.camera_coverage.update(grid_to_array(grid), grid.info, x, y, self.robot_yaw)
+        self.coverage_pose = (x, y, self.robot_yaw)
+
+    def known_crop_shape(self):
+        """Shape of the known region crop."""
+        rows, cols = self.known_crop
+        return (rows.stop - rows.start, cols.stop - cols.start)
+
+    def send_waypoint_batch(self):
+        """
+        Sends the first waypoint_batch_size clusters of the tour to Nav2 as a single
+        NavigateThroughPoses goal, so the robot keeps its speed through the intermediate waypoints.
+        Returns False if there is nothing to send or the action server is not available.
+        """
+        if not self.waypoint_batch_client.server_is_ready():
+            self.get_logger().warn('navigate_through_poses is not available, '
+                                   'publishing single goals')
+            return False
+
+        ordered, tour = self.update_tour()
+        if not ordered:
+            return False
+
+        goal = NavigateThroughPoses.Goal()
+        previous_x = self.current_position.pose.position.x
+        previous_y = self.current_position.pose.position.y
+        for cluster in ordered[:self.waypoint_batch_size]:
+            pose = PoseStamped()
+            pose.header.frame_id = 'map'
+            pose.header.stamp = self.get_clock().now().to_msg()
+            pose.pose.position.x = cluster.x
+            pose.pose.position.y = cluster.y
+
+            # Face along the direction of travel so no rotation is needed at intermediate waypoints
+            angle = math.atan2(cluster.y - previous_y, cluster.x - previous_x)
+            pose.pose.orientation.z = math.sin(angle / 2)
+            pose.pose.orientation.w = math.cos(angle / 2)
+            goal.poses.append(pose)
+            previous_x, previous_y = cluster.x, cluster.y
+
+        # A refreshed batch heading to the same cluster is not a new visit
+        if not self.batch_keys or tour[0] != self.batch_keys[0]:
+            self.frontier_memory.record_target(tour[0], self.get_clock().now().nanoseconds / 1e9)
+
+        # The batch being replaced no longer chains the next one when its result arrives
+        self.batch_goal_handle = None
+        self.batch_keys = tour[:self.waypoint_batch_size]
+        self.batch_map_generation = self.grid_generation
+        self.batch_active = True
+        self.get_logger().info(f'Sending batch of {len(goal.poses)} waypoints')
+        self.progress_watchdog.start(ordered[0].x, ordered[0].y,
+                                     self.get_clock().now().nanoseconds / 1e9)
+        self.publish_claim(ordered[0].x, ordered[0].y)
+
+        future = self.waypoint_batch_client.send_goal_async(goal)
+        future.add_done_callback(self.waypoint_batch_response)
+        self.batch_goal_future = future
+        self.waypoint_counter += 1
+        return True
+
+    def waypoint_batch_response(self, future):
+        """Stores the handle of an accepted batch and waits for its result."""
+        # Batches replaced by a refresh are preempted by the server
+        if future is not self.batch_goal_future:
+            return
+
+        goal_handle = future.result()
+        if not goal_handle.accepted:
+            self.get_logger().warn('Waypoint batch rejected')
+            if self.batch_cancel_callback is not None:
+                self.waypoint_batch_cancelled(None)
+            self.batch_active = False
+            return
+
+        self.batch_goal_handle = goal_handle
+        goal_handle.get_result_async().add_done_callback(
+            lambda result_future: self.waypoint_batch_result(goal_handle))
+
+        # The batch was cancelled while its request was in flight
+        if self.batch_cancel_callback is not None:
+            self.request_batch_cancel()
+
+    def waypoint_batch_result(self, goal_handle):
+        """Sends the next batch when the batch being driven finishes."""
+        # Results of batches replaced by a refresh are ignored
+        if goal_handle is not self.batch_goal_handle:
+            return
+
+        self.batch_goal_handle = None
+        self.batch_active = False
+        if not self.aruco_detected:
+            self.next_waypoint()
+
+    def refresh_waypoint_batch(self):
+        """
+        Replaces the batch being driven when the map has changed and the upcoming waypoints of the
+        tour differ.
+        """
+        if not self.continuous_mode or not self.batch_active or self.aruco_detected:
+            return
+        if self.batch_cancel_callback is not None:
+            return
+        if self.grid_generation == self.batch_map_generation:
+            return
+
+        self.batch_map_generation = self.grid_generation
+        ordered, tour = self.update_tour()
+        if tour[:self.waypoint_batch_size] != self.batch_keys:
+            self.get_logger().info('Tour changed, refreshing waypoint batch')
+            self.send_waypoint_batch()
+
+    def cancel_waypoint_batch(self, then):
+        """
+        Cancels the batch being driven and calls then() once Nav2 has processed the cancellation,
+        so the goal sent next, e.g. the approach of an ArUco marker, is not cancelled with it.
+        A batch whose request is still in flight is cancelled as soon as it is accepted.
+        """
+        if not self.batch_active:
+            then()
+            return
+
+        self.batch_cancel_callback = then
+        if self.batch_goal_handle is not None:
+            self.request_batch_cancel()
+
+    def request_batch_cancel(self):
+        """Asks Nav2 to cancel the accepted batch."""
+        goal_handle = self.batch_goal_handle
+        # The result of the cancelled batch does not chain the next one
+        self.batch_goal_handle = None
+        goal_handle.cancel_goal_async().add_done_callback(self.waypoint_batch_cancelled)
+
+    def waypoint_batch_cancelled(self, future):
+        """Runs the action waiting for the batch to be cancelled."""
+        then = self.batch_cancel_callback
+        self.batch_cancel_callback = None
+        self.batch_active = False
+        then()
+
+    def new_strategy(self):
+        """
+        Scores the free cells of the known region by the number of uncertain cells around them and
+        picks the best one.
+        """
+
+        self.get_logger().info('New Strategy: Processing occupancy grid ...')
+        grid = grid_to_array(self.current_grid)
+        if self.known_crop is None:
+            self.get_logger().error("List of points is empty: no known cell in the occupancy grid")
+            return
+        rows, cols = self.known_crop
+
+        if self.scoring_kernel == 'information_gain':
+            self.information_gain_strategy(grid)
+            return
+
+        region = grid[rows, cols]
+
+        candidate_rows, candidate_cols = np.nonzero(free_mask(region, self.obstacle_probability))
+        x, y = cells_to_world(candidate_rows + rows.start, candidate_cols + cols.start,
+                              self.current_grid.info)
+        distances = np.hypot(x - self.current_position.pose.position.x,
+                             y - self.current_position.pose.position.y)
+
+        # Skip cells further than 5 meters unless the counter is a multiple of four
+        if self.new_strategy_counter % 4 != 0:
+            in_range = distances <= 5
+            candidate_rows, candidate_cols = candidate_rows[in_range], candidate_cols[in_range]
+            x, y, distances = x[in_range], y[in_range], distances[in_range]
+
+        if candidate_rows.size == 0:
+            self.get_logger().error("List of points is empty: no free cell to score")
+            self.new_strategy_counter += 1
+            return
+
+        # Count the number of uncertain cells around every candidate, cells outside the crop are
+        # all unknown
+        uncertain_counts = box_count(region == -1, self.uncertain_box_size, pad_value=True)
+        best = int(np.argmax(uncertain_counts[candidate_rows, candidate_cols]))
+
+        self.set_new_waypoint(x[best], y[best])
+        self.potential_coordinate.point.x = float(x[best])
+        self.potential_coordinate.point.y = float(y[best])
+
+        self.get_logger().info('New Strategy: Point Distance:' + str(distances[best]))
         self.new_strategy_counter += 1
         self.potential_publisher.publish(self.potential_coordinate)
-        
 
+    def information_gain_strategy(self, grid):
+        """Picks the frontier cell of the known region that sees the most unknown cells."""
+        if self.scoring_backend == 'process':
+            rows, cols, gains = self.parallel_scorer.score(grid, self.obstacle_probability,
+                                                           self.known_crop)
+        else:
+            rows, cols, gains = score_frontier_cells(grid, self.obstacle_probability,
+                                                     self.known_crop)
 
-    def count_uncertain_cells_around(self, index, occupancy_data_np, width, height):
-        """Counts the number of uncertain cells (-1) around a given cell within a defined box size."""
-        uncertain_count = 0
-        box_size = 5  # Define the size of the box around each cell
+        self.new_strategy_counter += 1
+        if rows.size == 0:
+            self.get_logger().error("List of points is empty: no frontier cell to score")
+            return
 
-        # Loop over the box around the cell
-        for x in range(-box_size, box_size + 1):
-            for y in range(-box_size, box_size + 1):
-                slider = x * self.width + y
-                try:
-                    if occupancy_data_np[index + slider] == -1:
-                        uncertain_count += 1
-                #the index of a point next to the index may not be within the range of occupancy_data.data, so the IndexError is handled below
-                except IndexError:
-                    continue
-        return uncertain_count
-           
+        x, y = cells_to_world(rows[0], cols[0], self.current_grid.info)
+        self.set_new_waypoint(x, y)
+        self.potential_coordinate.point.x = float(x)
+        self.potential_coordinate.point.y = float(y)
+
+        self.get_logger().info('New Strategy: Information gain:' + str(gains[0]))
+        self.potential_publisher.publish(self.potential_coordinate)
 
     def frontier_check(self, occupancy_data_np, random_index):
         """
@@ -345,8 +1179,8 @@ class Autopilot(Node):
 
     
         #Inspects the nature of points in a grid around the selected point 
-        for x in range(-4,3):
-            for y in range(-4,3):
+        for x in range(-self.frontier_box_size, self.frontier_box_size - 1):
+            for y in range(-self.frontier_box_size, self.frontier_box_size - 1):
                 slider = x * self.width + y
                 try:
                     if occupancy_data_np[random_index + slider] == -1:
@@ -359,9 +1193,9 @@ class Autopilot(Node):
          
 
          
-        if uncertain_indexes > 20:
+        if uncertain_indexes > self.frontier_uncertain_threshold:
             return True
-        elif self.fully_mapped and obstacle_indexes > 5:
+        elif self.fully_mapped and obstacle_indexes > self.frontier_obstacle_threshold:
             return True
         else:
             return False
@@ -394,67 +1228,129 @@ class Autopilot(Node):
         self.current_position.pose.orientation = msg.pose.pose.orientation
         self.current_position.header.frame_id = msg.header.frame_id
 
+        orientation_q = msg.pose.pose.orientation
+        self.robot_yaw = self.quaternion_to_yaw(orientation_q.x, orientation_q.y, orientation_q.z,
+                                                orientation_q.w)
 
-    def aruco_map_position_callback(self, msg:PointStamped):
-        
-        self.aruco_detected = True
-        if not self.localisation_started:
-            aruco_position = PointStamped()
-            aruco_position = msg
-            # Calculate distance to ArUco marker
-            dx = aruco_position.point.x - self.current_position.pose.position.x
-            dy = aruco_position.point.y - self.current_position.pose.position.y
-            distance = math.sqrt(dx*dx + dy*dy)
-
-            if distance > 5:
-                # If further than 6 meters, move to the midpoint
-                self.get_logger().info('ArUco marker is far. Moving to midpoint.')
-                ratio = 0.5  # Midpoint
-                self.new_waypoint.pose.position.x = self.current_position.pose.position.x + dx * ratio
-                self.new_waypoint.pose.position.y = self.current_position.pose.position.y + dy * ratio
+        stamp = msg.header.stamp.sec + msg.header.stamp.nanosec * 1e-9
+        self.visit_heatmap.add_visit(msg.pose.pose.position.x, msg.pose.pose.position.y, stamp)
+        self.progress_watchdog.update(msg.pose.pose.position.x, msg.pose.pose.position.y,
+                                      self.get_clock().now().nanoseconds / 1e9)
+        self.update_camera_coverage()
 
-                # Calculate orientation towards the ArUco marker
-                angle = math.atan2(dy, dx)
-                self.new_waypoint.pose.orientation.z = math.sin(angle / 2)
-                self.new_waypoint.pose.orientation.w = math.cos(angle / 2)
+    def quaternion_to_yaw(self, x, y, z, w):
+        """
+        Convert a quaternion to yaw angle (rotation around Z axis)
+        """
+        siny_cosp = 2 * (w * z + x * y)
+        cosy_cosp = 1 - 2 * (y * y + z * z)
+        return math.atan2(siny_cosp, cosy_cosp)
 
-                self.waypoint_publisher.publish(self.new_waypoint)
-                self.localisation_started = True
 
-            elif distance > self.desired_distance:
-                # If further than 1 meters, move towards the ArUco marker
-                self.new_waypoint = PoseStamped()
-                self.new_waypoint.header.frame_id = 'map'
-                self.new_waypoint.header.stamp = self.get_clock().now().to_msg()
-                
+    def aruco_average_callback(self, msg:MarkerArray):
+        """Gives the markers of the registry their real ID and average position."""
+        for marker in msg.markers:
+            self.marker_registry.update_average(marker.id, marker.pose.position.x,
+                                                marker.pose.position.y)
+
+    def aruco_map_position_callback(self, msg:PointStamped):
+
+        # Markers already localised do not trigger another approach
+        if self.marker_registry.is_localised(msg.point.x, msg.point.y):
+            return
+        marker_id = self.marker_registry.add_detection(msg.point.x, msg.point.y)
+
+        self.aruco_detected = True
+        if not self.localisation_started:
+            self.approach_marker = marker_id
+            self.progress_watchdog.stop()
+            self.claim_board.release()
+            # NavigateToPose is rejected while a batch of waypoints is being driven
+            self.cancel_waypoint_batch(lambda: self.approach_aruco_marker(msg))
+
+    def approach_aruco_marker(self, msg:PointStamped):
+        """Moves towards the ArUco marker, or stops when it is close enough to localise it."""
+        aruco_position = PointStamped()
+        aruco_position = msg
+        # Calculate distance to ArUco marker
+        dx = aruco_position.point.x - self.current_position.pose.position.x
+        dy = aruco_position.point.y - self.current_position.pose.position.y
+        distance = math.sqrt(dx*dx + dy*dy)
+
+        if distance > 5:
+            # If further than 6 meters, move to the midpoint
+            self.get_logger().info('ArUco marker is far. Moving to midpoint.')
+            ratio = 0.5  # Midpoint
+            self.new_waypoint.pose.position.x = self.current_position.pose.position.x + dx * ratio
+            self.new_waypoint.pose.position.y = self.current_position.pose.position.y + dy * ratio
+
+            # Calculate orientation towards the ArUco marker
+            angle = math.atan2(dy, dx)
+            self.new_waypoint.pose.orientation.z = math.sin(angle / 2)
+            self.new_waypoint.pose.orientation.w = math.cos(angle / 2)
+
+            self.waypoint_publisher.publish(self.new_waypoint)
+            self.localisation_started = True
+
+        elif distance > self.desired_distance:
+            # If further than 1 meters, move towards the ArUco marker
+            self.new_waypoint = PoseStamped()
+            self.new_waypoint.header.frame_id = 'map'
+            self.new_waypoint.header.stamp = self.get_clock().now().to_msg()
+            
+            # Free cell at desired_distance from the ArUco marker, with line of sight to it
+            # and reachable from the robot, on the grid the reachable mask was computed on
+            approach_pose = None
+            grid = self.processed_grid
+            if grid.info.width > 0:
+                reachable, offset = None, (0, 0)
+                if (self.reachable is not None and self.known_crop is not None
+                        and self.reachable.shape == self.known_crop_shape()):
+                    reachable = self.reachable
+                    offset = (self.known_crop[0].start, self.known_crop[1].start)
+                approach_pose = solve_approach_pose(
+                    grid_to_array(grid), grid.info,
+                    aruco_position.point.x, aruco_position.point.y,
+                    self.current_position.pose.position.x,
+                    self.current_position.pose.position.y,
+                    self.desired_distance, self.obstacle_probability,
+                    self.approach_tolerance, self.approach_clearance,
+                    reachable=reachable, reachable_offset=offset)
+
+            if approach_pose is not None:
+                approach_x, approach_y, angle = approach_pose
+                self.new_waypoint.pose.position.x = approach_x
+                self.new_waypoint.pose.position.y = approach_y
+            else:
                 # Calculate position 1 meters away from the ArUco marker
+                self.get_logger().info('No free approach pose around the ArUco Marker, '
+                                       'moving straight to it')
                 ratio = 1 - (self.desired_distance/ distance)
-                self.new_waypoint.pose.position.x = self.current_position.pose.position.x + dx * ratio
-                self.new_waypoint.pose.position.y = self.current_position.pose.position.y + dy * ratio
-                
+                position = self.current_position.pose.position
+                self.new_waypoint.pose.position.x = position.x + dx * ratio
+                self.new_waypoint.pose.position.y = position.y + dy * ratio
+
                 # Calculate orientation towards the ArUco marker
                 angle = math.atan2(dy, dx)
-                self.new_waypoint.pose.orientation.z = math.sin(angle / 2)
-                self.new_waypoint.pose.orientation.w = math.cos(angle / 2)
+            self.new_waypoint.pose.orientation.z = math.sin(angle / 2)
+            self.new_waypoint.pose.orientation.w = math.cos(angle / 2)
 
-                self.waypoint_publisher.publish(self.new_waypoint)
-                self.get_logger().info('Moving towards the ArUco Marker')
-                self.localisation_started = True
-            else:
-                # If within 1 meters, stop and wait
-                self.get_logger().info('Within 1.5 meters of ArUco Marker. Stopping for 15 seconds.')
-                
-                # Publish current position as waypoint to make the robot stop
-                stop_waypoint = PoseStamped()
-                stop_waypoint.header.frame_id = 'map'
-                stop_waypoint.header.stamp = self.get_clock().now().to_msg()
-                stop_waypoint.pose.position.x = self.current_position.pose.position.x
-                stop_waypoint.pose.position.y = self.current_position.pose.position.y
-                stop_waypoint.pose.orientation = self.current_position.pose.orientation
-                self.waypoint_publisher.publish(stop_waypoint)
-                self.localisation_started = True
-
-       
+            self.waypoint_publisher.publish(self.new_waypoint)
+            self.get_logger().info('Moving towards the ArUco Marker')
+            self.localisation_started = True
+        else:
+            # If within 1 meters, stop and wait
+            self.get_logger().info('Within 1.5 meters of ArUco Marker. Stopping for 15 seconds.')
+            
+            # Publish current position as waypoint to make the robot stop
+            stop_waypoint = PoseStamped()
+            stop_waypoint.header.frame_id = 'map'
+            stop_waypoint.header.stamp = self.get_clock().now().to_msg()
+            stop_waypoint.pose.position.x = self.current_position.pose.position.x
+            stop_waypoint.pose.position.y = self.current_position.pose.position.y
+            stop_waypoint.pose.orientation = self.current_position.pose.orientation
+            self.waypoint_publisher.publish(stop_waypoint)
+            self.localisation_started = True
 
     def readiness_check(self, msg:BehaviorTreeLog):
         """
@@ -467,29 +1363,49 @@ class Autopilot(Node):
             if event.node_name == 'NavigateRecovery' and event.current_status =='IDLE':
                 self.get_logger().info('NavigateRecovery--IDLE received')
 
-                if not self.aruco_detected:
+                # Batches of waypoints are chained by their result instead
+                if not self.aruco_detected and not self.batch_active:
                     self.next_waypoint()
-                    self.goal_updated_counter = 0
 
                 if self.localisation_started:
                     time.sleep(15)
+                    self.marker_registry.mark_localised(self.approach_marker)
                     self.next_waypoint()
                     self.localisation_started = False
                     self.aruco_detected = False
 
-            if event.node_name == 'GoalUpdated' and event.current_status =='FAILURE':
-                self.goal_updated_counter += 1
-                if self.goal_updated_counter > 500:
-                    if not self.aruco_detected:
-                        self.next_waypoint()
-                        self.goal_updated_counter = 0
+    def check_progress(self):
+        """
+        Abandons the current exploration goal when the robot stopped getting closer to it,
+        remembering it in the frontier memory so it is not chosen again right away.
+        """
+        now = self.get_clock().now().nanoseconds / 1e9
+        if self.aruco_detected or not self.progress_watchdog.stalled(now):
+            return
+
+        goal_x, goal_y = self.progress_watchdog.goal
+        self.get_logger().info(f'No progress towards goal ({goal_x:.2f}, {goal_y:.2f}), '
+                               'abandoning it')
+        self.frontier_memory.record_failure(goal_x, goal_y, now)
+        self.progress_watchdog.stop()
+        self.claim_board.release()
+        self.cancel_waypoint_batch(self.next_waypoint)
+
+
+    def destroy_node(self):
+        # Stop the scoring workers and free their shared memory
+        self.parallel_scorer.shutdown()
+        super().destroy_node()
 
 
 def main():
     rclpy.init()
     autopilot_node = Autopilot()
     autopilot_node.get_logger().info('Running autopilot node')
-    rclpy.spin(autopilot_node)
+    try:
+        rclpy.spin(autopilot_node)
+    finally:
+        autopilot_node.destroy_node()
 
 if __name__=='__main__':
     main()
\ No newline at end of file
@@ -0,0 +1,138 @@
+import math
+import numpy as np
+
+
+class CameraCoverage:
+    """
+    Wall cells of the costmap that the camera has looked at from within detection range.
+
+    For every camera pose, rays covering the horizontal field of view are cast at once through the
+    costmap and the first wall cell hit by each ray is marked as seen. Walls that were never seen
+    are where an ArUco marker may still be hiding after the LiDAR has mapped the whole space.
+
+    Like the visit heatmap, the seen mask is anchored in the map frame (absolute cell indices at
+    the costmap resolution) and grows as needed, so it survives the costmap growing or moving
+    during exploration. Walls the robot already tried to view are remembered, so a wall the rays
+    cannot hit is not targeted forever.
+    """
+
+    def __init__(self, fov=1.085, max_range=2.5, wall_threshold=99, attempt_radius=0.5):
+        # Horizontal field of view (rad, Raspberry Pi camera v2) and range (m) at which markers are
+        # detected
+        self.fov = fov
+        self.max_range = max_range
+
+        # Cost from which a cell is a wall that blocks the view
+        self.wall_threshold = wall_threshold
+
+        # Walls within attempt_radius (m) of a wall already tried are not targeted again
+        self.attempt_radius = attempt_radius
+        self.attempted = []
+
+        # Seen cells, absolute cell index (row, col) of seen[0, 0] and resolution (m) of the cells
+        self.seen = np.zeros((0, 0), dtype=bool)
+        self.offset = (0, 0)
+        self.resolution = None
+
+    def grid_offset(self, info):
+        """Absolute cell index (row, col) of the cell (0, 0) of the costmap."""
+        return (int(round(info.origin.position.y / info.resolution)),
+                int(round(info.origin.position.x / info.resolution)))
+
+    def ensure(self, rows, cols):
+        """Grows the seen mask so that the absolute cells (arrays) are inside it."""
+        if rows.size == 0:
+            return
+        height, width = self.seen.shape
+        if height == 0:
+            self.offset = (int(rows.min()), int(cols.min()))
+            self.seen = np.zeros((int(rows.max()) - self.offset[0] + 1,
+                                  int(cols.max()) - self.offset[1] + 1), dtype=bool)
+            return
+        top = max(self.offset[0] - int(rows.min()), 0)
+        bottom = max(int(rows.max()) - (self.offset[0] + height - 1), 0)
+        left = max(self.offset[1] - int(cols.min()), 0)
+        right = max(int(cols.max()) - (self.offset[1] + width - 1), 0)
+        if top or bottom or left or right:
+            self.seen = np.pad(self.seen, ((top, bottom), (left, right)))
+            self.offset = (self.offset[0] - top, self.offset[1] - left)
+
+    def update(self, grid, info, x, y, yaw):
+        """Marks the wall cells visible from a camera at (x, y) looking along yaw."""
+        resolution = info.resolution
+        if resolution != self.resolution:
+            # Cells of another resolution do not line up, start over
+            self.seen = np.zeros((0, 0), dtype=bool)
+            self.resolution = resolution
+
+        # Enough rays for neighbouring rays to be at most one cell apart at the maximum range
+        num_rays = max(int(math.ceil(self.fov * self.max_range / resolution)), 2)
+        angles = yaw + np.linspace(-self.fov / 2, self.fov / 2, num_rays)
+        steps = np.arange(1, int(self.max_range / resolution) + 1) * resolution
+
+        ray_x = x + np.cos(angles)[:, None] * steps[None, :]
+        ray_y = y + np.sin(angles)[:, None] * steps[None, :]
+        cols = np.floor((ray_x - info.origin.position.x) / resolution).astype(np.int64)
+        rows = np.floor((ray_y - info.origin.position.y) / resolution).astype(np.int64)
+
+        height, width = grid.shape
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        values = np.where(inside, grid[np.clip(rows, 0, height - 1), np.clip(cols, 0, width - 1)],
+                          -1)
+
+        # First wall cell along every ray, stored by absolute index
+        hits = values >= self.wall_threshold
+        first = np.argmax(hits, axis=1)
+        has_hit = hits.any(axis=1)
+        ray_index = np.flatnonzero(has_hit)
+        row_offset, col_offset = self.grid_offset(info)
+        hit_rows = rows[ray_index, first[has_hit]] + row_offset
+        hit_cols = cols[ray_index, first[has_hit]] + col_offset
+        self.ensure(hit_rows, hit_cols)
+        self.seen[hit_rows - self.offset[0], hit_cols - self.offset[1]] = True
+
+    def seen_mask(self, info, crop):
+        """Seen cells of the crop (row_slice, col_slice) of the costmap."""
+        rows, cols = crop
+        mask = np.zeros((rows.stop - rows.start, cols.stop - cols.start), dtype=bool)
+        if info.resolution != self.resolution or self.seen.size == 0:
+            return mask
+
+        # Overlap of the crop and the seen mask, in absolute cells
+        row_offset, col_offset = self.grid_offset(info)
+        top = max(rows.start + row_offset, self.offset[0])
+        bottom = min(rows.stop + row_offset, self.offset[0] + self.seen.shape[0])
+        left = max(cols.start + col_offset, self.offset[1])
+        right = min(cols.stop + col_offset, self.offset[1] + self.seen.shape[1])
+        if top < bottom and left < right:
+            mask[top - rows.start - row_offset:bottom - rows.start - row_offset,
+                 left - cols.start - col_offset:right - cols.start - col_offset] = \
+                self.seen[top - self.offset[0]:bottom - self.offset[0],
+                          left - self.offset[1]:right - self.offset[1]]
+        return mask
+
+    def unseen_walls(self, grid, info, crop):
+        """
+        Wall cells inside crop (row_slice, col_slice) that border known free space and were never
+        seen. Returns a mask of the crop.
+        """
+        region = grid[crop]
+        walls = region >= self.wall_threshold
+        open_space = (region >= 0) & (region < self.wall_threshold)
+
+        next_to_open = np.zeros_like(walls)
+        next_to_open[1:, :] |= open_space[:-1, :]
+        next_to_open[:-1, :] |= open_space[1:, :]
+        next_to_open[:, 1:] |= open_space[:, :-1]
+        next_to_open[:, :-1] |= open_space[:, 1:]
+
+        return walls & next_to_open & ~self.seen_mask(info, crop)
+
+    def mark_attempted(self, x, y):
+        """Records that the robot went to view the wall at (x, y)."""
+        self.attempted.append((x, y))
+
+    def was_attempted(self, x, y):
+        """Whether the robot already went to view a wall within attempt_radius of (x, y)."""
+        return any(math.hypot(x - wall_x, y - wall_y) <= self.attempt_radius
+                   for wall_x, wall_y in self.attempted)
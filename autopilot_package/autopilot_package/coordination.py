@@ -0,0 +1,117 @@
+import json
+import numpy as np
+
+
+class ClaimBoard:
+    """
+    Goals claimed by the other robots exploring the same map.
+
+    Every robot publishes its claimed goal and its own position. Candidates close to the claims of
+    teammates are penalized, and a greedy assignment over the cost matrix of all robots gives each
+    candidate to the robot that reaches it the cheapest, so the robots spread over different
+    frontiers. Claims carry the frame of their positions, and claims made in another frame than
+    frame_id are ignored. The claim of this robot is published again every refresh_period while it
+    drives to its goal, so teammates do not expire it.
+    """
+
+    def __init__(self, robot_id, frame_id='map', claim_radius=1.5, claim_timeout=30.0,
+                 penalty=5.0):
+        self.robot_id = robot_id
+
+        # Frame of the goals and robot positions of the claims
+        self.frame_id = frame_id
+
+        # Candidates within claim_radius (m) of a claim get up to penalty (m) of extra cost
+        self.claim_radius = claim_radius
+        self.penalty = penalty
+
+        # Claims older than claim_timeout (s) are dropped, e.g. when a robot stopped
+        self.claim_timeout = claim_timeout
+
+        # robot_id -> (goal_x, goal_y, robot_x, robot_y, stamp)
+        self.claims = {}
+
+        # Goal (x, y) claimed by this robot, None once released
+        self.goal = None
+
+    @property
+    def refresh_period(self):
+        """Period (s) at which the claim of this robot is published again, within claim_timeout."""
+        return self.claim_timeout / 3
+
+    def encode(self, goal_x, goal_y, robot_x, robot_y):
+        """Returns the content of the claim message for a goal of this robot."""
+        return json.dumps({'robot_id': self.robot_id, 'frame_id': self.frame_id,
+                           'goal': [goal_x, goal_y], 'robot': [robot_x, robot_y]})
+
+    def claim(self, goal_x, goal_y, robot_x, robot_y):
+        """Remembers the goal of this robot, to be refreshed, and returns its claim message."""
+        self.goal = (goal_x, goal_y)
+        return self.encode(goal_x, goal_y, robot_x, robot_y)
+
+    def release(self):
+        """Stops refreshing the claim of this robot, teammates drop it after claim_timeout."""
+        self.goal = None
+
+    def receive(self, data, now):
+        """Stores the claim of a teammate from a claim message received at time now (s)."""
+        try:
+            claim = json.loads(data)
+            robot_id = claim['robot_id']
+            frame_id = claim['frame_id']
+            goal_x, goal_y = claim['goal']
+            robot_x, robot_y = claim['robot']
+        except (ValueError, KeyError, TypeError):
+            return False
+
+        if robot_id == self.robot_id or frame_id != self.frame_id:
+            return False
+        self.claims[robot_id] = (float(goal_x), float(goal_y), float(robot_x), float(robot_y), now)
+        return True
+
+    def active_claims(self, now):
+        """Drops the expired claims, returns the (n, 4) goal and robot positions of the others."""
+        self.claims = {robot_id: claim for robot_id, claim in self.claims.items()
+                       if now - claim[4] <= self.claim_timeout}
+        if not self.claims:
+            return np.zeros((0, 4))
+        return np.array([claim[:4] for claim in self.claims.values()])
+
+    def penalties(self, points, now):
+        """Extra cost of every candidate, growing linearly near the goals claimed by others."""
+        claims = self.active_claims(now)
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if len(claims) == 0:
+            return np.zeros(len(points))
+        distances = np.linalg.norm(points[:, None, :] - claims[None, :, :2], axis=2)
+        return self.penalty * np.clip(1 - distances / self.claim_radius, 0, None).sum(axis=1)
+
+    def assign(self, points, own_costs, now):
+        """
+        Greedy assignment of the candidates to all robots over their cost matrix.
+        Teammates cost the distance from their last reported position.
+
+        Returns a boolean mask of the candidates left to this robot (not assigned to a teammate).
+        """
+        claims = self.active_claims(now)
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        available = np.ones(len(points), dtype=bool)
+        if len(claims) == 0 or len(points) == 0:
+            return available
+
+        # Row 0 is this robot, the following rows are the teammates
+        teammate_costs = np.linalg.norm(claims[:, None, 2:] - points[None, :, :], axis=2)
+        costs = np.vstack([np.asarray(own_costs, dtype=float).reshape(1, -1), teammate_costs])
+
+        for _ in range(min(costs.shape)):
+            robot, point = np.unravel_index(np.argmin(costs), costs.shape)
+            if not np.isfinite(costs[robot, point]):
+                break
+            if robot == 0:
+                # Everything not yet given to a teammate stays available to this robot
+                break
+            available[point] = False
+            costs[robot, :] = np.inf
+            costs[:, point] = np.inf
+
+        return available
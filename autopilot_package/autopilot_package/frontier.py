@@ -0,0 +1,189 @@
+import math
+import numpy as np
+from collections import namedtuple
+
+
+# A connected group of frontier cells. (row, col) is the frontier cell used as the goal of the
+# cluster, (x, y) its position in the map frame
+FrontierCluster = namedtuple('FrontierCluster', ['size', 'row', 'col', 'x', 'y'])
+
+
+def grid_to_array(grid):
+    """
+    Returns the data of an OccupancyGrid message as a (height, width) int8 array without copying.
+    """
+    if not len(grid.data):
+        return np.zeros((grid.info.height, grid.info.width), dtype=np.int8)
+    data = np.frombuffer(grid.data, dtype=np.int8)
+    return data.reshape(grid.info.height, grid.info.width)
+
+
+def cells_to_world(rows, cols, info):
+    """
+    Converts grid rows and columns (scalars or arrays) to the coordinates of the cell centres in
+    the map frame.
+    """
+    x = (np.asarray(cols) + 0.5) * info.resolution + info.origin.position.x
+    y = (np.asarray(rows) + 0.5) * info.resolution + info.origin.position.y
+    return x, y
+
+
+def world_to_cell(x, y, info):
+    """
+    Converts map frame coordinates to the (row, col) of the grid cell containing them.
+    """
+    col = int(math.floor((x - info.origin.position.x) / info.resolution))
+    row = int(math.floor((y - info.origin.position.y) / info.resolution))
+    return row, col
+
+
+def free_mask(grid, obstacle_probability):
+    """Known cells whose cost is below the obstacle threshold."""
+    return (grid >= 0) & (grid < obstacle_probability)
+
+
+def frontier_mask(grid, obstacle_probability):
+    """
+    Marks the free cells that have at least one unknown cell among their 4 neighbours.
+    """
+    unknown = grid == -1
+    unknown_neighbour = np.zeros_like(unknown)
+    unknown_neighbour[1:, :] |= unknown[:-1, :]
+    unknown_neighbour[:-1, :] |= unknown[1:, :]
+    unknown_neighbour[:, 1:] |= unknown[:, :-1]
+    unknown_neighbour[:, :-1] |= unknown[:, 1:]
+    return free_mask(grid, obstacle_probability) & unknown_neighbour
+
+
+def box_count(mask, radius, pad_value=False):
+    """
+    Counts, for every cell, the True cells of mask in the (2*radius+1)^2 box centred on it.
+    Cells outside the array count as pad_value.
+    """
+    padded = np.pad(mask.astype(np.int32), radius, mode='constant', constant_values=int(pad_value))
+    integral = np.zeros((padded.shape[0] + 1, padded.shape[1] + 1), dtype=np.int32)
+    np.cumsum(np.cumsum(padded, axis=0), axis=1, out=integral[1:, 1:])
+
+    size = 2 * radius + 1
+    height, width = mask.shape
+    return (integral[size:size + height, size:size + width]
+            - integral[:height, size:size + width]
+            - integral[size:size + height, :width]
+            + integral[:height, :width])
+
+
+def cluster_cells(rows, cols):
+    """
+    Groups cells given by their rows and columns into 8-connected clusters.
+    Returns a list with an array of positions (into rows/cols) for each cluster.
+    """
+    position = {(r, c): i for i, (r, c) in enumerate(zip(rows.tolist(), cols.tolist()))}
+    visited = np.zeros(len(position), dtype=bool)
+    clusters = []
+
+    for start, cell in enumerate(position):
+        if visited[start]:
+            continue
+        visited[start] = True
+        members = [start]
+        stack = [cell]
+        while stack:
+            r, c = stack.pop()
+            for dr in (-1, 0, 1):
+                for dc in (-1, 0, 1):
+                    neighbour = position.get((r + dr, c + dc))
+                    if neighbour is not None and not visited[neighbour]:
+                        visited[neighbour] = True
+                        members.append(neighbour)
+                        stack.append((r + dr, c + dc))
+        clusters.append(np.array(members))
+
+    return clusters
+
+
+def build_clusters(rows, cols, info, min_size=1):
+    """
+    Clusters frontier cells and returns a FrontierCluster for every cluster with at least min_size
+    cells. The goal cell of a cluster is its member closest to the cluster centroid.
+    """
+    frontiers = []
+    for members in cluster_cells(rows, cols):
+        if len(members) < min_size:
+            continue
+        member_rows = rows[members]
+        member_cols = cols[members]
+        closest = np.argmin((member_rows - member_rows.mean())**2
+                            + (member_cols - member_cols.mean())**2)
+        row, col = int(member_rows[closest]), int(member_cols[closest])
+        x, y = cells_to_world(row, col, info)
+        frontiers.append(FrontierCluster(len(members), row, col, float(x), float(y)))
+    return frontiers
+
+
+def find_frontier_clusters(grid, info, obstacle_probability, min_size=1, crop=None):
+    """
+    Detects the frontier cells of a (height, width) grid and groups them into clusters.
+    If crop (row_slice, col_slice) is given only that part of the grid is processed.
+    """
+    if crop is None:
+        crop = (slice(0, grid.shape[0]), slice(0, grid.shape[1]))
+    rows, cols = np.nonzero(frontier_mask(grid[crop], obstacle_probability))
+    return build_clusters(rows + crop[0].start, cols + crop[1].start, info, min_size)
+
+
+def reachable_mask(free, start):
+    """
+    Marks the free cells 4-connected to the start (row, col) cell.
+    If the start cell is not free, the closest free cell is used instead.
+
+    The free cells are split into horizontal runs and the runs overlapping in consecutive rows are
+    joined with a union-find, so the cost is linear in the number of runs rather than in cells
+    times path length.
+    """
+    reached = np.zeros_like(free)
+    if not free.any():
+        return reached
+    if not free[start]:
+        free_rows, free_cols = np.nonzero(free)
+        closest = np.argmin((free_rows - start[0])**2 + (free_cols - start[1])**2)
+        start = (free_rows[closest], free_cols[closest])
+
+    # Runs of free cells: row, first column and column after the last one, in row-major order
+    height, width = free.shape
+    changes = np.diff(np.pad(free, ((0, 0), (1, 1))).astype(np.int8), axis=1)
+    run_rows, run_starts = np.nonzero(changes == 1)
+    run_ends = np.nonzero(changes == -1)[1]
+
+    # Runs [first, last) of the previous row overlap each run, found on keys sorted in row-major
+    # order
+    stride = width + 1
+    start_keys = run_rows * stride + run_starts
+    end_keys = run_rows * stride + run_ends
+    first = np.searchsorted(end_keys, (run_rows - 1) * stride + run_starts, side='right')
+    last = np.searchsorted(start_keys, (run_rows - 1) * stride + run_ends, side='left')
+
+    parent = list(range(len(run_rows)))
+
+    def find(run):
+        while parent[run] != run:
+            parent[run] = parent[parent[run]]
+            run = parent[run]
+        return run
+
+    for run, (lo, hi) in enumerate(zip(first.tolist(), last.tolist())):
+        for other in range(lo, hi):
+            root, other_root = find(run), find(other)
+            if root != other_root:
+                parent[root] = other_root
+
+    labels = np.array([find(run) for run in range(len(parent))])
+    start_run = int(np.searchsorted(start_keys, start[0] * stride + start[1], side='right')) - 1
+    selected = labels == labels[start_run]
+
+    # Fill the selected runs: +1 at their start, -1 after their end, then a running sum along the
+    # rows
+    marks = np.zeros((height, stride), dtype=np.int32)
+    np.add.at(marks, (run_rows[selected], run_starts[selected]), 1)
+    np.add.at(marks, (run_rows[selected], run_ends[selected]), -1)
+    reached[:] = np.cumsum(marks, axis=1)[:, :width] > 0
+    return reached
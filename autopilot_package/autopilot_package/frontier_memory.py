@@ -0,0 +1,121 @@
+import numpy as np
+
+
+class FrontierMemory:
+    """
+    History of the frontier clusters, used to deprioritize the ones exploration keeps failing on.
+
+    For every cluster (keyed by its tour key) it keeps when it appeared, how many times it was
+    targeted and how many of those visits did not make it shrink. Goals abandoned by the progress
+    watchdog are remembered by position. All of it is turned into an extra cost (m) that decays
+    exponentially with time, so stubborn, unreachable or sensor-shadow frontiers are tried again
+    only once the rest of the map is done.
+
+    Records of clusters missing from an update are kept, so a cluster that is filtered out (e.g. in
+    another room) or briefly vanishes keeps its history. They expire once unseen for expiry (s).
+    """
+
+    def __init__(self, target_penalty=1.0, stubborn_penalty=3.0, failure_penalty=5.0,
+                 age_penalty=1.0, decay_time=120.0, shrink_ratio=0.8, failure_radius=1.0,
+                 expiry=600.0):
+        # Extra cost (m) per targeting, per visit that did not shrink the cluster, per failure
+        # nearby, and for clusters that have existed for decay_time after being targeted
+        self.target_penalty = target_penalty
+        self.stubborn_penalty = stubborn_penalty
+        self.failure_penalty = failure_penalty
+        self.age_penalty = age_penalty
+
+        # Time constant (s) of the exponential decay of the penalties
+        self.decay_time = decay_time
+
+        # A visit shrank a cluster if its size fell below shrink_ratio times its size when it was
+        # targeted
+        self.shrink_ratio = shrink_ratio
+
+        # Clusters within failure_radius (m) of an abandoned goal are penalized
+        self.failure_radius = failure_radius
+
+        # Records of clusters unseen for expiry (s) are dropped
+        self.expiry = expiry
+
+        # key -> {'first_seen', 'last_seen', 'size', 'targeted', 'stubborn', 'last_targeted',
+        #         'size_at_target'}
+        self.records = {}
+        self.last_update = None
+
+        # (x, y, stamp) of the abandoned goals
+        self.failures = []
+
+        self.last_target = None
+
+    def update(self, keys, sizes, now):
+        """Records the clusters present at time now (s) and forgets the ones unseen for expiry."""
+        for key, size in zip(keys, sizes):
+            record = self.records.get(key)
+            if record is None:
+                record = {'first_seen': now, 'targeted': 0, 'stubborn': 0, 'last_targeted': None,
+                          'size_at_target': None}
+                self.records[key] = record
+            record['size'] = size
+            record['last_seen'] = now
+        self.last_update = now
+
+        self.records = {key: record for key, record in self.records.items()
+                        if now - record['last_seen'] < self.expiry}
+
+        # Failures fully decayed are dropped
+        self.failures = [failure for failure in self.failures
+                         if now - failure[2] < 5 * self.decay_time]
+
+    def record_target(self, key, now):
+        """
+        Records that a cluster was chosen as the next goal, and whether the previous visit shrank
+        its cluster.
+        """
+        # A cluster missing from the last update vanished, which counts as shrinking
+        previous = self.records.get(self.last_target)
+        if (previous is not None and previous['last_seen'] == self.last_update
+                and previous['size'] >= self.shrink_ratio * previous['size_at_target']):
+            previous['stubborn'] += 1
+
+        record = self.records.get(key)
+        if record is not None:
+            record['targeted'] += 1
+            record['last_targeted'] = now
+            record['size_at_target'] = record['size']
+        self.last_target = key
+
+    def record_failure(self, x, y, now):
+        """Records a goal abandoned at time now (s)."""
+        self.failures.append((x, y, now))
+
+    def penalties(self, keys, points, now):
+        """
+        Extra cost (m) of every cluster.
+
+        Args:
+        keys (list): keys of the clusters
+        points (ndarray): (n, 2) positions of the clusters
+        now (float): current time (s)
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        penalties = np.zeros(len(keys))
+
+        for i, key in enumerate(keys):
+            record = self.records.get(key)
+            if record is None or record['last_targeted'] is None:
+                continue
+            decay = np.exp(-(now - record['last_targeted']) / self.decay_time)
+            age = min((now - record['first_seen']) / self.decay_time, 1.0)
+            penalties[i] = decay * (self.target_penalty * record['targeted']
+                                    + self.stubborn_penalty * record['stubborn']
+                                    + self.age_penalty * age)
+
+        if self.failures and len(points):
+            failures = np.array(self.failures)
+            distances = np.linalg.norm(points[:, None, :] - failures[None, :, :2], axis=2)
+            decay = np.exp(-(now - failures[:, 2]) / self.decay_time)
+            nearby = (distances <= self.failure_radius) * decay[None, :]
+            penalties += self.failure_penalty * nearby.sum(axis=1)
+
+        return penalties
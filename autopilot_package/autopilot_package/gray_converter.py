@@ -0,0 +1,80 @@
+import numpy as np
+import cv2
+
+
+# OpenCV conversions to grayscale of the colour and Bayer encodings, OpenCV names the Bayer
+# patterns from the second row, hence the shifted names
+CVT_CODES = {
+    'rgb8': cv2.COLOR_RGB2GRAY,
+    'bgr8': cv2.COLOR_BGR2GRAY,
+    'rgba8': cv2.COLOR_RGBA2GRAY,
+    'bgra8': cv2.COLOR_BGRA2GRAY,
+    'bayer_rggb8': cv2.COLOR_BayerBG2GRAY,
+    'bayer_bggr8': cv2.COLOR_BayerRG2GRAY,
+    'bayer_gbrg8': cv2.COLOR_BayerGR2GRAY,
+    'bayer_grbg8': cv2.COLOR_BayerGB2GRAY,
+}
+
+# Number of channels of the colour encodings
+CHANNELS = {'rgb8': 3, 'bgr8': 3, 'rgba8': 4, 'bgra8': 4}
+
+# Offset of the luma byte in the 2 bytes per pixel of the packed YUV encodings
+LUMA_OFFSETS = {'yuv422': 1, 'uyvy': 1, 'yuv422_yuy2': 0, 'yuyv': 0}
+
+
+class GrayConverter:
+    """
+    Converts sensor_msgs/Image messages to grayscale arrays without going through bgr8.
+
+    The message data is wrapped with np.frombuffer: mono8 frames are returned as they are, the luma
+    bytes of the packed YUV encodings and the high bytes of mono16 are copied out, and the colour
+    and Bayer encodings are converted by cvtColor. All of them write into a buffer kept across
+    frames, so there is no allocation per frame once the size is stable. The returned array is only
+    valid until the next conversion. Other encodings go through cv_bridge.
+    """
+
+    def __init__(self, bridge):
+        # Fallback for the encodings not handled here
+        self.bridge = bridge
+
+        self.buffer = None
+
+    def output(self, height, width):
+        """Grayscale buffer of the frame size, reallocated only when the size changes."""
+        if self.buffer is None or self.buffer.shape != (height, width):
+            self.buffer = np.empty((height, width), dtype=np.uint8)
+        return self.buffer
+
+    def convert(self, msg):
+        """Grayscale (height, width) uint8 array of an Image message."""
+        encoding = msg.encoding.lower()
+        height, width, step = msg.height, msg.width, msg.step
+
+        # Rows of the message, padding at the end of every row excluded below
+        rows = np.frombuffer(msg.data, dtype=np.uint8, count=height * step).reshape(height, step)
+
+        if encoding in ('mono8', '8uc1'):
+            if step == width:
+                return rows
+            np.copyto(self.output(height, width), rows[:, :width])
+            return self.buffer
+
+        if encoding in ('mono16', '16uc1'):
+            high_byte = 0 if msg.is_bigendian else 1
+            np.copyto(self.output(height, width), rows[:, high_byte:2 * width:2])
+            return self.buffer
+
+        if encoding in LUMA_OFFSETS:
+            offset = LUMA_OFFSETS[encoding]
+            np.copyto(self.output(height, width), rows[:, offset:2 * width:2])
+            return self.buffer
+
+        if encoding in CVT_CODES:
+            channels = CHANNELS.get(encoding, 1)
+            image = rows[:, :width * channels]
+            if channels > 1:
+                image = image.reshape(height, width, channels)
+            cv2.cvtColor(image, CVT_CODES[encoding], dst=self.output(height, width))
+            return self.buffer
+
+        return self.bridge.imgmsg_to_cv2(msg, desired_encoding='mono8')
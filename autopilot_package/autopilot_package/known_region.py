@@ -0,0 +1,82 @@
+import numpy as np
+
+
+class KnownRegion:
+    """
+    Keeps track of the bounding box of the known (not -1) cells of the costmap, so the grid
+    processing can be restricted to the explored part of the map.
+
+    The box only grows while the geometry of the costmap stays the same, and new known cells can
+    only appear near the area already explored, so each update only scans a band around the current
+    box. The whole grid is scanned again when the geometry changes or when known cells reach the
+    edge of the band.
+    """
+
+    def __init__(self, margin=10, band=100):
+        # Number of cells added around the known cells when cropping
+        self.margin = margin
+
+        # Width (cells) of the band scanned around the current box on every update
+        self.band = band
+
+        # Inclusive bounds (row_min, row_max, col_min, col_max) of the known cells, None if no cell
+        # is known
+        self.bounds = None
+        self.geometry = None
+        self.shape = (0, 0)
+
+    def update(self, grid, info):
+        """
+        Updates the box with a new (height, width) grid and returns the crop to apply to it
+        (see crop()).
+        """
+        geometry = (grid.shape, info.resolution, info.origin.position.x, info.origin.position.y)
+        self.shape = grid.shape
+
+        if geometry != self.geometry or self.bounds is None:
+            self.geometry = geometry
+            self.bounds = self.known_bounds(grid, 0, 0)
+            return self.crop()
+
+        row_min, row_max, col_min, col_max = self.bounds
+        height, width = grid.shape
+        window = (max(row_min - self.band, 0), min(row_max + self.band + 1, height),
+                  max(col_min - self.band, 0), min(col_max + self.band + 1, width))
+        region = grid[window[0]:window[1], window[2]:window[3]]
+        found = self.known_bounds(region, window[0], window[2])
+
+        if found is None:
+            return self.crop()
+
+        # Known cells on the edge of the band may continue outside of it
+        if ((found[0] == window[0] and window[0] > 0)
+                or (found[1] == window[1] - 1 and window[1] < height)
+                or (found[2] == window[2] and window[2] > 0)
+                or (found[3] == window[3] - 1 and window[3] < width)):
+            self.bounds = self.known_bounds(grid, 0, 0)
+        else:
+            self.bounds = (min(row_min, found[0]), max(row_max, found[1]),
+                           min(col_min, found[2]), max(col_max, found[3]))
+        return self.crop()
+
+    def known_bounds(self, grid, row_offset, col_offset):
+        """Returns the inclusive bounds of the known cells of grid, shifted by the offsets."""
+        known = grid != -1
+        known_rows = np.flatnonzero(known.any(axis=1))
+        if known_rows.size == 0:
+            return None
+        known_cols = np.flatnonzero(known.any(axis=0))
+        return (int(known_rows[0]) + row_offset, int(known_rows[-1]) + row_offset,
+                int(known_cols[0]) + col_offset, int(known_cols[-1]) + col_offset)
+
+    def crop(self):
+        """
+        Returns (row_slice, col_slice) covering the known cells plus the margin, or None if no cell
+        is known.
+        """
+        if self.bounds is None:
+            return None
+        height, width = self.shape
+        row_min, row_max, col_min, col_max = self.bounds
+        return (slice(max(row_min - self.margin, 0), min(row_max + self.margin + 1, height)),
+                slice(max(col_min - self.margin, 0), min(col_max + self.margin + 1, width)))
@@ -0,0 +1,82 @@
+import numpy as np
+
+
+class MarkerRegistry:
+    """
+    ArUco markers seen so far, keyed by marker ID, with their position samples and whether they are
+    localised.
+
+    aruco_map_position only carries positions, so detections are matched to the markers by
+    distance. Markers are first registered under provisional (negative) IDs and take their real ID
+    once the detection node publishes its averages, the provisional IDs handed out before stay
+    valid as aliases of the real ones. A marker is localised only once the robot has stopped in
+    front of it (mark_localised), however well its samples agree, after which its detections no
+    longer trigger an approach.
+    """
+
+    def __init__(self, match_radius=0.5, max_samples=40):
+        # Detections within match_radius (m) of a marker belong to it, its position is the mean of
+        # its last max_samples detections
+        self.match_radius = match_radius
+        self.max_samples = max_samples
+
+        # marker_id -> {'x', 'y', 'samples', 'localised'}
+        self.markers = {}
+        self.next_provisional_id = -1
+
+        # Provisional ID -> real ID of the markers that were renamed
+        self.aliases = {}
+
+    def match(self, x, y):
+        """ID of the closest marker within match_radius of (x, y), None if there is none."""
+        best_id = None
+        best_distance = self.match_radius
+        for marker_id, marker in self.markers.items():
+            distance = np.hypot(marker['x'] - x, marker['y'] - y)
+            if distance <= best_distance:
+                best_id, best_distance = marker_id, distance
+        return best_id
+
+    def is_localised(self, x, y):
+        """Whether a detection at (x, y) belongs to a marker that is already localised."""
+        marker_id = self.match(x, y)
+        return marker_id is not None and self.markers[marker_id]['localised']
+
+    def add_detection(self, x, y):
+        """Adds a detection to its marker, registering one if none matches. Returns its ID."""
+        marker_id = self.match(x, y)
+        if marker_id is None:
+            marker_id = self.next_provisional_id
+            self.next_provisional_id -= 1
+            self.markers[marker_id] = {'x': x, 'y': y, 'samples': [], 'localised': False}
+
+        marker = self.markers[marker_id]
+        marker['samples'] = (marker['samples'] + [(x, y)])[-self.max_samples:]
+        samples = np.array(marker['samples'])
+        marker['x'], marker['y'] = samples.mean(axis=0)
+        return marker_id
+
+    def update_average(self, marker_id, x, y):
+        """Updates a marker from the average position published with its real ID."""
+        marker_id = int(marker_id)
+        if marker_id not in self.markers:
+            # A provisional marker at the same place takes its real ID
+            provisional_id = self.match(x, y)
+            if provisional_id is not None and provisional_id < 0:
+                self.markers[marker_id] = self.markers.pop(provisional_id)
+                self.aliases[provisional_id] = marker_id
+            else:
+                self.markers[marker_id] = {'x': x, 'y': y, 'samples': [], 'localised': False}
+        self.markers[marker_id]['x'] = x
+        self.markers[marker_id]['y'] = y
+        return marker_id
+
+    def resolve(self, marker_id):
+        """Current ID of a marker, following the renaming of a provisional ID."""
+        return self.aliases.get(marker_id, marker_id)
+
+    def mark_localised(self, marker_id):
+        """Records that the robot stopped in front of a marker, by real or provisional ID."""
+        marker_id = self.resolve(marker_id)
+        if marker_id in self.markers:
+            self.markers[marker_id]['localised'] = True
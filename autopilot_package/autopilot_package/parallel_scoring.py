@@ -0,0 +1,189 @@
+import numpy as np
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from autopilot_package.frontier import frontier_mask
+
+
+# Value given to the samples of a ray that fall outside of the grid: they block the ray
+OUTSIDE_GRID = 100
+
+
+def ray_offsets(num_rays, max_range):
+    """
+    Returns the (num_rays, max_range) row and column offsets of the cells sampled along rays cast
+    in all directions from a cell, one sample per cell of range.
+    """
+    angles = np.linspace(0, 2 * np.pi, num_rays, endpoint=False)
+    steps = np.arange(1, max_range + 1)
+    row_offsets = np.rint(np.sin(angles)[:, None] * steps[None, :]).astype(np.int32)
+    col_offsets = np.rint(np.cos(angles)[:, None] * steps[None, :]).astype(np.int32)
+    return row_offsets, col_offsets
+
+
+def information_gain(grid, rows, cols, num_rays=16, max_range=60, wall_threshold=99,
+                     chunk_size=1024):
+    """
+    Raycast information gain: counts, for every candidate cell, the unknown cells seen along rays
+    cast from it before the rays hit a wall.
+
+    Args:
+    grid (ndarray): (height, width) occupancy grid
+    rows, cols (ndarray): cells of the candidates
+    num_rays (int): number of rays cast around each candidate
+    max_range (int): length of the rays (cells)
+    wall_threshold (int): cost from which a cell blocks the rays
+
+    Returns:
+    gains (ndarray): number of unknown cells visible from each candidate
+    """
+    row_offsets, col_offsets = ray_offsets(num_rays, max_range)
+    height, width = grid.shape
+    gains = np.zeros(len(rows), dtype=np.int32)
+
+    # Candidates are processed in chunks to bound the size of the (chunk, rays, range) arrays
+    for start in range(0, len(rows), chunk_size):
+        ray_rows = rows[start:start + chunk_size, None, None] + row_offsets[None]
+        ray_cols = cols[start:start + chunk_size, None, None] + col_offsets[None]
+        inside = (ray_rows >= 0) & (ray_rows < height) & (ray_cols >= 0) & (ray_cols < width)
+        values = np.where(inside,
+                          grid[np.clip(ray_rows, 0, height - 1), np.clip(ray_cols, 0, width - 1)],
+                          OUTSIDE_GRID)
+
+        blocked = np.logical_or.accumulate(values >= wall_threshold, axis=2)
+        gains[start:start + chunk_size] = ((values == -1) & ~blocked).sum(axis=(1, 2))
+
+    return gains
+
+
+def top_k(rows, cols, gains, k):
+    """Keeps the k candidates with the highest gain, sorted by decreasing gain."""
+    best = np.argsort(-gains, kind='stable')[:k]
+    return rows[best], cols[best], gains[best]
+
+
+def score_frontier_cells(grid, obstacle_probability, crop=None, num_rays=16, max_range=60,
+                         wall_threshold=99, k=10):
+    """
+    Scores the frontier cells of the grid (inside crop if given) by information gain in the current
+    process. Returns the rows, columns and gains of the k best cells.
+    """
+    if crop is None:
+        crop = (slice(0, grid.shape[0]), slice(0, grid.shape[1]))
+    rows, cols = np.nonzero(frontier_mask(grid[crop], obstacle_probability))
+    rows += crop[0].start
+    cols += crop[1].start
+    gains = information_gain(grid, rows, cols, num_rays, max_range, wall_threshold)
+    return top_k(rows, cols, gains, k)
+
+
+def score_tile(shared_name, shape, core, obstacle_probability, num_rays, max_range,
+               wall_threshold, k):
+    """
+    Worker function: scores the frontier cells of one tile of the grid stored in shared memory. The
+    rays of the cells on the border of the tile are cast in a window extended by max_range on every
+    side.
+
+    Args:
+    shared_name (str): name of the shared memory block holding the grid
+    shape (tuple): shape of the grid
+    core (tuple): (row_start, row_stop, col_start, col_stop) of the tile
+
+    Returns:
+    rows, cols, gains (ndarray): the k best cells of the tile in grid coordinates
+    """
+    shared = shared_memory.SharedMemory(name=shared_name)
+    try:
+        grid = np.ndarray(shape, dtype=np.int8, buffer=shared.buf)
+        row_start, row_stop, col_start, col_stop = core
+        halo = max_range + 1
+        window_row = max(row_start - halo, 0)
+        window_col = max(col_start - halo, 0)
+        window = grid[window_row:min(row_stop + halo, shape[0]),
+                      window_col:min(col_stop + halo, shape[1])]
+
+        # Frontier cells of the core only, the neighbours of its border cells are inside the window
+        frontiers = frontier_mask(window, obstacle_probability)
+        core_mask = np.zeros_like(frontiers)
+        core_mask[row_start - window_row:row_stop - window_row,
+                  col_start - window_col:col_stop - window_col] = True
+        rows, cols = np.nonzero(frontiers & core_mask)
+
+        gains = information_gain(window, rows, cols, num_rays, max_range, wall_threshold)
+        rows, cols, gains = top_k(rows, cols, gains, k)
+        result = (rows + window_row, cols + window_col, gains)
+        del grid, window
+    finally:
+        shared.close()
+    return result
+
+
+class ParallelScorer:
+    """
+    Scores frontier cells by information gain in a process pool.
+
+    The grid is copied once per call into a shared memory block and partitioned into tiles whose
+    rays may look into the neighbouring tiles. Every worker returns the best cells of its tile and
+    the results are merged.
+    """
+
+    def __init__(self, workers=None, tile_size=256, num_rays=16, max_range=60, wall_threshold=99,
+                 k=10):
+        self.workers = workers
+        self.tile_size = tile_size
+        self.num_rays = num_rays
+        self.max_range = max_range
+        self.wall_threshold = wall_threshold
+        self.k = k
+
+        self.executor = None
+        self.shared = None
+
+    def score(self, grid, obstacle_probability, crop=None):
+        """
+        Returns the rows, columns and gains of the k best frontier cells of the grid (inside crop
+        if given).
+        """
+        if self.executor is None:
+            # Spawned workers do not inherit the threads of the ROS node
+            self.executor = ProcessPoolExecutor(self.workers,
+                                                mp_context=multiprocessing.get_context('spawn'))
+
+        if self.shared is None or self.shared.size < grid.nbytes:
+            self.release_shared()
+            self.shared = shared_memory.SharedMemory(create=True, size=max(grid.nbytes, 1))
+        shared_grid = np.ndarray(grid.shape, dtype=np.int8, buffer=self.shared.buf)
+        shared_grid[:] = grid
+        del shared_grid
+
+        if crop is None:
+            crop = (slice(0, grid.shape[0]), slice(0, grid.shape[1]))
+        futures = []
+        for row_start in range(crop[0].start, crop[0].stop, self.tile_size):
+            for col_start in range(crop[1].start, crop[1].stop, self.tile_size):
+                core = (row_start, min(row_start + self.tile_size, crop[0].stop),
+                        col_start, min(col_start + self.tile_size, crop[1].stop))
+                futures.append(self.executor.submit(
+                    score_tile, self.shared.name, grid.shape, core, obstacle_probability,
+                    self.num_rays, self.max_range, self.wall_threshold, self.k))
+
+        results = [future.result() for future in futures]
+        if not results:
+            empty = np.zeros(0, dtype=np.int64)
+            return empty, empty, np.zeros(0, dtype=np.int32)
+        rows, cols, gains = (np.concatenate(parts) for parts in zip(*results))
+        return top_k(rows, cols, gains, self.k)
+
+    def release_shared(self):
+        """Frees the shared memory block."""
+        if self.shared is not None:
+            self.shared.close()
+            self.shared.unlink()
+            self.shared = None
+
+    def shutdown(self):
+        """Stops the workers and frees the shared memory block."""
+        if self.executor is not None:
+            self.executor.shutdown()
+            self.executor = None
+        self.release_shared()
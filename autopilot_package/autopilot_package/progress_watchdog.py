@@ -0,0 +1,71 @@
+import math
+from collections import deque
+
+
+class ProgressWatchdog:
+    """
+    Detects goals the robot stopped making progress towards.
+
+    The distance to the goal is sampled from the /pose stream. The goal is stalled when, over the
+    last window up to now, the distance decreased slower than min_rate, which bounds the time lost
+    on a goal that Nav2 keeps replanning or recovering from. SLAM Toolbox only publishes /pose
+    while the robot moves, so the last known distance holds until now: a silent stream counts as no
+    progress.
+    """
+
+    def __init__(self, window=10.0, min_rate=0.05, goal_tolerance=0.3):
+        # Length (s) of the sliding window and minimum rate (m/s) at which the distance to the goal
+        # must decrease
+        self.window = window
+        self.min_rate = min_rate
+
+        # Goals closer than goal_tolerance (m) are left to Nav2 to finish
+        self.goal_tolerance = goal_tolerance
+
+        self.goal = None
+        self.start_time = None
+        self.samples = deque()
+
+    def start(self, x, y, now):
+        """Starts watching a new goal at time now (s)."""
+        self.goal = (x, y)
+        self.start_time = now
+        self.samples.clear()
+
+    def stop(self):
+        """Stops watching, e.g. when the goal is reached or replaced by something else."""
+        self.goal = None
+        self.start_time = None
+        self.samples.clear()
+
+    def update(self, x, y, now):
+        """Adds the distance to the goal from the robot position at time now (s)."""
+        if self.goal is None:
+            return
+        self.samples.append((now, math.hypot(self.goal[0] - x, self.goal[1] - y)))
+
+        # Keep the latest sample older than the window, so the window is fully covered
+        while len(self.samples) > 1 and self.samples[1][0] <= now - self.window:
+            self.samples.popleft()
+
+    def distance_at(self, stamp):
+        """Last known distance to the goal at time stamp (s), the first sample if none is older."""
+        distance = self.samples[0][1]
+        for sample_time, sample_distance in self.samples:
+            if sample_time > stamp:
+                break
+            distance = sample_distance
+        return distance
+
+    def stalled(self, now):
+        """Whether the distance to the goal decreased slower than min_rate over the last window."""
+        if self.goal is None or now - self.start_time < self.window:
+            return False
+        if not self.samples:
+            # No pose at all over a whole window, the robot did not move
+            return True
+
+        last_distance = self.samples[-1][1]
+        if last_distance <= self.goal_tolerance:
+            return False
+        return (self.distance_at(now - self.window) - last_distance) / self.window < self.min_rate
@@ -0,0 +1,186 @@
+import numpy as np
+from autopilot_package.frontier import cluster_cells
+
+
+# Neighbouring coarse cells looked at (closest first) when a point falls in a cell without room
+NEIGHBOURHOOD = [(0, 0), (-1, 0), (1, 0), (0, -1), (0, 1), (-1, -1), (-1, 1), (1, -1), (1, 1)]
+
+
+class RoomSegmentation:
+    """
+    Splits the known free space into rooms and corridors.
+
+    The costmap is reduced to coarse cells and the clearance (distance to the closest non free
+    cell) of every free coarse cell is computed by repeated erosion. Cells whose clearance is
+    larger than half a door width are grouped into the cores of the rooms, which are then grown
+    back over the remaining free cells, so doors and narrow passages become the borders between
+    rooms. Room ids are kept across updates by matching each new room to the previous room it
+    overlaps the most. Coarse cells are anchored in the map frame, so the ids also survive the
+    costmap growing or moving.
+    """
+
+    def __init__(self, cell_factor=4, door_width=1.0, update_growth=0.05, update_period=10.0):
+        # Number of costmap cells per side of a coarse cell
+        self.cell_factor = cell_factor
+
+        # Passages narrower than door_width (m) separate rooms
+        self.door_width = door_width
+
+        # Segment again when the known area grew by update_growth (fraction) or after update_period
+        # (s)
+        self.update_growth = update_growth
+        self.update_period = update_period
+
+        # Room id of every coarse cell (0 for no room) and absolute coarse index of labels[0, 0]
+        self.labels = np.zeros((0, 0), dtype=np.int32)
+        self.offset = (0, 0)
+        self.geometry = None
+        self.resolution = None
+        self.next_label = 1
+
+        self.known_count = 0
+        self.last_update = None
+
+    def needs_update(self, grid, info, crop, now):
+        """Whether the known area grew enough, or enough time passed, since the last update."""
+        geometry = (grid.shape, info.resolution, info.origin.position.x, info.origin.position.y)
+        if geometry != self.geometry or self.last_update is None:
+            return True
+        known_count = int((grid[crop] != -1).sum())
+        return (known_count > self.known_count * (1 + self.update_growth)
+                or now - self.last_update >= self.update_period)
+
+    def update(self, grid, info, obstacle_probability, crop, now):
+        """Segments the known region (row_slice, col_slice) of a (height, width) grid in rooms."""
+        if info.resolution != self.resolution:
+            # Cells of another resolution do not line up, start over
+            self.labels = np.zeros((0, 0), dtype=np.int32)
+            self.resolution = info.resolution
+        self.geometry = (grid.shape, info.resolution, info.origin.position.x,
+                         info.origin.position.y)
+        self.known_count = int((grid[crop] != -1).sum())
+        self.last_update = now
+
+        # Align the crop on the coarse cells of the map frame and pad the region with unknown
+        # cells to whole coarse cells
+        factor = self.cell_factor
+        row_offset, col_offset = self.grid_offset(info)
+        row_start = (crop[0].start + row_offset) // factor * factor - row_offset
+        col_start = (crop[1].start + col_offset) // factor * factor - col_offset
+        region = grid[max(row_start, 0):crop[0].stop, max(col_start, 0):crop[1].stop]
+        coarse_height = -(-(crop[0].stop - row_start) // factor)
+        coarse_width = -(-(crop[1].stop - col_start) // factor)
+        padded = np.full((coarse_height * factor, coarse_width * factor), -1, dtype=np.int8)
+        top, left = max(row_start, 0) - row_start, max(col_start, 0) - col_start
+        padded[top:top + region.shape[0], left:left + region.shape[1]] = region
+        blocks = padded.reshape(coarse_height, factor, coarse_width, factor)
+
+        # A coarse cell is free if it has no obstacle and at least half of its cells are known free
+        free_count = ((blocks >= 0) & (blocks < obstacle_probability)).sum(axis=(1, 3))
+        obstacle_count = (blocks >= obstacle_probability).sum(axis=(1, 3))
+        free = (free_count * 2 >= factor * factor) & (obstacle_count == 0)
+
+        clearance = self.clearance(free)
+        door_cells = self.door_width / 2 / (info.resolution * factor)
+        cores = free & (clearance > door_cells)
+
+        labels = np.zeros(free.shape, dtype=np.int32)
+        core_rows, core_cols = np.nonzero(cores)
+        for label, members in enumerate(cluster_cells(core_rows, core_cols), start=1):
+            labels[core_rows[members], core_cols[members]] = label
+        labels = self.grow(labels, free)
+
+        offset = ((row_start + row_offset) // factor, (col_start + col_offset) // factor)
+        self.labels = self.match_previous(labels, offset)
+        self.offset = offset
+
+    def grid_offset(self, info):
+        """Absolute cell index (row, col) of the cell (0, 0) of the costmap."""
+        return (int(round(info.origin.position.y / info.resolution)),
+                int(round(info.origin.position.x / info.resolution)))
+
+    def clearance(self, free):
+        """
+        Number of erosions each free cell survives, i.e. its distance (coarse cells) to a non free
+        cell.
+        """
+        clearance = np.zeros(free.shape, dtype=np.int32)
+        remaining = free.copy()
+        while remaining.any():
+            clearance += remaining
+            eroded = remaining.copy()
+            eroded[1:, :] &= remaining[:-1, :]
+            eroded[:-1, :] &= remaining[1:, :]
+            eroded[:, 1:] &= remaining[:, :-1]
+            eroded[:, :-1] &= remaining[:, 1:]
+            eroded[0, :] = eroded[-1, :] = False
+            eroded[:, 0] = eroded[:, -1] = False
+            remaining = eroded
+        return clearance
+
+    def grow(self, labels, free):
+        """Grows the room cores one cell at a time over the free cells that have no room yet."""
+        while True:
+            grown = labels.copy()
+            for shifted, target in ((labels[:-1, :], grown[1:, :]),
+                                    (labels[1:, :], grown[:-1, :]),
+                                    (labels[:, :-1], grown[:, 1:]),
+                                    (labels[:, 1:], grown[:, :-1])):
+                np.maximum(target, np.where(target == 0, shifted, 0), out=target)
+            grown[~free] = 0
+            if np.array_equal(grown, labels):
+                return labels
+            labels = grown
+
+    def match_previous(self, labels, offset):
+        """Gives each new room the id of the previous room it overlaps the most, or a new id."""
+        matched = np.zeros_like(labels)
+        previous = np.zeros_like(labels)
+
+        # Previous labels in the frame of the new ones
+        row_shift = self.offset[0] - offset[0]
+        col_shift = self.offset[1] - offset[1]
+        rows = slice(max(row_shift, 0), min(row_shift + self.labels.shape[0], labels.shape[0]))
+        cols = slice(max(col_shift, 0), min(col_shift + self.labels.shape[1], labels.shape[1]))
+        if rows.start < rows.stop and cols.start < cols.stop:
+            previous[rows, cols] = self.labels[rows.start - row_shift:rows.stop - row_shift,
+                                               cols.start - col_shift:cols.stop - col_shift]
+
+        taken = set()
+        for label in np.unique(labels[labels > 0]):
+            room = labels == label
+            overlaps = previous[room]
+            overlaps = overlaps[overlaps > 0]
+            new_id = None
+            if overlaps.size:
+                ids, counts = np.unique(overlaps, return_counts=True)
+                for candidate in ids[np.argsort(-counts)]:
+                    if candidate not in taken:
+                        new_id = int(candidate)
+                        break
+            if new_id is None:
+                new_id = self.next_label
+                self.next_label += 1
+            taken.add(new_id)
+            matched[room] = new_id
+        self.next_label = max(self.next_label, int(matched.max()) + 1)
+        return matched
+
+    def rooms_at(self, x, y, info):
+        """
+        Room ids at map frame coordinates (arrays). Points in a coarse cell without room, e.g. on a
+        frontier, take the room of the closest neighbouring coarse cell. 0 means no room.
+        """
+        row_offset, col_offset = self.grid_offset(info)
+        rows = np.floor((np.asarray(y) - info.origin.position.y) / info.resolution)
+        cols = np.floor((np.asarray(x) - info.origin.position.x) / info.resolution)
+        rows = (rows.astype(np.int64) + row_offset) // self.cell_factor - self.offset[0]
+        cols = (cols.astype(np.int64) + col_offset) // self.cell_factor - self.offset[1]
+        height, width = self.labels.shape
+
+        rooms = np.zeros(np.shape(rows), dtype=np.int32)
+        for dr, dc in NEIGHBOURHOOD:
+            r, c = rows + dr, cols + dc
+            inside = (r >= 0) & (r < height) & (c >= 0) & (c < width) & (rooms == 0)
+            rooms[inside] = self.labels[r[inside], c[inside]]
+        return rooms
@@ -0,0 +1,200 @@
+import numpy as np
+from collections import namedtuple
+from autopilot_package.frontier import frontier_mask, build_clusters
+
+
+# Summary of a tile: number of unknown cells and whether it contains frontier cells
+TileStats = namedtuple('TileStats', ['unknown_count', 'has_frontier'])
+
+# Value of the cells of a tile that lie outside of the costmap: neither unknown nor free
+OUTSIDE_GRID = 100
+
+
+def neighbour_keys(key):
+    """Keys of the 4 tiles sharing a side with a tile."""
+    tile_row, tile_col = key
+    return [(tile_row - 1, tile_col), (tile_row + 1, tile_col),
+            (tile_row, tile_col - 1), (tile_row, tile_col + 1)]
+
+
+class TiledGrid:
+    """
+    Sparse copy of the costmap split in square tiles, stored in a dict keyed by
+    (tile_row, tile_col).
+
+    Only tiles with known cells are allocated, and a tile is only copied and re-summarised when its
+    content changes, so memory and scan time follow the explored area rather than the bounds of the
+    map.
+
+    Tiles are anchored in the map frame: keys are absolute tile coordinates, counted from the map
+    origin in cells of the costmap resolution. When the costmap grows or moves, the tiles still
+    line up and only the ones whose content changed are re-summarised.
+    """
+
+    def __init__(self, tile_size=64, obstacle_probability=75):
+        self.tile_size = tile_size
+        self.obstacle_probability = obstacle_probability
+
+        self.tiles = {}
+        self.stats = {}
+        self.geometry = None
+        self.resolution = None
+
+        # Shape of the costmap and absolute cell index (row, col) of its cell (0, 0)
+        self.shape = (0, 0)
+        self.offset = (0, 0)
+
+    def update(self, grid, info, crop=None):
+        """
+        Copies the tiles of a (height, width) grid that changed since the last update. If crop
+        (row_slice, col_slice) is given, tiles outside of it are not scanned (they are all
+        unknown).
+
+        Returns the keys of the tiles that changed.
+        """
+        if info.resolution != self.resolution:
+            # Cells of another resolution do not line up, start over
+            self.tiles = {}
+            self.stats = {}
+            self.resolution = info.resolution
+
+        # Missing tiles next to a stored tile that are outside of the costmap, before it grows or
+        # moves
+        outside_before = self.outside_neighbours()
+
+        self.offset = (int(round(info.origin.position.y / info.resolution)),
+                       int(round(info.origin.position.x / info.resolution)))
+        self.shape = grid.shape
+        geometry = (self.shape, self.offset)
+        moved = geometry != self.geometry
+        self.geometry = geometry
+
+        changed = []
+        if moved:
+            # Tiles that left the costmap are dropped
+            for key in [key for key in self.tiles if not self.inside_grid(key)]:
+                del self.tiles[key]
+                self.stats.pop(key, None)
+                changed.append(key)
+
+        size = self.tile_size
+        if crop is None:
+            crop = (slice(0, grid.shape[0]), slice(0, grid.shape[1]))
+        row_offset, col_offset = self.offset
+        tile_rows = range((crop[0].start + row_offset) // size,
+                          -(-(crop[0].stop + row_offset) // size))
+        tile_cols = range((crop[1].start + col_offset) // size,
+                          -(-(crop[1].stop + col_offset) // size))
+
+        for tile_row in tile_rows:
+            for tile_col in tile_cols:
+                key = (tile_row, tile_col)
+
+                # Part of the tile inside the costmap, as grid cells and as tile cells
+                tile_top = tile_row * size - row_offset
+                tile_left = tile_col * size - col_offset
+                top, bottom = max(tile_top, 0), min(tile_top + size, grid.shape[0])
+                left, right = max(tile_left, 0), min(tile_left + size, grid.shape[1])
+                view = grid[top:bottom, left:right]
+                inner = (slice(top - tile_top, bottom - tile_top),
+                         slice(left - tile_left, right - tile_left))
+                tile = self.tiles.get(key)
+
+                if tile is not None and moved:
+                    # Cells of the tile may have entered or left the costmap, the whole tile is
+                    # compared
+                    padded = np.full((size, size), OUTSIDE_GRID, dtype=np.int8)
+                    padded[inner] = view
+                    view, inner = padded, (slice(None), slice(None))
+
+                if tile is None:
+                    if (view == -1).all():
+                        continue
+                    tile = np.full((size, size), OUTSIDE_GRID, dtype=np.int8)
+                    self.tiles[key] = tile
+                elif np.array_equal(tile[inner], view):
+                    continue
+
+                tile[inner] = view
+                changed.append(key)
+
+        # The frontier cells on the border of a tile depend on its neighbours, including whether a
+        # missing neighbour is inside the costmap (unknown) or not
+        to_summarise = set(changed)
+        for key in changed:
+            to_summarise.update(neighbour_keys(key))
+        if moved:
+            for key in outside_before ^ self.outside_neighbours():
+                to_summarise.update(neighbour_keys(key))
+        self.summarise(to_summarise)
+        return changed
+
+    def set_obstacle_probability(self, obstacle_probability):
+        """
+        Changes the cost from which a cell is an obstacle. Which cells are frontiers depends on it,
+        so every tile is re-summarised.
+        """
+        if obstacle_probability == self.obstacle_probability:
+            return
+        self.obstacle_probability = obstacle_probability
+        self.summarise(self.tiles)
+
+    def summarise(self, keys):
+        """Recomputes the TileStats of the stored tiles among keys."""
+        for key in keys:
+            if key in self.tiles:
+                self.stats[key] = TileStats(int((self.tiles[key] == -1).sum()),
+                                            bool(self.tile_frontier_mask(key).any()))
+
+    def tile_frontier_mask(self, key):
+        """Frontier cells of a tile, using the borders of the neighbouring tiles."""
+        size = self.tile_size
+        tile_row, tile_col = key
+        halo = np.full((size + 2, size + 2), -1, dtype=np.int8)
+        halo[1:-1, 1:-1] = self.tiles[key]
+
+        # Border rows and columns of the neighbours, missing neighbours inside the grid are all
+        # unknown
+        neighbours = [((tile_row - 1, tile_col), (0, slice(1, -1)), (-1, slice(None))),
+                      ((tile_row + 1, tile_col), (-1, slice(1, -1)), (0, slice(None))),
+                      ((tile_row, tile_col - 1), (slice(1, -1), 0), (slice(None), -1)),
+                      ((tile_row, tile_col + 1), (slice(1, -1), -1), (slice(None), 0))]
+        for neighbour, halo_index, tile_index in neighbours:
+            if neighbour in self.tiles:
+                halo[halo_index] = self.tiles[neighbour][tile_index]
+            elif not self.inside_grid(neighbour):
+                halo[halo_index] = OUTSIDE_GRID
+
+        return frontier_mask(halo, self.obstacle_probability)[1:-1, 1:-1]
+
+    def outside_neighbours(self):
+        """Keys of the missing tiles next to a stored tile that do not overlap the costmap."""
+        return {neighbour for key in self.tiles for neighbour in neighbour_keys(key)
+                if neighbour not in self.tiles and not self.inside_grid(neighbour)}
+
+    def inside_grid(self, key):
+        """Whether a tile overlaps the costmap."""
+        size = self.tile_size
+        rows = (key[0] * size - self.offset[0], (key[0] + 1) * size - self.offset[0])
+        cols = (key[1] * size - self.offset[1], (key[1] + 1) * size - self.offset[1])
+        return rows[1] > 0 and rows[0] < self.shape[0] and cols[1] > 0 and cols[0] < self.shape[1]
+
+    def frontier_tiles(self):
+        """Keys of the tiles that contain frontier cells, the planner can skip all the others."""
+        return [key for key, stats in self.stats.items() if stats.has_frontier]
+
+    def frontier_clusters(self, info, min_size=1):
+        """
+        Groups the frontier cells of the frontier tiles into clusters
+        (see frontier.build_clusters).
+        """
+        all_rows = []
+        all_cols = []
+        for key in self.frontier_tiles():
+            rows, cols = np.nonzero(self.tile_frontier_mask(key))
+            all_rows.append(rows + key[0] * self.tile_size - self.offset[0])
+            all_cols.append(cols + key[1] * self.tile_size - self.offset[1])
+
+        if not all_rows:
+            return []
+        return build_clusters(np.concatenate(all_rows), np.concatenate(all_cols), info, min_size)
@@ -0,0 +1,192 @@
+import numpy as np
+
+
+class TourPlanner:
+    """
+    Orders a set of goal points (e.g. frontier clusters) into an open tour starting at the robot.
+
+    The tour is built with a nearest neighbour construction improved by 2-opt. It is cached between
+    calls: points that persist keep their key and position in the tour, vanished points are dropped
+    and new points are added with cheapest insertion, after which 2-opt repairs the order. The last
+    position of every key is remembered, so a point that vanished or was left out of the tour for a
+    while gets its key back when it reappears within match_radius. Keys no point matched for
+    max_unmatched calls of match() are forgotten.
+    """
+
+    def __init__(self, match_radius=0.5, max_passes=5, max_unmatched=50):
+        # Points closer than match_radius (m) to a cached point are considered the same point
+        self.match_radius = match_radius
+
+        # Maximum number of 2-opt improvement passes per update
+        self.max_passes = max_passes
+
+        # Cached visiting order (list of keys) and position of each key
+        self.tour = []
+        self.points = {}
+
+        # Last position of every key handed out, including the ones no longer in the tour, and
+        # number of consecutive calls of match() in which no point matched it
+        self.seen = {}
+        self.unmatched = {}
+        self.max_unmatched = max_unmatched
+
+        self.next_key = 0
+
+    def update(self, points, start, start_costs=None, keys=None):
+        """
+        Updates the tour with the current points and returns the list of their keys in visiting
+        order.
+
+        Args:
+        points (ndarray): (n, 2) array with the coordinates of the points to visit
+        start (tuple): coordinates the tour starts from (robot position)
+        start_costs (ndarray): optional cost of the first leg towards every point, replacing
+            the distance
+        keys (list): optional keys of the points, as returned by match(), when they are needed
+            before the update
+
+        Returns:
+        keys (list): one key per row of points, stable across updates for points that persist
+        tour (list): keys in visiting order
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        if keys is None:
+            keys = self.match(points)
+        self.points = {key: point for key, point in zip(keys, points)}
+        self.seen.update(self.points)
+
+        if len(keys) == 0:
+            self.tour = []
+            return keys, []
+
+        # Matrix of travel costs, node 0 is the start and the following nodes are the points
+        nodes = np.vstack([np.asarray(start, dtype=float).reshape(1, 2), points])
+        costs = np.linalg.norm(nodes[:, None, :] - nodes[None, :, :], axis=2)
+        if start_costs is not None:
+            costs[0, 1:] = start_costs
+        costs[1:, 0] = np.inf
+
+        node_of = {key: i + 1 for i, key in enumerate(keys)}
+        kept = [node_of[key] for key in self.tour if key in node_of]
+        new = [node for node in range(1, len(nodes)) if keys[node - 1] not in self.tour]
+
+        if len(kept) < len(new):
+            order = self.nearest_neighbour(costs)
+        else:
+            order = self.insert(costs, kept, new)
+        order = self.two_opt(costs, order)
+
+        self.tour = [keys[node - 1] for node in order]
+        return keys, list(self.tour)
+
+    def match(self, points):
+        """
+        Assigns a key to every point, reusing the key of the closest point seen before within
+        match_radius.
+        """
+        points = np.asarray(points, dtype=float).reshape(-1, 2)
+        keys = [None] * len(points)
+        if self.seen and len(points):
+            cached_keys = list(self.seen)
+            cached = np.array([self.seen[key] for key in cached_keys])
+            distances = np.linalg.norm(points[:, None, :] - cached[None, :, :], axis=2)
+
+            # Greedily pair the closest point and cached point first
+            for flat in np.argsort(distances, axis=None):
+                i, j = np.unravel_index(flat, distances.shape)
+                if distances[i, j] > self.match_radius:
+                    break
+                if keys[i] is None and cached_keys[j] is not None:
+                    keys[i] = cached_keys[j]
+                    cached_keys[j] = None
+
+        for key in self.seen:
+            self.unmatched[key] = self.unmatched.get(key, 0) + 1
+        for i in range(len(keys)):
+            if keys[i] is None:
+                keys[i] = self.next_key
+                self.next_key += 1
+            self.seen[keys[i]] = points[i]
+            self.unmatched[keys[i]] = 0
+
+        # Forget the keys of points that have not come back for a long time
+        for key in [key for key, count in self.unmatched.items() if count > self.max_unmatched]:
+            del self.seen[key]
+            del self.unmatched[key]
+        return keys
+
+    def nearest_neighbour(self, costs):
+        """Builds a tour from the start (node 0), always moving to the cheapest unvisited node."""
+        unvisited = np.ones(len(costs), dtype=bool)
+        unvisited[0] = False
+        order = []
+        current = 0
+        while unvisited.any():
+            current = int(np.argmin(np.where(unvisited, costs[current], np.inf)))
+            unvisited[current] = False
+            order.append(current)
+        return order
+
+    def insert(self, costs, order, new):
+        """Inserts every new node in the cached order where it adds the least to the tour cost."""
+        order = list(order)
+        for node in new:
+            previous = np.array([0] + order)
+            following = order + [None]
+            # Cost of going previous -> node -> following instead of previous -> following (the
+            # tour is open)
+            added = costs[previous, node].copy()
+            for i, after in enumerate(following):
+                if after is not None:
+                    added[i] += costs[node, after] - costs[previous[i], after]
+            order.insert(int(np.argmin(added)), node)
+        return order
+
+    def two_opt(self, costs, order):
+        """Improves an open tour starting at node 0 by reversing segments while it gets cheaper."""
+        path = [0] + list(order)
+        n = len(path)
+        for _ in range(self.max_passes):
+            improved = False
+            for i in range(1, n - 1):
+                # Reversing path[i..k] replaces edges (i-1, i) and (k, k+1) with (i-1, k) and
+                # (i, k+1)
+                k = np.arange(i + 1, n)
+                a, b = path[i - 1], path[i]
+                ends = np.array([path[j] for j in k])
+                after = np.array([path[j + 1] if j + 1 < n else -1 for j in k])
+                has_after = after >= 0
+                after_nodes = np.where(has_after, after, b)
+
+                delta = costs[a, ends] - costs[a, b]
+                delta += np.where(has_after, costs[b, after_nodes] - costs[ends, after_nodes], 0.0)
+
+                best = int(np.argmin(delta))
+                if delta[best] < -1e-9:
+                    path[i:k[best] + 1] = path[i:k[best] + 1][::-1]
+                    improved = True
+            if not improved:
+                break
+        return path[1:]
+
+
+def heading_costs(points, start, yaw, heading_weight):
+    """
+    Cost of travelling from start to every point, combining the straight-line distance with the
+    heading change relative to the current yaw, so points behind the robot (which need a rotation
+    in place) cost more.
+
+    Args:
+    points (ndarray): (n, 2) array with the coordinates of the candidates
+    start (tuple): position of the robot
+    yaw (float): current yaw of the robot (rad)
+    heading_weight (float): cost (m) added per radian of heading change
+
+    Returns:
+    costs (ndarray): (n,) array of costs
+    """
+    offsets = np.asarray(points, dtype=float).reshape(-1, 2) - np.asarray(start, dtype=float)
+    distances = np.hypot(offsets[:, 0], offsets[:, 1])
+    bearings = np.arctan2(offsets[:, 1], offsets[:, 0])
+    heading_change = np.abs(np.angle(np.exp(1j * (bearings - yaw))))
+    return distances + heading_weight * heading_change
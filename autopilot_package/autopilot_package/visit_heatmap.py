@@ -0,0 +1,81 @@
+import math
+import numpy as np
+
+
+class VisitHeatmap:
+    """
+    Coarse map of how much time the robot spent around each place, built from the /pose stream.
+
+    Every pose adds one visit to the coarse cell containing the robot and all visits decay
+    exponentially with the given half life, so the heat of a cell tells how recently and how long
+    it was visited. The map is anchored in the map frame and grows as the robot moves,
+    independently of the costmap geometry.
+    """
+
+    def __init__(self, cell_size=0.5, half_life=300.0):
+        # Size (m) of the coarse cells and time (s) after which a visit counts half
+        self.cell_size = cell_size
+        self.half_life = half_life
+
+        self.heat = np.zeros((0, 0))
+
+        # Stamp (s) of the last visit of every coarse cell, -inf where the robot never went
+        self.last_visit = np.full((0, 0), -np.inf)
+
+        # Absolute coarse index (row, col) of heat[0, 0]
+        self.offset = (0, 0)
+        self.last_stamp = None
+
+    def coarse_index(self, x, y):
+        """Absolute coarse (row, col) indices of map frame coordinates (scalars or arrays)."""
+        return (np.floor(np.asarray(y) / self.cell_size).astype(np.int64),
+                np.floor(np.asarray(x) / self.cell_size).astype(np.int64))
+
+    def ensure(self, row, col):
+        """Grows the heat array so that the absolute coarse cell (row, col) is inside it."""
+        height, width = self.heat.shape
+        if height == 0:
+            self.heat = np.zeros((1, 1))
+            self.last_visit = np.full((1, 1), -np.inf)
+            self.offset = (row, col)
+            return
+        top = max(self.offset[0] - row, 0)
+        bottom = max(row - (self.offset[0] + height - 1), 0)
+        left = max(self.offset[1] - col, 0)
+        right = max(col - (self.offset[1] + width - 1), 0)
+        if top or bottom or left or right:
+            self.heat = np.pad(self.heat, ((top, bottom), (left, right)))
+            self.last_visit = np.pad(self.last_visit, ((top, bottom), (left, right)),
+                                     constant_values=-np.inf)
+            self.offset = (self.offset[0] - top, self.offset[1] - left)
+
+    def add_visit(self, x, y, stamp):
+        """Decays the heatmap to time stamp (s) and adds a visit at the position of the robot."""
+        if self.last_stamp is not None and stamp > self.last_stamp:
+            self.heat *= math.pow(0.5, (stamp - self.last_stamp) / self.half_life)
+        self.last_stamp = stamp if self.last_stamp is None else max(stamp, self.last_stamp)
+
+        row, col = self.coarse_index(x, y)
+        row, col = int(row), int(col)
+        self.ensure(row, col)
+        self.heat[row - self.offset[0], col - self.offset[1]] += 1
+        self.last_visit[row - self.offset[0], col - self.offset[1]] = self.last_stamp
+
+    def values(self, x, y):
+        """Heat at map frame coordinates (arrays), 0 where the robot never went."""
+        return self.sample(self.heat, x, y, 0.0)
+
+    def visited_since(self, x, y, stamp):
+        """Whether the coarse cells of map frame coordinates (arrays) were visited since stamp."""
+        return self.sample(self.last_visit, x, y, -np.inf) >= stamp
+
+    def sample(self, array, x, y, default):
+        """Values of a coarse array at map frame coordinates, default outside of it."""
+        rows, cols = self.coarse_index(x, y)
+        rows = rows - self.offset[0]
+        cols = cols - self.offset[1]
+        height, width = array.shape
+        inside = (rows >= 0) & (rows < height) & (cols >= 0) & (cols < width)
+        values = np.full(np.shape(rows), default, dtype=float)
+        values[inside] = array[rows[inside], cols[inside]]
+        return values
@@ -0,0 +1,24 @@
+from launch import LaunchDescription
+from launch_ros.actions import Node
+
+# Namespaces of the robots sharing the map, each one runs its own Nav2 stack under the same
+# namespace
+ROBOT_NAMESPACES = ['robot1', 'robot2']
+
+
+def generate_launch_description():
+    return LaunchDescription([
+        Node(
+            package='autopilot_package',
+            executable='autopilot',
+            name='autopilot',
+            namespace=namespace,
+            output='screen',
+            parameters=[
+                {'use_sim_time': True},
+                {'coordination_mode': True},
+                {'robot_id': namespace}
+            ]
+        )
+        for namespace in ROBOT_NAMESPACES
+    ])
@@ -0,0 +1,12 @@
+from types import SimpleNamespace
+
+import pytest
+
+
+@pytest.fixture
+def make_info():
+    """Factory of the MapMetaData fields the grid helpers read."""
+    def make(resolution, origin_x, origin_y):
+        position = SimpleNamespace(x=origin_x, y=origin_y)
+        return SimpleNamespace(resolution=resolution, origin=SimpleNamespace(position=position))
+    return make
@@ -0,0 +1,88 @@
+import math
+
+import numpy as np
+
+from autopilot_package.approach_solver import line_of_sight, solve_approach_pose, wavefront_targets
+from autopilot_package.frontier import free_mask, reachable_mask
+
+
+def open_room():
+    """4 m x 4 m free room at 0.1 m resolution surrounded by walls."""
+    grid = np.zeros((40, 40), dtype=np.int8)
+    grid[0, :] = grid[-1, :] = grid[:, 0] = grid[:, -1] = 100
+    return grid
+
+
+def test_pose_is_on_the_ring_and_faces_the_marker(make_info):
+    info = make_info(0.1, 0.0, 0.0)
+    pose = solve_approach_pose(open_room(), info, 2.0, 2.0, 0.5, 2.0, 1.0, 99)
+    x, y, yaw = pose
+    assert abs(math.hypot(x - 2.0, y - 2.0) - 1.0) <= 0.2
+    # Closest side of the ring to the robot, looking at the marker
+    assert x < 2.0
+    assert math.isclose(yaw, math.atan2(2.0 - y, 2.0 - x))
+
+
+def test_no_pose_without_free_cells(make_info):
+    grid = np.full((40, 40), 100, dtype=np.int8)
+    assert solve_approach_pose(grid, make_info(0.1, 0.0, 0.0), 2.0, 2.0, 0.5, 2.0, 1.0, 99) is None
+
+
+def test_ring_in_a_closed_room_is_unreachable(make_info):
+    # The marker and the whole ring lie in a closed room the robot is outside of
+    grid = np.zeros((60, 60), dtype=np.int8)
+    grid[10:40, 10] = grid[10:40, 39] = grid[10, 10:40] = grid[39, 10:40] = 100
+    info = make_info(0.1, 0.0, 0.0)
+    assert solve_approach_pose(grid, info, 2.5, 2.5, 5.0, 5.0, 1.0, 99) is None
+
+
+def test_reachable_mask_of_a_crop(make_info):
+    grid = open_room()
+    grid[:, 20] = 100
+    info = make_info(0.1, 0.0, 0.0)
+
+    # Only the right half of a crop is given as reachable
+    crop = (slice(5, 35), slice(5, 35))
+    reachable = np.zeros((30, 30), dtype=bool)
+    reachable[:, 16:29] = free_mask(grid[crop], 99)[:, 16:29]
+    x, y, yaw = solve_approach_pose(grid, info, 1.95, 2.0, 0.5, 2.0, 1.0, 99, marker_margin=0.2,
+                                    reachable=reachable, reachable_offset=(5, 5))
+    assert x > 2.0
+
+
+def test_shortest_path_beats_straight_line(make_info):
+    # A wall with a gap at the bottom: the top of the ring is closer in a straight line but the
+    # robot has to go around the wall to get there
+    grid = open_room()
+    grid[10:, 20] = 100
+    info = make_info(0.1, 0.0, 0.0)
+    robot_x, robot_y = 1.0, 3.5
+    x, y, yaw = solve_approach_pose(grid, info, 3.0, 2.5, robot_x, robot_y, 1.0, 99,
+                                    clearance=0.1)
+    assert y < 2.5
+
+
+def test_wavefront_reaches_the_closest_targets_first():
+    passable = np.ones((5, 10), dtype=bool)
+    passable[1:, 4] = False
+    targets = np.zeros_like(passable)
+    targets[4, 3] = targets[4, 5] = True
+    hit = wavefront_targets(passable, (4, 0), targets)
+    assert hit[4, 3] and not hit[4, 5]
+
+
+def test_wavefront_without_reachable_targets():
+    passable = reachable_mask(np.ones((5, 5), dtype=bool), (0, 0))
+    targets = np.zeros_like(passable)
+    assert not wavefront_targets(passable, (0, 0), targets).any()
+
+
+def test_line_of_sight_is_blocked_by_walls(make_info):
+    grid = np.zeros((20, 20), dtype=np.int8)
+    grid[:, 10] = 100
+    info = make_info(0.1, 0.0, 0.0)
+    x = np.array([0.5, 1.5])
+    y = np.array([1.0, 1.0])
+    distances = np.hypot(x - 1.8, y - 1.0)
+    visible = line_of_sight(grid, info, x, y, 1.8, 1.0, distances, 99, 0.05)
+    assert list(visible) == [False, True]
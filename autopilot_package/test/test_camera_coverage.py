@@ -0,0 +1,63 @@
+import numpy as np
+
+from autopilot_package.camera_coverage import CameraCoverage
+
+
+def room_grid():
+    """Free 40x40 grid at 0.1 m with a wall on the columns 30 and more."""
+    grid = np.zeros((40, 40), dtype=np.int8)
+    grid[:, 30:] = 100
+    return grid
+
+
+def full_crop(grid):
+    return (slice(0, grid.shape[0]), slice(0, grid.shape[1]))
+
+
+def test_update_marks_the_walls_in_view(make_info):
+    grid = room_grid()
+    info = make_info(0.1, 0.0, 0.0)
+    coverage = CameraCoverage(fov=1.0, max_range=2.5)
+
+    before = coverage.unseen_walls(grid, info, full_crop(grid))
+    coverage.update(grid, info, 1.0, 2.0, 0.0)
+    after = coverage.unseen_walls(grid, info, full_crop(grid))
+
+    assert before.sum() == 40
+    assert 0 < after.sum() < before.sum()
+    assert not after[20, 30]
+
+
+def test_seen_cells_survive_map_growth(make_info):
+    grid = room_grid()
+    info = make_info(0.1, 0.0, 0.0)
+    coverage = CameraCoverage(fov=1.0, max_range=2.5)
+    coverage.update(grid, info, 1.0, 2.0, 0.0)
+    unseen = coverage.unseen_walls(grid, info, full_crop(grid))
+
+    # The costmap grows by 10 cells on every side, its origin moves accordingly
+    grown = np.full((60, 60), -1, dtype=np.int8)
+    grown[10:50, 10:50] = grid
+    grown_info = make_info(0.1, -1.0, -1.0)
+    grown_unseen = coverage.unseen_walls(grown, grown_info, full_crop(grown))
+
+    assert np.array_equal(grown_unseen[10:50, 10:50], unseen)
+
+
+def test_seen_mask_of_a_crop(make_info):
+    grid = room_grid()
+    info = make_info(0.1, 0.0, 0.0)
+    coverage = CameraCoverage(fov=1.0, max_range=2.5)
+    coverage.update(grid, info, 1.0, 2.0, 0.0)
+
+    crop = (slice(10, 30), slice(25, 35))
+    full_mask = coverage.seen_mask(info, full_crop(grid))
+    assert np.array_equal(coverage.seen_mask(info, crop), full_mask[crop])
+
+
+def test_attempted_walls():
+    coverage = CameraCoverage(attempt_radius=0.5)
+    assert not coverage.was_attempted(1.0, 1.0)
+    coverage.mark_attempted(1.0, 1.0)
+    assert coverage.was_attempted(1.3, 1.0)
+    assert not coverage.was_attempted(2.0, 1.0)
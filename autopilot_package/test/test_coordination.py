@@ -0,0 +1,83 @@
+import json
+
+import numpy as np
+
+from autopilot_package.coordination import ClaimBoard
+
+
+def test_claims_of_teammates_are_stored():
+    board = ClaimBoard('robot1')
+    assert board.receive(ClaimBoard('robot2').encode(1.0, 2.0, 0.0, 0.0), 0.0)
+    assert np.array_equal(board.active_claims(0.0), [[1.0, 2.0, 0.0, 0.0]])
+
+
+def test_own_claims_are_ignored():
+    board = ClaimBoard('robot1')
+    assert not board.receive(board.encode(1.0, 2.0, 0.0, 0.0), 0.0)
+
+
+def test_claims_in_another_frame_are_ignored():
+    board = ClaimBoard('robot1')
+    other_frame = ClaimBoard('robot2', frame_id='robot2/map')
+    assert not board.receive(other_frame.encode(1.0, 2.0, 0.0, 0.0), 0.0)
+
+    # Claims without a frame cannot be trusted either
+    no_frame = {'robot_id': 'robot2', 'goal': [1.0, 2.0], 'robot': [0.0, 0.0]}
+    assert not board.receive(json.dumps(no_frame), 0.0)
+    assert len(board.active_claims(0.0)) == 0
+
+
+def test_malformed_claims_are_ignored():
+    board = ClaimBoard('robot1')
+    assert not board.receive('not json', 0.0)
+    assert not board.receive(json.dumps({'robot_id': 'robot2'}), 0.0)
+
+
+def test_claims_expire():
+    board = ClaimBoard('robot1', claim_timeout=30.0)
+    board.receive(ClaimBoard('robot2').encode(1.0, 2.0, 0.0, 0.0), 0.0)
+    assert len(board.active_claims(30.0)) == 1
+    assert len(board.active_claims(31.0)) == 0
+
+
+def test_penalties_near_claims():
+    board = ClaimBoard('robot1', claim_radius=1.5, penalty=5.0)
+    board.receive(ClaimBoard('robot2').encode(0.0, 0.0, 0.0, 0.0), 0.0)
+    penalties = board.penalties([[0.0, 0.0], [0.75, 0.0], [3.0, 0.0]], 0.0)
+    assert np.allclose(penalties, [5.0, 2.5, 0.0])
+
+
+def test_assign_leaves_cheaper_candidates_to_teammates():
+    board = ClaimBoard('robot1')
+    board.receive(ClaimBoard('robot2').encode(10.0, 0.0, 10.0, 0.0), 0.0)
+    points = np.array([[1.0, 0.0], [10.0, 0.0]])
+    available = board.assign(points, np.linalg.norm(points, axis=1), 0.0)
+    assert available.tolist() == [True, False]
+
+
+def test_refreshed_claims_do_not_expire():
+    teammate = ClaimBoard('robot2', claim_timeout=30.0)
+    board = ClaimBoard('robot1', claim_timeout=30.0)
+    assert teammate.refresh_period < teammate.claim_timeout / 2
+
+    # The teammate drives for 100 s, publishing its claim every refresh_period
+    now = 0.0
+    board.receive(teammate.claim(5.0, 0.0, 0.0, 0.0), now)
+    while now < 100.0:
+        now += 1.0
+        if now % teammate.refresh_period == 0 and teammate.goal is not None:
+            board.receive(teammate.claim(*teammate.goal, now / 100.0, 0.0), now)
+        assert len(board.active_claims(now)) == 1
+
+    # Once released the claim is no longer published and expires
+    teammate.release()
+    assert teammate.goal is None
+    assert len(board.active_claims(now + teammate.claim_timeout + 1.0)) == 0
+
+
+def test_claim_remembers_the_goal():
+    board = ClaimBoard('robot1')
+    message = json.loads(board.claim(1.0, 2.0, 3.0, 4.0))
+    assert board.goal == (1.0, 2.0)
+    assert message['goal'] == [1.0, 2.0]
+    assert message['robot'] == [3.0, 4.0]
@@ -0,0 +1,54 @@
+import numpy as np
+
+from autopilot_package.frontier import reachable_mask
+
+
+def serpentine(size):
+    """Free grid split by walls every 4 rows, with a gap alternating between the two ends."""
+    free = np.ones((size, size), dtype=bool)
+    for row in range(2, size, 4):
+        free[row, :] = False
+        if (row // 4) % 2:
+            free[row, :2] = True
+        else:
+            free[row, -2:] = True
+    return free
+
+
+def test_reachable_mask_stops_at_walls():
+    free = np.ones((5, 7), dtype=bool)
+    free[:, 3] = False
+    reached = reachable_mask(free, (2, 1))
+    assert reached[:, :3].all()
+    assert not reached[:, 3:].any()
+
+
+def test_reachable_mask_is_4_connected():
+    free = np.array([[True, False],
+                     [False, True]])
+    reached = reachable_mask(free, (0, 0))
+    assert reached.tolist() == [[True, False], [False, False]]
+
+
+def test_reachable_mask_starts_from_the_closest_free_cell():
+    free = np.zeros((3, 3), dtype=bool)
+    free[0, :] = True
+    reached = reachable_mask(free, (2, 1))
+    assert reached[0, :].all() and reached.sum() == 3
+
+
+def test_reachable_mask_without_free_cell():
+    assert not reachable_mask(np.zeros((4, 4), dtype=bool), (1, 1)).any()
+
+
+def test_reachable_mask_follows_a_serpentine():
+    free = serpentine(200)
+    assert np.array_equal(reachable_mask(free, (0, 0)), free)
+
+
+def test_reachable_mask_separates_components():
+    free = serpentine(40)
+    free[2, -2:] = False
+    reached = reachable_mask(free, (0, 0))
+    assert reached[:2].all()
+    assert not reached[3:].any()
@@ -0,0 +1,60 @@
+from autopilot_package.frontier_memory import FrontierMemory
+from autopilot_package.tour_planner import TourPlanner
+
+
+def test_missing_cluster_keeps_its_history():
+    memory = FrontierMemory(decay_time=120.0, expiry=600.0)
+    memory.update([1, 2], [10, 10], 0.0)
+    memory.record_target(1, 0.0)
+
+    # Cluster 1 is filtered out for a while, then comes back
+    memory.update([2], [10], 10.0)
+    memory.update([1, 2], [10, 10], 20.0)
+
+    assert memory.records[1]['targeted'] == 1
+    assert memory.penalties([1], [[0.0, 0.0]], 20.0)[0] > 0.0
+
+
+def test_unseen_records_expire():
+    memory = FrontierMemory(expiry=600.0)
+    memory.update([1, 2], [10, 10], 0.0)
+    memory.update([2], [10], 300.0)
+    assert 1 in memory.records
+    memory.update([2], [10], 700.0)
+    assert 1 not in memory.records
+    assert 2 in memory.records
+
+
+def test_stubborn_cluster():
+    memory = FrontierMemory(shrink_ratio=0.8)
+    memory.update([1], [10], 0.0)
+    memory.record_target(1, 0.0)
+    memory.update([1], [9], 30.0)
+    memory.record_target(1, 30.0)
+    assert memory.records[1]['stubborn'] == 1
+
+
+def test_vanished_cluster_is_not_stubborn():
+    memory = FrontierMemory(shrink_ratio=0.8)
+    memory.update([1, 2], [10, 10], 0.0)
+    memory.record_target(1, 0.0)
+    memory.update([2], [10], 30.0)
+    memory.record_target(2, 30.0)
+    assert memory.records[1]['stubborn'] == 0
+
+
+def test_failures_penalize_nearby_clusters():
+    memory = FrontierMemory(failure_penalty=5.0, failure_radius=1.0)
+    memory.record_failure(0.0, 0.0, 0.0)
+    penalties = memory.penalties([1, 2], [[0.5, 0.0], [3.0, 0.0]], 0.0)
+    assert penalties[0] == 5.0
+    assert penalties[1] == 0.0
+
+
+def test_tour_keys_survive_being_left_out():
+    planner = TourPlanner(match_radius=0.5)
+    keys = planner.match([[0.0, 0.0], [5.0, 0.0]])
+
+    # Only the second point goes into the tour, the first one comes back later
+    planner.update([[5.0, 0.0]], (0.0, 0.0), keys=keys[1:])
+    assert planner.match([[0.1, 0.0], [5.0, 0.1]]) == keys
@@ -0,0 +1,56 @@
+import numpy as np
+
+from autopilot_package.known_region import KnownRegion
+
+
+def test_unknown_grid_has_no_crop(make_info):
+    region = KnownRegion()
+    assert region.update(np.full((50, 50), -1, dtype=np.int8), make_info(0.05, 0.0, 0.0)) is None
+
+
+def test_crop_covers_the_known_cells_and_the_margin(make_info):
+    grid = np.full((100, 100), -1, dtype=np.int8)
+    grid[40:50, 30:35] = 0
+    region = KnownRegion(margin=5)
+    assert region.update(grid, make_info(0.05, 0.0, 0.0)) == (slice(35, 55), slice(25, 40))
+
+
+def test_crop_is_clipped_to_the_grid(make_info):
+    grid = np.full((100, 100), -1, dtype=np.int8)
+    grid[0:3, 95:100] = 0
+    region = KnownRegion(margin=5)
+    assert region.update(grid, make_info(0.05, 0.0, 0.0)) == (slice(0, 8), slice(90, 100))
+
+
+def test_box_grows_within_the_band(make_info):
+    grid = np.full((200, 200), -1, dtype=np.int8)
+    grid[90:110, 90:110] = 0
+    info = make_info(0.05, 0.0, 0.0)
+    region = KnownRegion(margin=0, band=20)
+    region.update(grid, info)
+
+    grid[110:120, 100:105] = 100
+    assert region.update(grid, info) == (slice(90, 120), slice(90, 110))
+
+
+def test_known_cells_reaching_the_band_edge_trigger_a_full_scan(make_info):
+    grid = np.full((200, 200), -1, dtype=np.int8)
+    grid[90:110, 90:110] = 0
+    info = make_info(0.05, 0.0, 0.0)
+    region = KnownRegion(margin=0, band=10)
+    region.update(grid, info)
+
+    # A corridor running out of the band
+    grid[100, 110:190] = 0
+    assert region.update(grid, info) == (slice(90, 110), slice(90, 190))
+
+
+def test_geometry_change_rescans_the_grid(make_info):
+    grid = np.full((100, 100), -1, dtype=np.int8)
+    grid[40:50, 40:50] = 0
+    region = KnownRegion(margin=0)
+    region.update(grid, make_info(0.05, 0.0, 0.0))
+
+    grown = np.full((120, 120), -1, dtype=np.int8)
+    grown[10:110, 10:110] = grid
+    assert region.update(grown, make_info(0.05, -0.5, -0.5)) == (slice(50, 60), slice(50, 60))
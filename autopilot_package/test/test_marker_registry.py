@@ -0,0 +1,49 @@
+from autopilot_package.marker_registry import MarkerRegistry
+
+
+def test_detections_of_one_marker_share_a_provisional_id():
+    registry = MarkerRegistry(match_radius=0.5)
+    first = registry.add_detection(1.0, 2.0)
+    assert first < 0
+    assert registry.add_detection(1.1, 2.0) == first
+    assert registry.add_detection(3.0, 2.0) != first
+
+
+def test_marker_is_only_localised_by_an_approach():
+    registry = MarkerRegistry()
+    for _ in range(20):
+        marker_id = registry.add_detection(1.0, 2.0)
+    assert not registry.is_localised(1.0, 2.0)
+    registry.mark_localised(marker_id)
+    assert registry.is_localised(1.0, 2.0)
+
+
+def test_marker_position_is_the_mean_of_its_last_samples():
+    registry = MarkerRegistry(max_samples=2)
+    marker_id = registry.add_detection(1.0, 2.0)
+    registry.add_detection(1.2, 2.0)
+    registry.add_detection(1.4, 2.0)
+    assert abs(registry.markers[marker_id]['x'] - 1.3) < 1e-9
+
+
+def test_average_gives_the_provisional_marker_its_real_id():
+    registry = MarkerRegistry()
+    provisional_id = registry.add_detection(1.0, 2.0)
+    assert registry.update_average(42, 1.05, 2.0) == 42
+    assert provisional_id not in registry.markers
+    assert registry.match(1.0, 2.0) == 42
+
+
+def test_mark_localised_with_a_renamed_provisional_id():
+    # The approach starts with the provisional ID, the averages rename the marker during the dwell
+    registry = MarkerRegistry()
+    provisional_id = registry.add_detection(1.0, 2.0)
+    registry.update_average(42, 1.0, 2.0)
+    registry.mark_localised(provisional_id)
+    assert registry.is_localised(1.0, 2.0)
+
+
+def test_mark_localised_unknown_id_is_ignored():
+    registry = MarkerRegistry()
+    registry.mark_localised(7)
+    assert registry.markers == {}
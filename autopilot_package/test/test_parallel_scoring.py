@@ -0,0 +1,87 @@
+from multiprocessing import shared_memory
+
+import numpy as np
+import pytest
+
+from autopilot_package.parallel_scoring import ParallelScorer, score_frontier_cells, score_tile
+
+
+def explored_grid():
+    """Unknown 60x70 grid with two free rooms, walls and an opening between them."""
+    grid = np.full((60, 70), -1, dtype=np.int8)
+    grid[5:30, 5:40] = 0
+    grid[25:55, 30:65] = 0
+    grid[5:30, 20] = 100
+    grid[12:16, 20] = 0
+    return grid
+
+
+def as_set(rows, cols, gains):
+    return set(zip(rows.tolist(), cols.tolist(), gains.tolist()))
+
+
+@pytest.fixture
+def scorer():
+    scorer = ParallelScorer(workers=2, tile_size=16, num_rays=8, max_range=12, k=1000)
+    yield scorer
+    scorer.shutdown()
+
+
+def test_process_pool_matches_serial_scoring(scorer):
+    grid = explored_grid()
+    serial = score_frontier_cells(grid, 75, num_rays=8, max_range=12, k=1000)
+    assert len(serial[0]) > 0
+    assert as_set(*scorer.score(grid, 75)) == as_set(*serial)
+
+
+def test_process_pool_matches_serial_scoring_in_a_crop(scorer):
+    grid = explored_grid()
+    crop = (slice(3, 40), slice(10, 50))
+    serial = score_frontier_cells(grid, 75, crop, num_rays=8, max_range=12, k=1000)
+    assert as_set(*scorer.score(grid, 75, crop)) == as_set(*serial)
+
+
+def test_best_cells_have_the_serial_gains(scorer):
+    grid = explored_grid()
+    scorer.k = 5
+    serial_gains = score_frontier_cells(grid, 75, num_rays=8, max_range=12, k=5)[2]
+    assert list(scorer.score(grid, 75)[2]) == list(serial_gains)
+
+
+def test_tile_scoring_from_shared_memory():
+    grid = explored_grid()
+    shared = shared_memory.SharedMemory(create=True, size=grid.nbytes)
+    try:
+        np.ndarray(grid.shape, dtype=np.int8, buffer=shared.buf)[:] = grid
+        rows, cols, gains = score_tile(shared.name, grid.shape, (0, 60, 0, 70), 75, 8, 12, 99,
+                                       1000)
+    finally:
+        shared.close()
+        shared.unlink()
+    assert as_set(rows, cols, gains) == as_set(*score_frontier_cells(grid, 75, num_rays=8,
+                                                                     max_range=12, k=1000))
+
+
+def test_shutdown_frees_the_shared_memory():
+    scorer = ParallelScorer(workers=1, tile_size=32, num_rays=8, max_range=12)
+    scorer.score(explored_grid(), 75)
+    name = scorer.shared.name
+
+    scorer.shutdown()
+    assert scorer.executor is None
+    assert scorer.shared is None
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
+
+    # Shutting down twice is harmless
+    scorer.shutdown()
+
+
+def test_larger_grid_replaces_the_shared_memory(scorer):
+    scorer.score(explored_grid(), 75)
+    name = scorer.shared.name
+
+    scorer.score(np.tile(explored_grid(), (2, 1)), 75)
+    assert scorer.shared.name != name
+    with pytest.raises(FileNotFoundError):
+        shared_memory.SharedMemory(name=name)
@@ -0,0 +1,53 @@
+from autopilot_package.progress_watchdog import ProgressWatchdog
+
+
+def test_not_stalled_before_a_full_window():
+    watchdog = ProgressWatchdog(window=10.0, min_rate=0.05)
+    watchdog.start(5.0, 0.0, 0.0)
+    watchdog.update(0.0, 0.0, 1.0)
+    assert not watchdog.stalled(5.0)
+
+
+def test_steady_progress_is_not_stalled():
+    watchdog = ProgressWatchdog(window=10.0, min_rate=0.05)
+    watchdog.start(20.0, 0.0, 0.0)
+    for t in range(31):
+        watchdog.update(0.5 * t, 0.0, float(t))
+    assert not watchdog.stalled(30.0)
+
+
+def test_silent_pose_stream_counts_as_no_progress():
+    # SLAM Toolbox stops publishing /pose when the robot stops moving
+    watchdog = ProgressWatchdog(window=10.0, min_rate=0.05)
+    watchdog.start(5.0, 0.0, 0.0)
+    watchdog.update(0.0, 0.0, 0.5)
+    assert watchdog.stalled(600.0)
+
+
+def test_stopping_after_moving_is_stalled():
+    watchdog = ProgressWatchdog(window=10.0, min_rate=0.05)
+    watchdog.start(5.0, 0.0, 0.0)
+    watchdog.update(0.0, 0.0, 0.0)
+    watchdog.update(0.3, 0.0, 1.0)
+    assert not watchdog.stalled(5.0)
+    assert watchdog.stalled(600.0)
+
+
+def test_no_pose_at_all_is_stalled():
+    watchdog = ProgressWatchdog(window=10.0, min_rate=0.05)
+    watchdog.start(5.0, 0.0, 0.0)
+    assert watchdog.stalled(10.0)
+
+
+def test_close_to_goal_is_left_to_nav2():
+    watchdog = ProgressWatchdog(window=10.0, min_rate=0.05, goal_tolerance=0.3)
+    watchdog.start(5.0, 0.0, 0.0)
+    watchdog.update(4.8, 0.0, 0.0)
+    assert not watchdog.stalled(600.0)
+
+
+def test_stopped_watchdog_never_stalls():
+    watchdog = ProgressWatchdog()
+    watchdog.start(5.0, 0.0, 0.0)
+    watchdog.stop()
+    assert not watchdog.stalled(600.0)
@@ -0,0 +1,118 @@
+import numpy as np
+
+from autopilot_package.room_segmentation import RoomSegmentation
+
+
+def two_rooms():
+    """5 m x 10 m map at 0.05 m: two 5 m x 5 m rooms joined by a 0.6 m door in the middle wall."""
+    grid = np.zeros((100, 200), dtype=np.int8)
+    grid[0, :] = grid[-1, :] = grid[:, 0] = grid[:, -1] = 100
+    grid[:, 98:102] = 100
+    grid[44:56, 98:102] = 0
+    return grid
+
+
+def full_crop(grid):
+    return (slice(0, grid.shape[0]), slice(0, grid.shape[1]))
+
+
+def test_clearance_counts_the_erosions():
+    free = np.zeros((7, 7), dtype=bool)
+    free[1:6, 1:6] = True
+    clearance = RoomSegmentation().clearance(free)
+    assert clearance[3, 3] == 3
+    assert clearance[2, 3] == 2
+    assert clearance[1, 1] == 1
+    assert clearance[0, 0] == 0
+
+
+def test_grow_fills_the_free_cells_connected_to_a_core():
+    free = np.ones((3, 6), dtype=bool)
+    free[:, 3] = False
+    labels = np.zeros((3, 6), dtype=np.int32)
+    labels[1, 0] = 1
+    grown = RoomSegmentation().grow(labels, free)
+    assert (grown[:, :3] == 1).all()
+    assert (grown[:, 3:] == 0).all()
+
+
+def test_door_separates_the_rooms(make_info):
+    grid = two_rooms()
+    info = make_info(0.05, 0.0, 0.0)
+    rooms = RoomSegmentation(door_width=1.0)
+    rooms.update(grid, info, 75, full_crop(grid), 0.0)
+
+    left, right = rooms.rooms_at(np.array([2.5, 7.5]), np.array([2.5, 2.5]), info)
+    assert left > 0 and right > 0
+    assert left != right
+
+
+def test_wide_opening_is_one_room(make_info):
+    grid = two_rooms()
+    grid[10:90, 98:102] = 0
+    info = make_info(0.05, 0.0, 0.0)
+    rooms = RoomSegmentation(door_width=1.0)
+    rooms.update(grid, info, 75, full_crop(grid), 0.0)
+
+    left, right = rooms.rooms_at(np.array([2.5, 7.5]), np.array([2.5, 2.5]), info)
+    assert left == right > 0
+
+
+def test_room_ids_survive_map_growth(make_info):
+    grid = two_rooms()
+    info = make_info(0.05, 0.0, 0.0)
+    rooms = RoomSegmentation(door_width=1.0)
+    rooms.update(grid, info, 75, full_crop(grid), 0.0)
+    x, y = np.array([2.5, 7.5]), np.array([2.5, 2.5])
+    before = rooms.rooms_at(x, y, info)
+
+    # The costmap grows by 1 m (5 coarse cells) to the bottom left
+    grown = np.full((120, 220), -1, dtype=np.int8)
+    grown[20:, 20:] = grid
+    grown_info = make_info(0.05, -1.0, -1.0)
+    assert rooms.needs_update(grown, grown_info, full_crop(grown), 1.0)
+    rooms.update(grown, grown_info, 75, full_crop(grown), 1.0)
+    assert list(rooms.rooms_at(x, y, grown_info)) == list(before)
+
+
+def test_new_rooms_get_new_ids():
+    rooms = RoomSegmentation()
+    first = np.array([[1, 1, 0, 2, 2]], dtype=np.int32)
+    rooms.labels = rooms.match_previous(first, (0, 0))
+    assert list(rooms.labels[0]) == [1, 1, 0, 2, 2]
+
+    # The first room splits in two: the larger part keeps its id, the other one gets a new id
+    second = np.array([[1, 2, 0, 3, 3, 0, 0]], dtype=np.int32)
+    second[0, 0] = 5
+    matched = rooms.match_previous(second, (0, -1))
+    assert matched[0, 3] == 2
+    assert len({matched[0, 0], matched[0, 1]}) == 2
+    assert max(matched[0, 0], matched[0, 1]) == 3
+
+
+def test_points_without_room_take_a_neighbouring_room(make_info):
+    grid = two_rooms()
+    info = make_info(0.05, 0.0, 0.0)
+    rooms = RoomSegmentation(door_width=1.0)
+    rooms.update(grid, info, 75, full_crop(grid), 0.0)
+
+    # A point on the outer wall takes the room next to it, a point far away has no room
+    wall, inside, far = rooms.rooms_at(np.array([0.01, 0.5, 30.0]), np.array([2.5, 2.5, 30.0]),
+                                       info)
+    assert wall == inside > 0
+    assert far == 0
+
+
+def test_needs_update_after_growth_or_period(make_info):
+    grid = np.full((100, 100), -1, dtype=np.int8)
+    grid[40:60, 40:60] = 0
+    info = make_info(0.05, 0.0, 0.0)
+    crop = full_crop(grid)
+    rooms = RoomSegmentation(update_growth=0.05, update_period=10.0)
+    assert rooms.needs_update(grid, info, crop, 0.0)
+    rooms.update(grid, info, 75, crop, 0.0)
+    assert not rooms.needs_update(grid, info, crop, 5.0)
+    assert rooms.needs_update(grid, info, crop, 10.0)
+
+    grid[60:65, 40:60] = 0
+    assert rooms.needs_update(grid, info, crop, 5.0)
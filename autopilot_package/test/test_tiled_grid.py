@@ -0,0 +1,78 @@
+import numpy as np
+
+from autopilot_package.frontier import find_frontier_clusters
+from autopilot_package.tiled_grid import TiledGrid
+
+
+def explored_grid():
+    """Unknown 50x50 grid with a free room in the middle and a wall on its left side."""
+    grid = np.full((50, 50), -1, dtype=np.int8)
+    grid[10:40, 12:35] = 0
+    grid[10:40, 12] = 100
+    return grid
+
+
+def cluster_sizes(clusters):
+    return sorted(cluster.size for cluster in clusters)
+
+
+def full_grid_sizes(grid, info):
+    return cluster_sizes(find_frontier_clusters(grid, info, 75))
+
+
+def test_clusters_match_the_full_grid(make_info):
+    grid = explored_grid()
+    info = make_info(0.05, 0.0, 0.0)
+    tiled = TiledGrid(tile_size=16)
+    tiled.update(grid, info)
+    assert cluster_sizes(tiled.frontier_clusters(info)) == full_grid_sizes(grid, info)
+
+
+def test_unchanged_grid_changes_no_tile(make_info):
+    grid = explored_grid()
+    info = make_info(0.05, 0.0, 0.0)
+    tiled = TiledGrid(tile_size=16)
+    tiled.update(grid, info)
+    assert tiled.update(grid, info) == []
+
+
+def test_tiles_are_shifted_when_the_map_grows(make_info):
+    grid = explored_grid()
+    info = make_info(0.05, 0.0, 0.0)
+    tiled = TiledGrid(tile_size=16)
+    tiled.update(grid, info)
+    tiles = dict(tiled.tiles)
+
+    # The costmap grows by one tile on the bottom and left, its origin moves accordingly
+    grown = np.full((66, 66), -1, dtype=np.int8)
+    grown[16:, 16:] = grid
+    grown_info = make_info(0.05, -0.8, -0.8)
+    changed = tiled.update(grown, grown_info)
+
+    # Tiles keep their map-frame key and array, only the ones crossing the old border changed
+    assert all(tiled.tiles[key] is tile for key, tile in tiles.items())
+    assert len(changed) < len(tiles)
+    assert cluster_sizes(tiled.frontier_clusters(grown_info)) == full_grid_sizes(grown, grown_info)
+
+
+def test_tiles_follow_a_crop(make_info):
+    grid = explored_grid()
+    info = make_info(0.05, 0.0, 0.0)
+    tiled = TiledGrid(tile_size=16)
+    tiled.update(grid, info, (slice(10, 40), slice(12, 35)))
+    assert cluster_sizes(tiled.frontier_clusters(info)) == full_grid_sizes(grid, info)
+
+
+def test_threshold_change_resummarises_the_tiles(make_info):
+    # Inflated cells of cost 80 around the room: free below a threshold of 90, obstacles at 75
+    grid = explored_grid()
+    grid[10:40, 12:35] = 80
+    info = make_info(0.05, 0.0, 0.0)
+    tiled = TiledGrid(tile_size=16)
+    tiled.update(grid, info)
+    assert tiled.frontier_clusters(info) == []
+
+    tiled.set_obstacle_probability(90)
+    expected = cluster_sizes(find_frontier_clusters(grid, info, 90))
+    assert expected
+    assert cluster_sizes(tiled.frontier_clusters(info)) == expected
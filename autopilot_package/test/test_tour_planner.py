@@ -0,0 +1,95 @@
+import math
+
+import numpy as np
+
+from autopilot_package.tour_planner import TourPlanner, heading_costs
+
+
+def tour_length(points, start, keys, tour):
+    position = {key: point for key, point in zip(keys, points)}
+    path = [start] + [position[key] for key in tour]
+    return sum(math.dist(a, b) for a, b in zip(path[:-1], path[1:]))
+
+
+def test_points_on_a_line_are_visited_in_order():
+    planner = TourPlanner()
+    points = np.array([[3.0, 0.0], [1.0, 0.0], [4.0, 0.0], [2.0, 0.0]])
+    keys, tour = planner.update(points, (0.0, 0.0))
+    assert tour == [keys[1], keys[3], keys[0], keys[2]]
+
+
+def test_two_opt_removes_crossings():
+    planner = TourPlanner()
+    rng = np.random.default_rng(0)
+    points = rng.uniform(0.0, 10.0, (30, 2))
+    keys, tour = planner.update(points, (0.0, 0.0))
+
+    # No pair of edges can be swapped to shorten the tour
+    path = [(0.0, 0.0)] + [points[keys.index(key)] for key in tour]
+    for i in range(1, len(path) - 1):
+        for k in range(i + 1, len(path)):
+            before = math.dist(path[i - 1], path[i])
+            after = math.dist(path[i - 1], path[k])
+            if k + 1 < len(path):
+                before += math.dist(path[k], path[k + 1])
+                after += math.dist(path[i], path[k + 1])
+            assert after >= before - 1e-9
+
+
+def test_persisting_points_keep_their_keys():
+    planner = TourPlanner(match_radius=0.5)
+    keys, _ = planner.update([[1.0, 0.0], [2.0, 0.0]], (0.0, 0.0))
+    moved_keys, tour = planner.update([[2.1, 0.0], [5.0, 0.0], [1.1, 0.0]], (0.0, 0.0))
+    assert moved_keys[0] == keys[1]
+    assert moved_keys[2] == keys[0]
+    assert moved_keys[1] not in keys
+    assert sorted(tour) == sorted(moved_keys)
+
+
+def test_vanished_points_leave_the_tour():
+    planner = TourPlanner()
+    keys, _ = planner.update([[1.0, 0.0], [2.0, 0.0], [3.0, 0.0]], (0.0, 0.0))
+    _, tour = planner.update([[1.0, 0.0], [3.0, 0.0]], (0.0, 0.0))
+    assert tour == [keys[0], keys[2]]
+
+
+def test_new_points_are_inserted_in_the_cached_tour():
+    planner = TourPlanner()
+    points = [[1.0, 0.0], [2.0, 0.0], [3.0, 0.0], [4.0, 0.0]]
+    planner.update(points, (0.0, 0.0))
+    points = points + [[2.5, 0.1]]
+    keys, tour = planner.update(points, (0.0, 0.0))
+    assert tour.index(keys[4]) == 2
+    assert math.isclose(tour_length(points, (0.0, 0.0), keys, tour), 4.0, abs_tol=0.05)
+
+
+def test_start_costs_replace_the_first_leg():
+    planner = TourPlanner()
+    points = np.array([[1.0, 0.0], [-1.0, 0.0]])
+    keys, tour = planner.update(points, (0.0, 0.0), start_costs=np.array([5.0, 1.0]))
+    assert tour[0] == keys[1]
+
+
+def test_empty_update():
+    planner = TourPlanner()
+    planner.update([[1.0, 0.0]], (0.0, 0.0))
+    assert planner.update(np.zeros((0, 2)), (0.0, 0.0)) == ([], [])
+
+
+def test_heading_costs_prefer_points_ahead():
+    costs = heading_costs([[1.0, 0.0], [-1.0, 0.0], [0.0, 1.0]], (0.0, 0.0), 0.0, 0.3)
+    assert np.allclose(costs, [1.0, 1.0 + 0.3 * math.pi, 1.0 + 0.3 * math.pi / 2])
+
+
+def test_keys_unmatched_for_too_long_are_forgotten():
+    planner = TourPlanner(match_radius=0.5, max_unmatched=3)
+    keys = planner.match([[0.0, 0.0], [5.0, 0.0]])
+
+    # The first point stays away for 3 calls and keeps its key, then for 4 calls and loses it
+    for _ in range(3):
+        planner.match([[5.0, 0.0]])
+    assert planner.match([[0.0, 0.0], [5.0, 0.0]]) == keys
+    for _ in range(4):
+        planner.match([[5.0, 0.0]])
+    assert list(planner.seen) == [keys[1]]
+    assert planner.match([[0.0, 0.0], [5.0, 0.0]])[0] not in keys
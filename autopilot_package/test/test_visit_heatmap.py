@@ -0,0 +1,50 @@
+import numpy as np
+
+from autopilot_package.visit_heatmap import VisitHeatmap
+
+
+def test_unvisited_places_are_cold():
+    heatmap = VisitHeatmap()
+    assert list(heatmap.values(np.array([0.0, 10.0]), np.array([0.0, -3.0]))) == [0.0, 0.0]
+
+    heatmap.add_visit(0.1, 0.1, 0.0)
+    assert list(heatmap.values(np.array([0.2, 10.0]), np.array([0.3, -3.0]))) == [1.0, 0.0]
+
+
+def test_visits_decay_with_the_half_life():
+    heatmap = VisitHeatmap(cell_size=0.5, half_life=10.0)
+    heatmap.add_visit(0.0, 0.0, 0.0)
+    heatmap.add_visit(5.0, 5.0, 10.0)
+    values = heatmap.values(np.array([0.0, 5.0]), np.array([0.0, 5.0]))
+    assert np.allclose(values, [0.5, 1.0])
+
+
+def test_heatmap_grows_in_every_direction():
+    heatmap = VisitHeatmap(cell_size=1.0, half_life=1e9)
+    for x, y in [(0.5, 0.5), (-3.5, 0.5), (0.5, -2.5), (4.5, 6.5)]:
+        heatmap.add_visit(x, y, 0.0)
+
+    assert heatmap.heat.shape == (10, 9)
+    assert heatmap.offset == (-3, -4)
+    values = heatmap.values(np.array([0.5, -3.5, 0.5, 4.5, 2.5]),
+                            np.array([0.5, 0.5, -2.5, 6.5, 2.5]))
+    assert list(values) == [1.0, 1.0, 1.0, 1.0, 0.0]
+
+
+def test_out_of_order_stamps_do_not_heat_up_the_map():
+    heatmap = VisitHeatmap(cell_size=0.5, half_life=10.0)
+    heatmap.add_visit(0.0, 0.0, 10.0)
+    heatmap.add_visit(5.0, 5.0, 0.0)
+    assert heatmap.last_stamp == 10.0
+    assert np.allclose(heatmap.values(np.array([0.0]), np.array([0.0])), [1.0])
+
+
+def test_visited_since():
+    heatmap = VisitHeatmap(cell_size=1.0)
+    heatmap.add_visit(0.5, 0.5, 0.0)
+    heatmap.add_visit(2.5, 0.5, 20.0)
+
+    x = np.array([0.5, 2.5, 8.5])
+    y = np.array([0.5, 0.5, 8.5])
+    assert list(heatmap.visited_since(x, y, 10.0)) == [False, True, False]
+    assert list(heatmap.visited_since(x, y, 0.0)) == [True, True, False]
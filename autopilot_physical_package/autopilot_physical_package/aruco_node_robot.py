@@ -1,78 +1,190 @@
 import numpy as np
 import rclpy
+import rclpy.duration
 import math
 import time
 from random import randrange
 from rclpy.node import Node
+from rclpy.qos import QoSProfile, QoSHistoryPolicy, QoSReliabilityPolicy
 from geometry_msgs.msg import PoseWithCovarianceStamped
 from geometry_msgs.msg import PoseStamped
 from geometry_msgs.msg import PointStamped
+from geometry_msgs.msg import Point
 from std_msgs.msg import Header
 import yaml
 import cv2
 from cv_bridge import CvBridge
-from sensor_msgs.msg import Image
-
+from sensor_msgs.msg import Image, CompressedImage
+import threading
 from tf2_ros import TransformException
 from tf2_ros.buffer import Buffer
 from tf2_ros.transform_listener import TransformListener
-import tf2_geometry_msgs
-from collections import defaultdict
+from collections import defaultdict, deque
 from visualization_msgs.msg import Marker, MarkerArray
+from diagnostic_msgs.msg import DiagnosticArray, DiagnosticStatus, KeyValue
+from autopilot_physical_package.marker_tracker import MarkerTracker
+from autopilot_package.gray_converter import GrayConverter
+
+
+# Pipelines of the node: everything on the robot, only the corner detection on the robot ('edge',
+# publishing aruco_corners), or everything but the corner detection off the robot ('offboard',
+# subscribing to aruco_corners)
+PIPELINES = ('full', 'edge', 'offboard')
+
+# aruco_corners carries a MarkerArray with one Marker per detected marker: Marker.id is the ArUco
+# ID, Marker.points its 4 corners in the cv2.aruco order (x, y in full resolution pixels, z = 0)
+# and Marker.header the header of the camera frame they were detected in
+CORNERS_NAMESPACE = 'aruco_corners'
 
 
 class Aruco_detect(Node):
 
-    def __init__(self):
-        super().__init__('autopilot')
+    def __init__(self, node_name='autopilot', pipeline='full'):
+        super().__init__(node_name)
+        self.pipeline = self.declare_parameter('pipeline', pipeline).value
+        if self.pipeline not in PIPELINES:
+            self.get_logger().error(f"Unknown pipeline {self.pipeline}, running the full pipeline")
+            self.pipeline = 'full'
+
         self.camera_matrix = None
         self.dist_coeffs = None
-        self.load_camera_parameters("/home/ubuntu/aruco_detect/ost.yaml")
+        calibration_file = self.declare_parameter('calibration_file',
+                                                  "/home/ubuntu/aruco_detect/ost.yaml").value
+        self.load_camera_parameters(calibration_file)
 
         self.queue_size = 1
 
+        # Subscribe to the JPEG compressed frames instead of the raw ones, and decode them at
+        # 1/decode_reduction of their resolution (1, 2 or 4, the decoder skips the finer DCT
+        # coefficients)
+        self.use_compressed = self.declare_parameter('use_compressed', False).value
+        self.decode_reduction = self.declare_parameter('decode_reduction', 1).value
+        self.decode_flag = {
+            1: cv2.IMREAD_GRAYSCALE,
+            2: cv2.IMREAD_REDUCED_GRAYSCALE_2,
+            4: cv2.IMREAD_REDUCED_GRAYSCALE_4,
+        }.get(self.decode_reduction)
+        if self.decode_flag is None:
+            self.get_logger().error(f"Unsupported decode_reduction {self.decode_reduction}, "
+                                    "decoding at full resolution")
+            self.decode_reduction = 1
+            self.decode_flag = cv2.IMREAD_GRAYSCALE
+
         # Initialize cv_bridge
         self.bridge = CvBridge()
 
+        # Conversion of the frames to grayscale, reusing its output buffer
+        self.gray_converter = GrayConverter(self.bridge)
+
         # Initialize aruco dictionary
         self.aruco_dict = cv2.aruco.Dictionary_get(cv2.aruco.DICT_6X6_250)
         self.aruco_params = cv2.aruco.DetectorParameters_create()
 
+        # Detection restricted to the regions around the markers of the previous frame. Full frame
+        # searches run downscaled when the markers are expected to be large: expected_marker_size
+        # is their side (px) in the decoded frames, 0 searches at full resolution
+        self.expected_marker_size = self.declare_parameter('expected_marker_size', 0).value
+        self.tracker = MarkerTracker(self.aruco_dict, self.aruco_params,
+                                     expected_marker_size=self.expected_marker_size or None)
+
         # Initializing current position variable
         self.current_position = PointStamped()
         self.current_position.header.frame_id = 'map'
 
         self.robot_orientation = [0, 0, 0, 0]
 
-        self.tf_buffer = Buffer()
-        self.tf_listener = TransformListener(self.tf_buffer, self)
+        # The edge pipeline only publishes corners: the pose, the transforms and the averaging of
+        # the marker positions are left to the offboard node
+        self.estimates_positions = self.pipeline != 'edge'
+
+        if self.estimates_positions:
+            self.tf_buffer = Buffer()
+            self.tf_listener = TransformListener(self.tf_buffer, self)
+
+        # Maximum wait (s) for the camera transform at the capture time of a frame
+        self.transform_timeout = 0.1
 
         # Dictionary to store ArUco marker positions
         self.aruco_positions = defaultdict(list)
         
         self.update_interval = 2.0  # Update navigation goal every 2 seconds
-        self.navigation_timer = self.create_timer(self.update_interval, self.update_estimates)
+        if self.estimates_positions:
+            self.navigation_timer = self.create_timer(self.update_interval, self.update_estimates)
 
         self.pos_queue_size=40
 
         self.received_image = False
 
-        # Subscribe to /pose to determine the position of Turtlebot
-        self.position_subscriber = self.create_subscription(
-            PoseWithCovarianceStamped,
-            '/pose',
-            self.current_position_callback,
-            self.queue_size,
-            # callback_group=self.parallel_callback_group
-        )
+        # Latest camera frame waiting for detection, older frames are overwritten
+        self.frame_lock = threading.Lock()
+        self.latest_frame = None
+        self.frame_available = threading.Event()
+
+        # Frame statistics: received, overwritten before being processed, processed, and the summed
+        # delay (s) from capture to the end of detection, reset at every report
+        self.frames_received = 0
+        self.frames_dropped = 0
+        self.frames_processed = 0
+        self.detection_latency = 0.0
+        self.max_detection_latency = 0.0
+
+        self.stats_period = 5.0
+        self.stats_timer = self.create_timer(self.stats_period, self.publish_frame_stats)
+
+        # Marker positions found by the detection worker, waiting to be published
+        self.detections = deque()
+
+        # Map positions of each marker are published (and stored) at most once every publish_period
+        # seconds
+        self.publish_period = 1.0
+        if self.estimates_positions:
+            self.publish_timer = self.create_timer(self.publish_period, self.publish_detections)
+
+        # Detection (or the pose estimation of the received corners offboard) runs in a worker
+        # thread so the callbacks never block
+        self.running = True
+        self.detection_thread = threading.Thread(target=self.detection_loop, daemon=True)
+        self.detection_thread.start()
 
-        # Subscribe to image topic
-        self.image_subscriber = self.create_subscription(
-            Image,
-            '/image_raw',
-            self.image_callback,
-            self.queue_size
+        # Subscribe to /pose to determine the position of Turtlebot
+        if self.estimates_positions:
+            self.position_subscriber = self.create_subscription(
+                PoseWithCovarianceStamped,
+                '/pose',
+                self.current_position_callback,
+                self.queue_size,
+                # callback_group=self.parallel_callback_group
+            )
+
+        # Subscribe to image topic, keeping only the latest frame (best effort, like the camera
+        # drivers publish)
+        latest_frame_qos = QoSProfile(
+            history=QoSHistoryPolicy.KEEP_LAST,
+            depth=1,
+            reliability=QoSReliabilityPolicy.BEST_EFFORT
         )
+        if self.pipeline == 'offboard':
+            # Corners detected on the robot
+            self.corners_subscriber = self.create_subscription(
+                MarkerArray,
+                'aruco_corners',
+                self.corners_callback,
+                10
+            )
+        elif self.use_compressed:
+            self.image_subscriber = self.create_subscription(
+                CompressedImage,
+                '/image_raw/compressed',
+                self.image_callback,
+                latest_frame_qos
+            )
+        else:
+            self.image_subscriber = self.create_subscription(
+                Image,
+                '/image_raw',
+                self.image_callback,
+                latest_frame_qos
+            )
 
         self.aruco_position_publisher = self.create_publisher(
             PointStamped,
@@ -91,6 +203,19 @@ class Aruco_detect(Node):
             'aruco_average_positions', 
             10
         )
+
+        self.diagnostics_publisher = self.create_publisher(
+            DiagnosticArray,
+            '/diagnostics',
+            10
+        )
+
+        if self.pipeline == 'edge':
+            self.corners_publisher = self.create_publisher(
+                MarkerArray,
+                'aruco_corners',
+                10
+            )
     
     def quaternion_to_yaw(self, x, y, z, w):
         """
@@ -113,95 +238,297 @@ class Aruco_detect(Node):
         orientation_q = msg.pose.pose.orientation
         self.robot_orientation = [orientation_q.x, orientation_q.y, orientation_q.z, orientation_q.w]
 
-    def image_callback(self, msg: Image):
-
+    def image_callback(self, msg):
+        """
+        Stores the latest frame for the detection worker, replacing the one not processed yet.
+        """
         if not self.received_image:
             self.get_logger().info('Received image for ArUco detection')
             self.received_image = True
 
+        with self.frame_lock:
+            self.frames_received += 1
+            if self.latest_frame is not None:
+                self.frames_dropped += 1
+            self.latest_frame = msg
+        self.frame_available.set()
+
+    def detection_loop(self):
+        """
+        Worker thread: detects the markers of the latest frame and queues their positions for
+        publication.
+        """
+        while self.running:
+            if not self.frame_available.wait(timeout=0.5):
+                continue
+            with self.frame_lock:
+                msg = self.latest_frame
+                self.latest_frame = None
+                self.frame_available.clear()
+            if msg is None:
+                continue
+
+            try:
+                if self.pipeline == 'edge':
+                    self.publish_corners(msg.header, *self.detect_corners(msg))
+                elif self.pipeline == 'offboard':
+                    corners, ids, header = self.unpack_corners(msg)
+                    self.detections.extend(self.estimate_positions(corners, ids, header))
+                else:
+                    self.detections.extend(self.detect_markers(msg))
+            except Exception as e:
+                self.get_logger().error(f"Failed to process image: {e}")
+
+            delay = self.get_clock().now() - rclpy.time.Time.from_msg(msg.header.stamp)
+            latency = delay.nanoseconds / 1e9
+            with self.frame_lock:
+                self.frames_processed += 1
+                self.detection_latency += latency
+                self.max_detection_latency = max(self.max_detection_latency, latency)
+
+    def detect_markers(self, msg):
+        """
+        Detects the ArUco markers of a frame and estimates their positions in the camera and map
+        frames.
+
+        Returns a list of (marker_id, camera frame PointStamped, map frame PointStamped or None).
+        """
+        corners, ids = self.detect_corners(msg)
+        return self.estimate_positions(corners, ids, msg.header)
+
+    def detect_corners(self, msg):
+        """
+        Detects the ArUco markers of a frame.
+
+        Returns (corners, ids) in the format of cv2.aruco.detectMarkers, in full resolution pixels.
+        """
+        if isinstance(msg, CompressedImage):
+            # Decode straight to grayscale, possibly at reduced resolution
+            gray = cv2.imdecode(np.frombuffer(msg.data, dtype=np.uint8), self.decode_flag)
+            if gray is None:
+                self.get_logger().error(f"Failed to decode {msg.format} image")
+                return [], None
+            scale = self.decode_reduction
+        else:
+            # Convert ROS image message to a grayscale image, straight from its encoding
+            gray = self.gray_converter.convert(msg)
+            scale = 1
+
+        corners, ids = self.tracker.detect(gray)
+
+        if scale != 1:
+            # Corners back to full resolution pixel centres, as the camera matrix is calibrated at
+            # full resolution
+            corners = [(marker_corners + 0.5) * scale - 0.5 for marker_corners in corners]
+
+        return corners, ids
+
+    def publish_corners(self, header, corners, ids):
+        """
+        Publishes the corners of the markers of a frame, stamped with the frame, for the offboard
+        node (see CORNERS_NAMESPACE for the layout).
+        """
+        if ids is None:
+            return
+
+        marker_array = MarkerArray()
+        for marker_corners, marker_id in zip(corners, ids.flatten()):
+            marker = Marker()
+            marker.header = header
+            marker.ns = CORNERS_NAMESPACE
+            marker.id = int(marker_id)
+            marker.type = Marker.LINE_STRIP
+            marker.points = [Point(x=float(x), y=float(y), z=0.0)
+                             for x, y in marker_corners.reshape(4, 2)]
+            marker_array.markers.append(marker)
+        self.corners_publisher.publish(marker_array)
+
+    def corners_callback(self, msg: MarkerArray):
+        """
+        Offboard pipeline: stores the latest corners detected on the robot for the worker, like
+        image_callback. The worker waits for the transform at their capture time, which must not
+        block the executor.
+        """
+        with self.frame_lock:
+            self.frames_received += 1
+            if self.latest_frame is not None:
+                self.frames_dropped += 1
+            self.latest_frame = msg
+        self.frame_available.set()
+
+    def unpack_corners(self, msg: MarkerArray):
+        """
+        (corners, ids) of a corners message, in the format of cv2.aruco.detectMarkers, and the
+        header of the frame they were detected in. Markers without 4 corners are skipped.
+        """
+        markers = [marker for marker in msg.markers if len(marker.points) == 4]
+        if not markers:
+            header = msg.markers[0].header if msg.markers else Header()
+            return [], None, header
+
+        corners = [np.array([[[p.x, p.y] for p in marker.points]], dtype=np.float32)
+                   for marker in markers]
+        ids = np.array([[marker.id] for marker in markers], dtype=np.int32)
+        return corners, ids, markers[0].header
+
+    def estimate_positions(self, corners, ids, header):
+        """
+        Estimates the positions of detected markers in the camera and map frames.
+
+        Returns a list of (marker_id, camera frame PointStamped, map frame PointStamped or None).
+        """
+        detections = []
+
+        tag_size_in_meters = 0.1
+
+        # Verify if corners detected the tag
+        if len(corners)>0:
+            self.get_logger().info(f"Detected corners: {corners}")
+        else:
+            self.get_logger().error("No corners detected")
+            return detections  # Exit early if no tags detected
+
+
+        if self.camera_matrix is not None and self.dist_coeffs is not None:
+            assert self.camera_matrix.shape == (3, 3), "Incorrect format for camera_matrix"
+            assert self.dist_coeffs.shape == (1, 5) or self.dist_coeffs.shape == (
+            1, 4), "Incorrect format for dist_coeffs"
+        else:
+            self.get_logger().error("Camera parameters not loaded properly.")
+            return detections
+
+        # Detect Aruco tags
+        if ids is not None:
+            # If Aruco tags detected, print the tag IDs
+            self.get_logger().info(f"Detected ArUco marker(s) with ID(s): {ids}")
+
+            rvecs, tvecs, _ = cv2.aruco.estimatePoseSingleMarkers(corners, tag_size_in_meters, self.camera_matrix,
+                                                                  self.dist_coeffs)
+            if rvecs is None or tvecs is None:
+                self.get_logger().error("Failed to estimate pose for ArUco marker")
+                return detections
+
+            # Transform all the markers of the frame at once, with the camera pose at the capture
+            # time
+            positions = tvecs.reshape(-1, 3)
+            camera_to_map = self.lookup_camera_to_map(header.stamp)
+            if camera_to_map is not None:
+                homogeneous = np.hstack([positions, np.ones((len(positions), 1))])
+                map_positions = homogeneous @ camera_to_map.T
+
+            for i, position in enumerate(positions):
+                marker_id = ids[i][0]  # Get the marker ID
+
+                self.get_logger().info(f"Tag ID: {marker_id}, Relative to camera: x={position[0]}, y={position[1]}, z={position[2]}")
+
+                aruco = PointStamped()
+                aruco.header.stamp = header.stamp
+                aruco.header.frame_id = 'camera_rgb_optical_frame'
+                aruco.point.x = float(position[0])
+                aruco.point.y = float(position[1])
+                aruco.point.z = float(position[2])
+
+                aruco_map_frame = None
+                if camera_to_map is not None:
+                    aruco_map_frame = PointStamped()
+                    aruco_map_frame.header.stamp = header.stamp
+                    aruco_map_frame.header.frame_id = 'map'
+                    aruco_map_frame.point.x = float(map_positions[i, 0])
+                    aruco_map_frame.point.y = float(map_positions[i, 1])
+                    aruco_map_frame.point.z = float(map_positions[i, 2])
+
+                    self.get_logger().info(f"Tag ID: {marker_id}, Global Position: x={aruco_map_frame.point.x}, y={aruco_map_frame.point.y}, z={aruco_map_frame.point.z}")
+
+                detections.append((marker_id, aruco, aruco_map_frame))
+
+        return detections
+
+    def lookup_camera_to_map(self, stamp):
+        """
+        4x4 homogeneous matrix from the camera frame to the map frame at the capture time stamp,
+        interpolated by tf2 and waiting at most transform_timeout for it. None if the transform is
+        not available.
+        """
         try:
-            # Convert ROS image message to OpenCV format
-            tag_size_in_meters = 0.1
-            cv_image = self.bridge.imgmsg_to_cv2(msg, desired_encoding='bgr8')
-
-            # Convert to grayscale image
-            gray = cv2.cvtColor(cv_image, cv2.COLOR_BGR2GRAY)
-
-            corners, ids, rejected = cv2.aruco.detectMarkers(gray, self.aruco_dict, parameters=self.aruco_params)
-
-            # Verify if corners detected the tag
-            if len(corners)>0:
-                self.get_logger().info(f"Detected corners: {corners}")
-            else:
-                self.get_logger().error("No corners detected")
-                return  # Exit early if no tags detected
-
-
-            if self.camera_matrix is not None and self.dist_coeffs is not None:
-                assert self.camera_matrix.shape == (3, 3), "Incorrect format for camera_matrix"
-                assert self.dist_coeffs.shape == (1, 5) or self.dist_coeffs.shape == (
-                1, 4), "Incorrect format for dist_coeffs"
-            else:
-                self.get_logger().error("Camera parameters not loaded properly.")
-                return
-
-            # Detect Aruco tags
-            if ids is not None:
-                # If Aruco tags detected, print the tag IDs
-                self.get_logger().info(f"Detected ArUco marker(s) with ID(s): {ids}")
-
-                rvecs, tvecs, _ = cv2.aruco.estimatePoseSingleMarkers(corners, tag_size_in_meters, self.camera_matrix,
-                                                                      self.dist_coeffs)
-                if rvecs is None or tvecs is None:
-                    self.get_logger().error("Failed to estimate pose for ArUco marker")
-                    return
-
-                for i, (rvec, tvec) in enumerate(zip(rvecs, tvecs)):
-                    marker_id = ids[i][0]  # Get the marker ID
-
-                    # Check the number of position stored of the marker with the same ID
-                    if len(self.aruco_positions[marker_id]) > self.pos_queue_size:
-                        self.get_logger().info(f"Maximum number of measures reached for ID {marker_id} ")
-                        continue
-                    
-                    self.get_logger().info(f"Tag ID: {marker_id}, Relative to camera: x={tvec[0][0]}, y={tvec[0][1]}, z={tvec[0][2]}")
-                    
-                    aruco = PointStamped()
-                    aruco.header.frame_id = 'camera_rgb_optical_frame'
-                    aruco.point.x = tvec[0][0]
-                    aruco.point.y = tvec[0][1]
-                    aruco.point.z = tvec[0][2]
-                    self.aruco_position_publisher.publish(aruco)
-
-                    try:
-                        self.tf_buffer.can_transform('map', 'camera_rgb_optical_frame', rclpy.time.Time())
-                        transform = self.tf_buffer.lookup_transform(
-                            'map',
-                            'camera_rgb_optical_frame',
-                            rclpy.time.Time())
-                        aruco_map_frame = tf2_geometry_msgs.do_transform_point(aruco, transform)
-                        
-                        self.get_logger().info(f"Tag ID: {marker_id}, Global Position: x={aruco_map_frame.point.x}, y={aruco_map_frame.point.y}, z={aruco_map_frame.point.z}")
-                        
-                        # Publish the transformed position
-                        self.aruco_map_position_publisher.publish(aruco_map_frame)
-                        
-
-                        # Store the position in the dictionary
-                        self.aruco_positions[marker_id].append(aruco_map_frame)
-                    
-                        
-                    
-                    except TransformException as ex:
-                        self.get_logger().error(f"Could not transform tag position to map frame: {ex}")
-                
-                    time.sleep(1)
-
-            else:
-                pass
+            transform = self.tf_buffer.lookup_transform(
+                'map',
+                'camera_rgb_optical_frame',
+                rclpy.time.Time.from_msg(stamp),
+                timeout=rclpy.duration.Duration(seconds=self.transform_timeout))
+        except TransformException as ex:
+            self.get_logger().error(f"Could not transform tag positions to map frame: {ex}")
+            return None
+
+        t = transform.transform.translation
+        x, y, z, w = (transform.transform.rotation.x, transform.transform.rotation.y,
+                      transform.transform.rotation.z, transform.transform.rotation.w)
+        return np.array([
+            [1 - 2 * (y * y + z * z), 2 * (x * y - z * w), 2 * (x * z + y * w), t.x],
+            [2 * (x * y + z * w), 1 - 2 * (x * x + z * z), 2 * (y * z - x * w), t.y],
+            [2 * (x * z - y * w), 2 * (y * z + x * w), 1 - 2 * (x * x + y * y), t.z],
+            [0.0, 0.0, 0.0, 1.0],
+        ])
+
+    def publish_detections(self):
+        """
+        Publishes the latest queued position of each detected marker and stores it for the
+        averages. Publication is rate limited by the timer period instead of sleeping in the image
+        callback.
+        """
+        latest = {}
+        while self.detections:
+            marker_id, aruco, aruco_map_frame = self.detections.popleft()
+            latest[marker_id] = (aruco, aruco_map_frame)
+
+        for marker_id, (aruco, aruco_map_frame) in latest.items():
+            # Check the number of position stored of the marker with the same ID
+            if len(self.aruco_positions[marker_id]) > self.pos_queue_size:
+                self.get_logger().info(f"Maximum number of measures reached for ID {marker_id} ")
+                continue
 
-        except Exception as e:
-            self.get_logger().error(f"Failed to process image: {e}")
+            self.aruco_position_publisher.publish(aruco)
+            if aruco_map_frame is not None:
+                # Publish the transformed position
+                self.aruco_map_position_publisher.publish(aruco_map_frame)
+
+                # Store the position in the dictionary
+                self.aruco_positions[marker_id].append(aruco_map_frame)
+
+    def publish_frame_stats(self):
+        """
+        Publishes the frame statistics of the last stats_period on /diagnostics and resets them.
+        """
+        with self.frame_lock:
+            received, dropped = self.frames_received, self.frames_dropped
+            processed = self.frames_processed
+            latency, max_latency = self.detection_latency, self.max_detection_latency
+            self.frames_received = self.frames_dropped = self.frames_processed = 0
+            self.detection_latency = self.max_detection_latency = 0.0
+
+        mean_latency = latency / processed if processed else 0.0
+
+        status = DiagnosticStatus()
+        status.level = DiagnosticStatus.OK if processed or not received else DiagnosticStatus.WARN
+        status.name = f"{self.get_name()}: ArUco frame processing"
+        status.message = (f"{processed / self.stats_period:.1f} frames/s processed, "
+                          f"{dropped} dropped")
+        status.values = [
+            KeyValue(key='frames_received', value=str(received)),
+            KeyValue(key='frames_dropped', value=str(dropped)),
+            KeyValue(key='frames_processed', value=str(processed)),
+            KeyValue(key='mean_latency', value=f"{mean_latency:.3f}"),
+            KeyValue(key='max_latency', value=f"{max_latency:.3f}"),
+        ]
+
+        diagnostics = DiagnosticArray()
+        diagnostics.header.stamp = self.get_clock().now().to_msg()
+        diagnostics.status.append(status)
+        self.diagnostics_publisher.publish(diagnostics)
+
+        if received:
+            self.get_logger().info(f"Frames received: {received}, dropped: {dropped}, "
+                                   f"processed: {processed}, "
+                                   f"latency: mean {mean_latency:.3f} s, max {max_latency:.3f} s")
 
     def update_estimates(self):
         """
@@ -278,11 +605,31 @@ class Aruco_detect(Node):
             self.get_logger().error("Failed to load camera parameters")
 
 
+    def destroy_node(self):
+        # Stop the detection worker before the node goes away
+        self.running = False
+        self.detection_thread.join(timeout=1.0)
+        super().destroy_node()
+
+
 def main():
     rclpy.init()
     aruco_detect_node = Aruco_detect()
     aruco_detect_node.get_logger().info('Running aruco detection node')
-    rclpy.spin(aruco_detect_node)
+    try:
+        rclpy.spin(aruco_detect_node)
+    finally:
+        aruco_detect_node.destroy_node()
+
+
+def offboard_main():
+    rclpy.init()
+    aruco_offboard_node = Aruco_detect('aruco_offboard', pipeline='offboard')
+    aruco_offboard_node.get_logger().info('Running offboard aruco pose estimation node')
+    try:
+        rclpy.spin(aruco_offboard_node)
+    finally:
+        aruco_offboard_node.destroy_node()
 
 
 if __name__ == '__main__':
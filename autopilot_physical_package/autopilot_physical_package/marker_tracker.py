@@ -0,0 +1,179 @@
+import numpy as np
+import cv2
+
+
+# Scales at which the markers can be detected, the corners are then refined at full resolution
+SCALES = (1.0, 0.5, 0.25)
+
+
+class MarkerTracker:
+    """
+    Detects ArUco markers inside regions of interest predicted from the previous frame.
+
+    Every tracked marker's corners are extrapolated with a constant velocity model, and
+    detectMarkers only runs on the padded bounding boxes of the predictions (merged when they
+    overlap). A full frame search runs every full_search_period frames, when nothing is tracked,
+    and on the frame after a tracked marker was lost, so new markers and markers that moved fast
+    are still picked up.
+
+    Large markers are detected on a downscaled image (the smallest scale of SCALES at which they
+    stay at least min_marker_pixels wide), and their corners mapped back and refined with
+    cornerSubPix on the full resolution image. The scale of a region follows the size of the
+    markers tracked in it, the scale of a full frame search follows expected_marker_size (px, None
+    for full resolution).
+    """
+
+    def __init__(self, aruco_dict, aruco_params, padding=0.5, min_padding=20,
+                 full_search_period=10, min_marker_pixels=32, expected_marker_size=None):
+        self.aruco_dict = aruco_dict
+        self.aruco_params = aruco_params
+
+        # The regions are padded by padding times the marker size (px), and at least min_padding px
+        self.padding = padding
+        self.min_padding = min_padding
+
+        # Number of frames between two full frame searches
+        self.full_search_period = full_search_period
+
+        # Minimum side (px) of a marker in the downscaled image, and expected side (px) of the
+        # markers in the frame
+        self.min_marker_pixels = min_marker_pixels
+        self.expected_marker_size = expected_marker_size
+
+        # Termination of the sub-pixel refinement of the corners
+        self.refine_criteria = (cv2.TERM_CRITERIA_EPS + cv2.TERM_CRITERIA_MAX_ITER, 20, 0.01)
+
+        # marker_id -> (corners, velocity) of the tracked markers, (4, 2) arrays in px and px per
+        # frame
+        self.tracks = {}
+        self.frames_since_full_search = 0
+        self.lost = False
+
+    def detect(self, gray):
+        """
+        Detects the markers of a grayscale frame.
+
+        Returns (corners, ids) in the format of cv2.aruco.detectMarkers: a list of (1, 4, 2)
+        float32 arrays and an (n, 1) int array, or None if no marker was found.
+        """
+        full_search = (not self.tracks or self.lost
+                       or self.frames_since_full_search + 1 >= self.full_search_period)
+        if full_search:
+            corners, ids = self.detect_full(gray)
+            self.frames_since_full_search = 0
+        else:
+            corners, ids = self.detect_regions(gray)
+            self.frames_since_full_search += 1
+
+        self.update_tracks(corners, ids, full_search)
+        if not corners:
+            return [], None
+        return list(corners), np.array(ids, dtype=np.int32).reshape(-1, 1)
+
+    def detect_full(self, gray):
+        """Detects the markers on the whole frame. Returns the corners and the flat list of ids."""
+        return self.detect_scaled(gray, self.select_scale(self.expected_marker_size))
+
+    def select_scale(self, marker_size):
+        """Smallest scale at which a marker of marker_size (px) is still min_marker_pixels wide."""
+        if marker_size is None:
+            return 1.0
+        return min(scale for scale in SCALES
+                   if scale == 1.0 or marker_size * scale >= self.min_marker_pixels)
+
+    def detect_scaled(self, gray, scale):
+        """
+        Detects the markers of a grayscale image downscaled by scale, and refines their corners on
+        the image. Returns the corners, in px of the image, and the flat list of ids.
+        """
+        if scale == 1.0:
+            corners, ids, _ = cv2.aruco.detectMarkers(gray, self.aruco_dict,
+                                                      parameters=self.aruco_params)
+        else:
+            small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+            corners, ids, _ = cv2.aruco.detectMarkers(small, self.aruco_dict,
+                                                      parameters=self.aruco_params)
+        if ids is None:
+            return [], []
+
+        points = np.concatenate([c.reshape(4, 2) for c in corners]).astype(np.float32)
+        if scale != 1.0:
+            # Pixel centres of the downscaled image back to pixel centres of the image
+            points = (points + 0.5) / scale - 0.5
+
+            # The error of the mapped corners is about one downscaled pixel, the window covers it
+            half_window = int(np.ceil(1 / scale)) + 1
+            points = points.reshape(-1, 1, 2)
+            cv2.cornerSubPix(gray, points, (half_window, half_window), (-1, -1),
+                             self.refine_criteria)
+
+        points = points.reshape(-1, 1, 4, 2)
+        return [points[i] for i in range(len(points))], [int(i) for i in ids.flatten()]
+
+    def detect_regions(self, gray):
+        """Detects the markers inside the regions predicted from the tracks."""
+        found = {}
+        for row_start, row_stop, col_start, col_stop, marker_size in self.regions(gray.shape):
+            window = np.ascontiguousarray(gray[row_start:row_stop, col_start:col_stop])
+            corners, ids = self.detect_scaled(window, self.select_scale(marker_size))
+            for marker_corners, marker_id in zip(corners, ids):
+                # Back to frame coordinates, a marker found in two regions is kept once
+                marker_corners += np.array([col_start, row_start], dtype=np.float32)
+                found.setdefault(marker_id, marker_corners)
+
+        return list(found.values()), list(found.keys())
+
+    def regions(self, shape):
+        """
+        Padded bounding boxes (row_start, row_stop, col_start, col_stop, marker_size) of the
+        predicted markers, merged, with the side (px) of the smallest marker they contain.
+        """
+        height, width = shape[:2]
+        boxes = []
+        for corners, velocity in self.tracks.values():
+            predicted = corners + velocity
+            low = predicted.min(axis=0)
+            high = predicted.max(axis=0)
+            pad = max(self.padding * float((high - low).max()), self.min_padding)
+            side = float(np.linalg.norm(predicted - np.roll(predicted, 1, axis=0), axis=1).min())
+            boxes.append([max(int(low[1] - pad), 0), min(int(np.ceil(high[1] + pad)), height),
+                          max(int(low[0] - pad), 0), min(int(np.ceil(high[0] + pad)), width),
+                          side])
+
+        # Overlapping boxes are merged so no marker is cut between two regions
+        merged = True
+        while merged:
+            merged = False
+            for i in range(len(boxes)):
+                for j in range(i + 1, len(boxes)):
+                    a, b = boxes[i], boxes[j]
+                    if a[0] < b[1] and b[0] < a[1] and a[2] < b[3] and b[2] < a[3]:
+                        boxes[i] = [min(a[0], b[0]), max(a[1], b[1]),
+                                    min(a[2], b[2]), max(a[3], b[3]), min(a[4], b[4])]
+                        del boxes[j]
+                        merged = True
+                        break
+                if merged:
+                    break
+
+        return [box for box in boxes if box[0] < box[1] and box[2] < box[3]]
+
+    def update_tracks(self, corners, ids, full_search):
+        """
+        Replaces the tracks by the detected markers, and flags whether a tracked marker was lost in
+        its region.
+        """
+        tracks = {}
+        for marker_corners, marker_id in zip(corners, ids):
+            marker_corners = marker_corners.reshape(4, 2)
+            previous = self.tracks.get(marker_id)
+            if previous is not None:
+                velocity = marker_corners - previous[0]
+            else:
+                velocity = np.zeros((4, 2), dtype=np.float32)
+            tracks[marker_id] = (marker_corners, velocity)
+
+        # Markers missing from a full search left the view, only the ones missing from their region
+        # are lost
+        self.lost = not full_search and any(marker_id not in tracks for marker_id in self.tracks)
+        self.tracks = tracks
@@ -19,7 +19,8 @@ setup(
     license='Apache-2.0',
     tests_require=['pytest'],
     entry_points={
-        'console_scripts': ['aruco_detect_robot=autopilot_physical_package.aruco_node_robot:main'
+        'console_scripts': ['aruco_detect_robot=autopilot_physical_package.aruco_node_robot:main',
+            'aruco_offboard=autopilot_physical_package.aruco_node_robot:offboard_main'
         ],
     },
 )
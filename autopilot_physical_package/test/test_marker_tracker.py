@@ -0,0 +1,146 @@
+import numpy as np
+import pytest
+
+cv2 = pytest.importorskip('cv2')
+
+from autopilot_physical_package.marker_tracker import MarkerTracker  # noqa: E402
+
+
+def square(left, top, side):
+    """Corners (4, 2) of a square marker in the cv2.aruco order, x then y in px."""
+    return np.array([[left, top], [left + side, top], [left + side, top + side],
+                     [left, top + side]], dtype=np.float32)
+
+
+def make_tracker(**kwargs):
+    aruco_dict = cv2.aruco.Dictionary_get(cv2.aruco.DICT_6X6_250)
+    return MarkerTracker(aruco_dict, cv2.aruco.DetectorParameters_create(), **kwargs)
+
+
+class ScriptedTracker(MarkerTracker):
+    """MarkerTracker whose detections come from a script instead of an image."""
+
+    def __init__(self, script, **kwargs):
+        super().__init__(None, None, **kwargs)
+        self.script = list(script)
+        self.searches = []
+
+    def detect_full(self, gray):
+        self.searches.append('full')
+        return self.next_detection()
+
+    def detect_regions(self, gray):
+        self.searches.append('regions')
+        return self.next_detection()
+
+    def next_detection(self):
+        markers = self.script.pop(0)
+        return ([corners.reshape(1, 4, 2) for corners in markers.values()], list(markers))
+
+
+def test_region_follows_the_constant_velocity_prediction():
+    tracker = make_tracker(padding=0.5, min_padding=20)
+    tracker.tracks = {7: (square(100, 100, 40), np.tile([10.0, 0.0], (4, 1)))}
+
+    # Predicted at x 110..150, y 100..140, padded by 20 px
+    assert tracker.regions((480, 640)) == [[80, 160, 90, 170, 40.0]]
+
+
+def test_overlapping_regions_are_merged():
+    tracker = make_tracker(padding=0.5, min_padding=20)
+    still = np.zeros((4, 2), dtype=np.float32)
+    tracker.tracks = {1: (square(100, 100, 40), still), 2: (square(150, 110, 20), still),
+                      3: (square(400, 300, 40), still)}
+
+    regions = sorted(tracker.regions((480, 640)))
+    assert regions == [[80, 160, 80, 190, 20.0], [280, 360, 380, 460, 40.0]]
+
+
+def test_regions_are_clipped_to_the_frame():
+    tracker = make_tracker(padding=0.5, min_padding=20)
+    still = np.zeros((4, 2), dtype=np.float32)
+    tracker.tracks = {1: (square(-10, 450, 40), still), 2: (square(700, 100, 40), still)}
+
+    # The second marker is predicted outside of the frame, so it has no region
+    assert tracker.regions((480, 640)) == [[430, 480, 0, 50, 40.0]]
+
+
+def test_scale_keeps_markers_wide_enough():
+    tracker = make_tracker(min_marker_pixels=32)
+    assert tracker.select_scale(None) == 1.0
+    assert tracker.select_scale(40) == 1.0
+    assert tracker.select_scale(100) == 0.5
+    assert tracker.select_scale(200) == 0.25
+
+
+def test_lost_marker_triggers_a_full_search():
+    marker = square(100, 100, 40)
+    tracker = ScriptedTracker([{5: marker}, {5: marker + 2}, {}, {5: marker + 4}],
+                              full_search_period=10)
+    gray = np.zeros((480, 640), dtype=np.uint8)
+
+    corners, ids = tracker.detect(gray)
+    assert ids.tolist() == [[5]]
+    assert not tracker.tracks[5][1].any()
+
+    tracker.detect(gray)
+    assert np.allclose(tracker.tracks[5][1], 2.0)
+
+    # Missing from its region: lost, and the next frame is searched whole
+    corners, ids = tracker.detect(gray)
+    assert corners == [] and ids is None
+    assert tracker.lost
+    tracker.detect(gray)
+    assert tracker.searches == ['full', 'regions', 'regions', 'full']
+    assert not tracker.lost
+
+
+def test_marker_missing_from_a_full_search_is_not_lost():
+    marker = square(100, 100, 40)
+    tracker = ScriptedTracker([{5: marker}, {}], full_search_period=1)
+    gray = np.zeros((480, 640), dtype=np.uint8)
+    tracker.detect(gray)
+    tracker.detect(gray)
+    assert tracker.searches == ['full', 'full']
+    assert not tracker.lost
+    assert tracker.tracks == {}
+
+
+def test_full_search_every_period():
+    marker = square(100, 100, 40)
+    tracker = ScriptedTracker([{5: marker}] * 7, full_search_period=3)
+    gray = np.zeros((480, 640), dtype=np.uint8)
+    for _ in range(7):
+        tracker.detect(gray)
+    assert tracker.searches == ['full', 'regions', 'regions', 'full', 'regions', 'regions',
+                                'full']
+
+
+def synthetic_frame(marker_id, left, top, side):
+    """White 640x480 frame with one marker drawn at (left, top)."""
+    aruco_dict = cv2.aruco.Dictionary_get(cv2.aruco.DICT_6X6_250)
+    frame = np.full((480, 640), 255, dtype=np.uint8)
+    frame[top:top + side, left:left + side] = cv2.aruco.drawMarker(aruco_dict, marker_id, side)
+    return frame
+
+
+@pytest.mark.parametrize('expected_marker_size', [None, 200])
+def test_downscaled_detection_refines_the_corners(expected_marker_size):
+    frame = synthetic_frame(3, 200, 120, 200)
+    tracker = make_tracker(min_marker_pixels=32, expected_marker_size=expected_marker_size)
+    corners, ids = tracker.detect(frame)
+
+    assert ids.tolist() == [[3]]
+    expected = square(199.5, 119.5, 200)
+    assert np.abs(corners[0].reshape(4, 2) - expected).max() < 1.5
+
+
+def test_marker_is_tracked_in_its_region():
+    tracker = make_tracker(full_search_period=10)
+    tracker.detect(synthetic_frame(3, 200, 120, 120))
+    corners, ids = tracker.detect(synthetic_frame(3, 210, 120, 120))
+
+    assert tracker.frames_since_full_search == 1
+    assert ids.tolist() == [[3]]
+    assert np.abs(corners[0].reshape(4, 2) - square(209.5, 119.5, 120)).max() < 1.5
+    assert np.allclose(tracker.tracks[3][1][:, 0], 10.0, atol=1.5)